@@ -0,0 +1,80 @@
+def _free_zones(zones):
+    return [zone for zone in zones if zone["status"] == "available"]
+
+
+def nearest_policy(items, zones, pickup_zone: dict, index, exclude=()):
+    """Give the items the free zones closest to the pickup zone.
+
+    Every package is a round trip from the pickup zone, so taking the nearest free
+    zones minimizes the total travel of the batch.
+    """
+    nearest = index.nearest(pickup_zone["x"], pickup_zone["y"], k=len(items), exclude=exclude)
+    return [name for name, _ in nearest]
+
+
+def product_type_policy(items, zones, pickup_zone: dict, index, exclude=()):
+    """Keep packages of the same productType together.
+
+    Each type is placed in the free zones nearest to where that type is already
+    stored (centroid of its occupied zones), or nearest to the pickup zone for a new type.
+    """
+    taken = set(exclude)
+    groups = {}
+    for position, item in enumerate(items):
+        groups.setdefault(item.productType, []).append(position)
+
+    assigned = [None] * len(items)
+    for product_type, positions in groups.items():
+        stored = [zone for zone in zones if zone["status"] == "occupied" and zone["productType"] == product_type]
+        if stored:
+            anchor = {"x": sum(zone["x"] for zone in stored) / len(stored),
+                      "y": sum(zone["y"] for zone in stored) / len(stored)}
+        else:
+            anchor = pickup_zone
+        for position, (name, _) in zip(positions, index.nearest(anchor["x"], anchor["y"], k=len(positions), exclude=taken)):
+            assigned[position] = name
+            taken.add(name)
+    return assigned
+
+
+# Assignment policies by name; register_policy() adds more
+POLICIES = {
+    "nearest": nearest_policy,
+    "product_type": product_type_policy,
+}
+
+
+def register_policy(name: str, policy):
+    """Register policy(items, zones, pickup_zone, index, exclude) -> list of zone names, one per item.
+
+    'index' is the ZoneIndex of the zone cache; 'exclude' holds zone names already taken or not in 'zones'.
+    """
+    POLICIES[name] = policy
+
+
+def assign_zones(items, zones, pickup_zone: dict, index, policy: str = "nearest"):
+    """Return one zone name per item.
+
+    Items with a zone_id keep it; the rest are assigned by the named policy from the
+    remaining free zones. Raises ValueError if the policy is unknown, a requested zone
+    is not free or there are not enough free zones.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown assignment policy '{policy}'. Use one of: {', '.join(POLICIES)}.")
+
+    zones_by_name = {zone["name"]: zone for zone in zones}
+    pinned = [item.zone_id for item in items if item.zone_id]
+    for zone_id in pinned:
+        zone = zones_by_name.get(zone_id)
+        if zone is None or zone["status"] != "available":
+            raise ValueError(f"Zone {zone_id} is not available.")
+    if len(set(pinned)) != len(pinned):
+        raise ValueError("The same zone is requested for more than one item.")
+
+    open_items = [item for item in items if not item.zone_id]
+    if len(open_items) > len(_free_zones(zones)) - len(pinned):
+        raise ValueError(f"Not enough available zones for {len(items)} packages.")
+    # The index holds every zone; the ones not in 'zones' (e.g. served by another arm) are off limits
+    exclude = set(pinned) | (set(index.names()) - zones_by_name.keys())
+    assigned = iter(POLICIES[policy](open_items, zones, pickup_zone, index, exclude) if open_items else [])
+    return [item.zone_id or next(assigned) for item in items]
@@ -0,0 +1,135 @@
+"""Replay a recorded frame corpus through the decode path, as fast as it goes.
+
+The corpus is what the server wrote to FRAME_CORPUS_DIR during real storage operations.
+Every frame is decoded once per configuration (repeat with --config), like
+barcode_reader_and_handle_package does: the pipeline first and, with --pool N, the
+multi-process engine when the pipeline misses. For each configuration it reports:
+
+  frames/s        decode throughput over the whole corpus
+  ms/frame        per-frame decode latency (mean, p50, p95)
+  frames          share of frames decoded
+  attempts        share of scan attempts with at least one decoded frame
+  to decode       per decoded attempt, decode time spent on its recorded frames up to the first hit
+  gained / lost   frames the live decoder missed and the replay decoded, and the other way round
+
+A configuration is a list of DecodeConfig fields, e.g. "downscale=1.0 refine=0" or
+"roi=100,80,400,300 symbols=CODE128". The first configuration is the current BARCODE_* setup.
+
+Usage: python bench_corpus.py CORPUS_DIR [--config "downscale=1.0"] [--config "refine=0"] [--pool 4] [--limit 1000]
+"""
+import argparse
+import copy
+import time
+
+from corpus import CorpusReader
+from decoder import DecodeConfig, DecodePipeline, parse_roi, parse_symbols
+from decode_pool import DecodeEngine
+
+
+FLAGS = ("grayscale", "refine", "full_frame_fallback")
+
+
+def parse_config(text: str):
+    config = DecodeConfig.from_env()
+    for item in text.split():
+        key, _, value = item.partition("=")
+        if key == "roi":
+            config.roi = parse_roi(value)
+        elif key == "symbols":
+            config.symbols = parse_symbols(value)
+        elif key in FLAGS:
+            setattr(config, key, value not in ("0", "false", "no"))
+        elif key == "downscale":
+            config.downscale = float(value)
+        elif key == "candidate_padding":
+            config.candidate_padding = int(value)
+        else:
+            raise SystemExit(f"Unknown decode setting '{key}' in --config \"{text}\"")
+    return config
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float("nan")
+
+
+def replay(reader, limit, config, pool):
+    """Decode every frame once. Returns a list of (entry, found, seconds)."""
+    # Frames recorded with FRAME_CORPUS_ROI_ONLY are already cut to the ROI
+    pipeline = DecodePipeline(config, history=1)
+    cropped_config = copy.copy(config)
+    cropped_config.roi = None
+    cropped_pipeline = DecodePipeline(cropped_config, history=1)
+    engine = DecodeEngine(pool, symbols=config.symbols, roi=config.roi) if pool else None
+    cropped_engine = DecodeEngine(pool, symbols=config.symbols) if pool else None
+    results = []
+    try:
+        for number, (entry, frame) in enumerate(reader):
+            if number >= limit:
+                break
+            cropped = bool(entry.get("roi"))
+            started = time.perf_counter()
+            found = (cropped_pipeline if cropped else pipeline).decode_frame(frame)
+            if not found and engine:
+                found = (cropped_engine if cropped else engine).decode(frame)
+            results.append((entry, found, time.perf_counter() - started))
+    finally:
+        for item in (engine, cropped_engine):
+            if item:
+                item.close()
+    return results
+
+
+def report(label, results):
+    seconds = [result[2] for result in results]
+    decoded = sum(1 for result in results if result[1])
+    attempts = {}
+    for entry, found, elapsed in results:
+        key = (entry.get("scan"), entry.get("attempt"))
+        spent, hit = attempts.get(key, (0.0, None))
+        if hit is None:
+            attempts[key] = (spent + elapsed, spent + elapsed if found else None)
+    to_decode = [hit for _, hit in attempts.values() if hit is not None]
+    gained = sum(1 for entry, found, _ in results if found and not entry.get("found"))
+    lost = [entry for entry, found, _ in results if not found and entry.get("found")]
+    total = sum(seconds)
+    print(f"{label[:28]:<28} {len(results) / total:9.1f} {total / len(results) * 1000:8.2f} "
+          f"{percentile(seconds, 0.5) * 1000:7.2f} {percentile(seconds, 0.95) * 1000:7.2f} "
+          f"{decoded / len(results) * 100:7.1f}% {len(to_decode) / len(attempts) * 100:8.1f}% "
+          f"{sum(to_decode) / len(to_decode) * 1000 if to_decode else float('nan'):10.2f} "
+          f"{percentile(to_decode, 0.95) * 1000:8.2f} {gained:7d} {len(lost):5d}")
+    return lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", help="FRAME_CORPUS_DIR of the recording")
+    parser.add_argument("--config", action="append", default=[], help="DecodeConfig fields to replay with, repeatable")
+    parser.add_argument("--pool", type=int, default=0, help="fall back to the decode engine with N workers, like DECODE_POOL_SIZE")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N frames")
+    parser.add_argument("--show-lost", type=int, default=5, help="list up to N frames lost against the recording")
+    args = parser.parse_args()
+
+    reader = CorpusReader(args.corpus)
+    if not len(reader):
+        print(f"No frames recorded in {args.corpus}")
+        return
+    limit = args.limit or len(reader)
+    entries = reader.entries[:limit]
+    scans = {entry.get("scan") for entry in entries}
+    recorded = sum(1 for entry in entries if entry.get("found"))
+    print(f"{len(entries)} frames from {len(scans)} scans, {recorded} decoded when recorded"
+          f"{'; frames cropped to the ROI, roi= is ignored' if any(entry.get('roi') for entry in entries) else ''}")
+    print(f"{'config':<28} {'frames/s':>9} {'ms/frame':>8} {'p50':>7} {'p95':>7} {'frames':>8} {'attempts':>9} "
+          f"{'to decode':>10} {'p95':>8} {'gained':>7} {'lost':>5}")
+
+    for label in ["current"] + args.config:
+        config = DecodeConfig.from_env() if label == "current" else parse_config(label)
+        lost = report(label, replay(reader, limit, config, args.pool))
+        for entry in lost[:args.show_lost]:
+            print(f"    lost: scan {entry.get('scan')} attempt {entry.get('attempt')} frame {entry.get('number')} "
+                  f"(offset {entry['offset']}), recorded {entry.get('data')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Benchmark /zones/ and /available-zones/ queries under concurrent readers with an active writer.
+
+Compares the old connect-per-call pattern with the pooled WAL access layer in database.py.
+Runs against a temporary copy of robot_zones.db, so the real database is never touched.
+
+Usage: python bench_database.py [--readers 8] [--seconds 5] [--synchronous NORMAL]
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import database
+
+
+def legacy_get_zones(path):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute(database.SELECT_ALL_ZONES)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def legacy_get_available_zones(path):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute(database.SELECT_AVAILABLE_ZONE_NAMES)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def legacy_update_status(path, status, zone_id):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute(database.UPDATE_ZONE_STATUS, (status, zone_id))
+    conn.commit()
+    conn.close()
+
+
+def pooled_get_zones(path):
+    return database.fetch_all(database.SELECT_ALL_ZONES)
+
+
+def pooled_get_available_zones(path):
+    return database.fetch_all(database.SELECT_AVAILABLE_ZONE_NAMES)
+
+
+def pooled_update_status(path, status, zone_id):
+    database.execute(database.UPDATE_ZONE_STATUS, (status, zone_id))
+
+
+def run(label, path, readers, seconds, get_zones, get_available, update_status):
+    stop = threading.Event()
+    counts = [0] * readers
+    errors = []
+    writes = [0]
+
+    def reader(index):
+        query = get_zones if index % 2 == 0 else get_available
+        try:
+            while not stop.is_set():
+                query(path)
+                counts[index] += 1
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    def writer():
+        statuses = ("occupied", "available")
+        try:
+            while not stop.is_set():
+                update_status(path, statuses[writes[0] % 2], "A1")
+                writes[0] += 1
+        except sqlite3.Error as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    zones_reads = sum(counts[0::2])
+    available_reads = sum(counts[1::2])
+    print(f"{label:>10}: /zones/ {zones_reads / seconds:10.0f} req/s | "
+          f"/available-zones/ {available_reads / seconds:10.0f} req/s | "
+          f"writes {writes[0] / seconds:8.0f} /s | errors {len(errors)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--synchronous", default=database.SYNCHRONOUS)
+    parser.add_argument("--source", default="robot_zones.db", help="Database file to copy for the benchmark")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_db_")
+    try:
+        legacy_path = os.path.join(workdir, "legacy.db")
+        pooled_path = os.path.join(workdir, "pooled.db")
+        shutil.copy(args.source, legacy_path)
+        shutil.copy(args.source, pooled_path)
+
+        database.DB_PATH = pooled_path
+        database.SYNCHRONOUS = args.synchronous.upper()
+        database.initialize_database()
+
+        print(f"{args.readers} readers + 1 writer, {args.seconds}s each, synchronous={database.SYNCHRONOUS}")
+        run("legacy", legacy_path, args.readers, args.seconds,
+            legacy_get_zones, legacy_get_available_zones, legacy_update_status)
+        run("pooled", pooled_path, args.readers, args.seconds,
+            pooled_get_zones, pooled_get_available_zones, pooled_update_status)
+    finally:
+        database.close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark the barcode decode pipeline against the old full-frame pyzbar path.
+
+Runs both over a directory of stored images (jpg/png/bmp) and reports per-frame
+latency and how many images each path decoded.
+
+With --pool N it also measures frames/sec of the multi-process decode engine against
+the single-threaded loop.
+
+Usage: python bench_decode.py IMAGE_DIR [--repeat 3] [--roi x,y,w,h] [--symbols CODE128,EAN13] [--downscale 0.5] [--pool 4]
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+from pyzbar.pyzbar import decode
+
+from decoder import DecodeConfig, DecodePipeline, parse_roi, parse_symbols
+from decode_pool import DecodeEngine, DECODE_STRATEGIES
+
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+
+
+def load_images(directory):
+    paths = sorted(path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(directory, pattern)))
+    images = [(os.path.basename(path), cv2.imread(path)) for path in paths]
+    return [(name, image) for name, image in images if image is not None]
+
+
+def summarize(label, latencies, hits, total):
+    latencies = sorted(latencies)
+    mean = sum(latencies) / len(latencies) * 1000
+    p50 = latencies[len(latencies) // 2] * 1000
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000
+    print(f"{label:>10}: mean {mean:8.2f} ms | p50 {p50:8.2f} ms | p95 {p95:8.2f} ms | "
+          f"{1000 / mean:8.1f} frames/s | decoded {hits}/{total}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", help="Directory with stored frames")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--roi", default=os.environ.get("BARCODE_ROI", ""))
+    parser.add_argument("--symbols", default=os.environ.get("BARCODE_SYMBOLS", ""))
+    parser.add_argument("--downscale", type=float, default=0.5)
+    parser.add_argument("--no-refine", action="store_true")
+    parser.add_argument("--pool", type=int, default=0, help="Also benchmark the process pool with N workers")
+    parser.add_argument("--strategies", default=",".join(DECODE_STRATEGIES))
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        print(f"No images found in {args.images}")
+        return
+
+    # Old path: pyzbar on the full-resolution BGR frame
+    latencies, hits = [], 0
+    for _ in range(args.repeat):
+        for _, image in images:
+            started = time.perf_counter()
+            found = decode(image)
+            latencies.append(time.perf_counter() - started)
+            hits += bool(found)
+    summarize("full-frame", latencies, hits // args.repeat, len(images))
+
+    config = DecodeConfig(roi=parse_roi(args.roi), downscale=args.downscale, refine=not args.no_refine,
+                          symbols=parse_symbols(args.symbols))
+    pipeline = DecodePipeline(config, history=len(images) * args.repeat)
+    hits = 0
+    missed = []
+    for _ in range(args.repeat):
+        for name, image in images:
+            found = pipeline.decode_frame(image)
+            hits += bool(found)
+            if not found and name not in missed:
+                missed.append(name)
+    summarize("pipeline", list(pipeline.latencies), hits // args.repeat, len(images))
+    print(f"pipeline config: {config.to_dict()}")
+    if missed:
+        print(f"pipeline missed: {', '.join(missed)}")
+
+    if args.pool:
+        bench_pool(images, args)
+
+
+def bench_pool(images, args):
+    frames = [image for _, image in images] * args.repeat
+    gray_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) for frame in frames]
+
+    # Single-threaded loop, one frame after another
+    started = time.perf_counter()
+    for frame in gray_frames:
+        decode(frame)
+    serial_fps = len(frames) / (time.perf_counter() - started)
+
+    engine = DecodeEngine(args.pool, strategies=args.strategies.split(","), symbols=parse_symbols(args.symbols))
+    try:
+        # Warm up the workers so process start-up isn't measured
+        engine.decode_many(frames[:args.pool])
+
+        started = time.perf_counter()
+        engine.decode_many(frames)
+        pool_fps = len(frames) / (time.perf_counter() - started)
+
+        hits = 0
+        started = time.perf_counter()
+        for _, image in images:
+            hits += bool(engine.decode(image))
+        variants_latency = (time.perf_counter() - started) / len(images) * 1000
+    finally:
+        engine.close()
+
+    print(f"{'serial':>10}: {serial_fps:8.1f} frames/s")
+    print(f"{'pool':>10}: {pool_fps:8.1f} frames/s with {args.pool} workers ({pool_fps / serial_fps:.1f}x)")
+    print(f"{'variants':>10}: {variants_latency:8.2f} ms/frame first-hit over {args.strategies} | decoded {hits}/{len(images)}")
+
+
+if __name__ == "__main__":
+    main()
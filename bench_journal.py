@@ -0,0 +1,119 @@
+"""Benchmark journal writes and report queries.
+
+Compares committing every event on its own with the Journal's buffered group commit,
+then fills the journal with N events of synthetic history and times the throughput,
+dwell and retry reports over the last day and over the whole history.
+
+Usage: python bench_journal.py [--events 20000] [--sizes 100000,1000000]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+import database
+import journal
+
+ZONES = [f"Z{i}" for i in range(500)]
+STEPS_PER_CYCLE = 16
+
+
+def bench_writes(count):
+    rows = [(time.time(), journal.STEP, "done", 0.1, None, None, None, "job", "arm1", None, None) for _ in range(count)]
+
+    started = time.perf_counter()
+    for row in rows:
+        with database.transaction() as conn:
+            conn.execute(journal.INSERT_EVENT, row)
+    single = time.perf_counter() - started
+
+    buffered = journal.Journal(flush_interval=0.05)
+    buffered.start()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(count):
+        called = time.perf_counter()
+        buffered.record(journal.STEP, status="done", duration=0.1, arm="arm1")
+        latencies.append(time.perf_counter() - called)
+    buffered.stop()
+    grouped = time.perf_counter() - started
+
+    print(f"{'writes':<16} {'events/s':>10} {'caller p50 us':>14} {'caller p99 us':>14}")
+    print(f"{'commit per event':<16} {count / single:10.0f} {single / count * 1e6:14.1f} {'':>14}")
+    latencies.sort()
+    print(f"{'group commit':<16} {count / grouped:10.0f} {statistics.median(latencies) * 1e6:14.1f} "
+          f"{latencies[int(len(latencies) * 0.99)] * 1e6:14.1f}  ({buffered.flushes} flushes)")
+
+
+def fill(size, until):
+    """About 'size' events: a storage or pickup every 30 s before 'until', with barcode attempts and motion steps."""
+    cycles = size // (STEPS_PER_CYCLE + 2)
+    span = cycles * 30.0  # one cycle every 30 s
+    stored = {}
+    rows = []
+    for number in range(cycles):
+        t = until - span + number * 30.0
+        zone = random.choice(ZONES)
+        if zone in stored:
+            rows.append((t, journal.PICKUP, "success", 8.0, zone, stored.pop(zone), "misc", None, "arm1", None, None))
+        else:
+            attempts = 1 if random.random() < 0.8 else random.randint(2, 3)
+            for attempt in range(1, attempts + 1):
+                rows.append((t, journal.BARCODE, "found" if attempt == attempts else "missed", 0.3, None, None, None,
+                             None, "arm1", attempt, None))
+            stored[zone] = f"P{number:08d}"
+            rows.append((t, journal.STORAGE, "success", 9.0, zone, stored[zone], "misc", None, "arm1", None, None))
+        rows += [(t + step, journal.STEP, "done", 1.0, None, None, None, None, "arm1", None, None)
+                 for step in range(STEPS_PER_CYCLE)]
+    with database.transaction() as conn:
+        conn.executemany("INSERT OR IGNORE INTO zones (name, x, y, z, status) VALUES (?, 200, 0, -72, 'available')",
+                         [(zone,) for zone in ZONES])
+        conn.executemany(journal.INSERT_EVENT, rows)
+        conn.execute("ANALYZE")
+    return until - span
+
+
+def time_report(report, *args, repeat=5):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        report(*args)
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=20000, help="events for the write benchmark")
+    parser.add_argument("--sizes", default="100000,1000000", help="journal sizes for the report benchmark")
+    args = parser.parse_args()
+
+    random.seed(1)
+    workdir = tempfile.mkdtemp(prefix="bench_journal_")
+    try:
+        database.DB_PATH = os.path.join(workdir, "writes.db")
+        database.initialize_database()
+        bench_writes(args.events)
+
+        print(f"\n{'events':>8} {'window':>8} | {'throughput':>10} {'dwell':>8} {'retries':>8}  (median ms)")
+        for size in (int(value) for value in args.sizes.split(",")):
+            database.close_all()
+            database.DB_PATH = os.path.join(workdir, f"journal_{size}.db")
+            database.initialize_database()
+            until = time.time()
+            first = fill(size, until)
+            for window, since in (("1 day", until - 86400), ("all", first)):
+                results = [time_report(journal.throughput_report, since, until),
+                           time_report(journal.dwell_report, since, until),
+                           time_report(journal.retry_report, since, until)]
+                print(f"{size:8d} {window:>8} | {results[0]:10.1f} {results[1]:8.1f} {results[2]:8.1f}")
+    finally:
+        database.close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
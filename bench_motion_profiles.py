@@ -0,0 +1,72 @@
+"""Compare one fixed speed per operation with per-segment motion profiles on the simulated arm.
+
+Runs storage + pickup plans for every stored zone back to back, first the old way (one
+speed() call per operation, then the plan at that speed) and then with the transit,
+approach and carry profiles, and reports the simulated cycle time and the number of
+speed commands sent. The route planner is applied in both cases.
+
+Usage: python bench_motion_profiles.py [--velocity 50] [--acceleration 50] [--time-scale 0.02]
+"""
+import argparse
+
+import database
+from motion import PROFILES, assign_profiles, build_pickup_plan, build_storage_plan, execute_plan
+from route_planner import RoutePlanner
+from simulation import SimulatedDobot
+
+
+def load_points():
+    coordinates = {name: {"x": x, "y": y, "z": z} for name, x, y, z in database.fetch_all(database.SELECT_ALL_COORDINATES)}
+    zones = [{"name": name, "x": x, "y": y, "z": z} for name, x, y, z, *_ in database.fetch_all(database.SELECT_ALL_ZONES)]
+    return coordinates, zones
+
+
+def run(coordinates, zones, time_scale, fixed=None):
+    device = SimulatedDobot(time_scale=time_scale, serial_latency=0)
+    planner = RoutePlanner()
+    velocity, acceleration = fixed or PROFILES["transit"]
+    cycle_time = 0.0
+    speed_commands = 0
+    skipped = 0
+    for zone in zones:
+        for plan in (build_storage_plan(coordinates["pickup_zone"], zone, coordinates["safe_zone"]),
+                     build_pickup_plan(zone, coordinates["drop_zone"], coordinates["safe_zone"])):
+            plan, _ = planner.optimize(plan, start=planner.last_position, velocity=velocity, acceleration=acceleration)
+            planner.last_position = (plan.steps[-1].x, plan.steps[-1].y, plan.steps[-1].z, plan.steps[-1].r)
+            if fixed:
+                # What every operation did before: a blocking speed() and then the whole plan at that speed
+                device.speed(*fixed)
+                speed_commands += 1
+            else:
+                assign_profiles(plan)
+            execution = execute_plan(device, plan)
+            cycle_time += execution["cycle_time"]
+            speed_commands += execution["speed_changes"]
+            if not fixed:
+                skipped += sum(1 for step in plan.steps if step.speed) - execution["speed_changes"]
+    return cycle_time / time_scale, speed_commands, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--velocity", type=float, default=50)
+    parser.add_argument("--acceleration", type=float, default=50)
+    parser.add_argument("--time-scale", type=float, default=0.02, help="simulated seconds per real second")
+    args = parser.parse_args()
+
+    coordinates, zones = load_points()  # read only; ROBOT_DB_PATH selects the database
+    fixed_time, fixed_commands, _ = run(coordinates, zones, args.time_scale, (args.velocity, args.acceleration))
+    profile_time, profile_commands, skipped = run(coordinates, zones, args.time_scale)
+
+    operations = len(zones) * 2
+    print(f"{len(zones)} zones, {operations} operations (storage + pickup per zone)")
+    print(f"{'speed':<22} {'cycle s':>9} {'per op s':>9} {'speed cmds':>11} {'skipped':>8}")
+    print(f"{f'fixed {args.velocity:g}/{args.acceleration:g}':<22} {fixed_time:9.2f} {fixed_time / operations:9.2f} {fixed_commands:11d} {'':>8}")
+    print(f"{'profiles':<22} {profile_time:9.2f} {profile_time / operations:9.2f} {profile_commands:11d} {skipped:8d}")
+    print(f"profiles: {', '.join(f'{name} {v:g}/{a:g}' for name, (v, a) in PROFILES.items())}")
+    print(f"cycle time: {(1 - profile_time / fixed_time) * 100:.1f}% shorter with profiles")
+    database.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Compare blind 90 degree retries with the computed re-orientation on recorded footage.
+
+Every image in IMAGE_DIR is a frame of a package at the pickup zone. A re-orientation
+is replayed on the image itself: the blind strategy turns it by 90 degrees about the
+pickup point, the computed one turns it about the detected label by the computed angle
+and moves the label onto the pickup point. The decode pipeline then tries again, up to
+--max-attempts scans. The move time of each re-orientation comes from running its plan
+on the simulated arm; --settle adds the wait for the package to come to rest.
+
+Reports decoded scans, re-orientations per scan, seconds per successful scan and seconds
+per scan over all frames (failed scans included).
+
+Usage: python bench_reorient.py IMAGE_DIR [--calibration camera_calibration.json --arm arm1 | --mm-per-pixel 0.5]
+                                [--roi x,y,w,h] [--max-attempts 3] [--settle 0.5]
+"""
+import argparse
+import glob
+import os
+import time
+
+import cv2
+import numpy as np
+
+from decoder import DecodeConfig, DecodePipeline, parse_roi
+from motion import PICKUP_CLEARANCE, assign_profiles, build_recenter_plan, build_reorient_plan, execute_plan
+from simulation import SimulatedDobot
+from vision import READABLE_BAR_ANGLE, CalibrationStore, CameraCalibration, locate_label, plan_reorientation, wrap_angle
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+PICKUP_ZONE = {"x": -10.7, "y": -292.8, "z": -77.9}  # default pickup zone, only used for move times
+INITIAL_R = 50
+TIME_SCALE = 0.002
+
+
+def load_images(directory):
+    paths = sorted(path for pattern in IMAGE_PATTERNS for path in glob.glob(os.path.join(directory, pattern)))
+    images = [(os.path.basename(path), cv2.imread(path)) for path in paths]
+    return [(name, image) for name, image in images if image is not None]
+
+
+def simple_calibration(center, mm_per_pixel):
+    """Camera looking straight down with image x along arm x, centered on the pickup zone."""
+    u0, v0 = center
+    points = [{"u": u0 + du, "v": v0 + dv, "x": PICKUP_ZONE["x"] + du * mm_per_pixel, "y": PICKUP_ZONE["y"] - dv * mm_per_pixel}
+              for du, dv in ((-100, -100), (100, -100), (100, 100), (-100, 100))]
+    return CameraCalibration.fit(points)
+
+
+def pickup_pixel(calibration):
+    inverse = np.linalg.inv(calibration.homography)
+    u, v = cv2.perspectiveTransform(np.array([[[PICKUP_ZONE["x"], PICKUP_ZONE["y"]]]], dtype=np.float64), inverse)[0, 0]
+    return float(u), float(v)
+
+
+def turn(image, center, angle, target=None):
+    """The frame after the package was turned by 'angle' image degrees about 'center' and set down at 'target'."""
+    matrix = cv2.getRotationMatrix2D(center, -angle, 1.0)  # image angles grow from +x towards +y
+    if target is not None:
+        matrix[:, 2] += np.subtract(target, center)
+    return cv2.warpAffine(image, matrix, (image.shape[1], image.shape[0]), borderMode=cv2.BORDER_REPLICATE)
+
+
+def move_seconds(plan):
+    device = SimulatedDobot(time_scale=TIME_SCALE, serial_latency=0)
+    # Start where the arm waits during a scan: above the pickup zone
+    device.wait_for_cmd(device.move_to(PICKUP_ZONE["x"], PICKUP_ZONE["y"], PICKUP_ZONE["z"] + PICKUP_CLEARANCE, INITIAL_R))
+    execution = execute_plan(device, assign_profiles(plan))
+    return execution["cycle_time"] / TIME_SCALE
+
+
+def scan(pipeline, image, roi, calibration, max_attempts, settle, computed, blind_seconds):
+    """Replay one scan. Returns (decoded, re-orientations, seconds)."""
+    center = pickup_pixel(calibration)
+    seconds = 0.0
+    moves = 0
+    computed_done = False
+    for attempt in range(max_attempts):
+        started = time.perf_counter()
+        found = pipeline.decode_frame(image)
+        seconds += time.perf_counter() - started
+        if found:
+            return True, moves, seconds
+        reorientation = None
+        if computed and not computed_done:
+            reorientation = plan_reorientation(image, calibration, PICKUP_ZONE, roi=roi)
+        if reorientation:
+            # One computed move; later misses fall back to blind turns
+            computed_done = True
+            image = turn(image, reorientation["pixel"], wrap_angle(READABLE_BAR_ANGLE - reorientation["bar_angle"]), center)
+            seconds += move_seconds(build_recenter_plan(PICKUP_ZONE, reorientation["grab"], INITIAL_R, reorientation["rotation"]))
+        else:
+            image = turn(image, center, 90)
+            seconds += blind_seconds
+        seconds += settle
+        moves += 1
+    return False, moves, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("images", help="Directory with recorded frames of the pickup area")
+    parser.add_argument("--calibration", default="", help="calibration file written by POST /camera/calibration")
+    parser.add_argument("--arm", default="arm1")
+    parser.add_argument("--mm-per-pixel", type=float, default=0.5, help="used without --calibration")
+    parser.add_argument("--roi", default=os.environ.get("BARCODE_ROI", ""))
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--settle", type=float, default=0.5, help="seconds for the package to come to rest")
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    if not images:
+        print(f"No images found in {args.images}")
+        return
+    roi = parse_roi(args.roi)
+    if args.calibration:
+        calibration = CalibrationStore(args.calibration).get(args.arm)
+        if calibration is None:
+            print(f"No calibration for {args.arm} in {args.calibration}")
+            return
+    else:
+        height, width = images[0][1].shape[:2]
+        calibration = simple_calibration((width / 2, height / 2), args.mm_per_pixel)
+
+    blind_seconds = move_seconds(build_reorient_plan(PICKUP_ZONE, INITIAL_R, 90))
+    labels = sum(1 for _, image in images if locate_label(image, roi))
+    print(f"{len(images)} frames, label located in {labels}; blind re-orientation move {blind_seconds:.2f} s, "
+          f"settle {args.settle:.2f} s, up to {args.max_attempts} scans")
+    print(f"{'strategy':<9} {'decoded':>9} {'reorients/scan':>15} {'s/successful scan':>18} {'s/scan':>7} {'worst s':>8}")
+    for strategy in ("blind", "computed"):
+        pipeline = DecodePipeline(DecodeConfig(roi=roi))
+        results = [scan(pipeline, image, roi, calibration, args.max_attempts, args.settle, strategy == "computed", blind_seconds)
+                   for _, image in images]
+        decoded = [result for result in results if result[0]]
+        moves = sum(result[1] for result in results) / len(results)
+        per_scan = sum(result[2] for result in decoded) / len(decoded) if decoded else float("nan")
+        mean = sum(result[2] for result in results) / len(results)
+        worst = max(result[2] for result in results)
+        print(f"{strategy:<9} {f'{len(decoded)}/{len(results)}':>9} {moves:15.2f} {per_scan:18.2f} {mean:7.2f} {worst:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
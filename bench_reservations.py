@@ -0,0 +1,202 @@
+"""Stress zone reservations from many processes and threads and check that no zone is double-booked.
+
+Every worker thread picks random zones and stores into or picks up from them as fast as it can:
+reserve, hold, in_transit, hold, occupied/available, with --rollback of the operations given
+back half way instead. The time each worker holds a zone is logged; afterwards the holds of
+every zone must not overlap. The same load runs against the old check-then-write pattern
+(SELECT the status, then UPDATE it) for comparison. Works on a temporary copy of
+robot_zones.db whose zones are replaced by --zones test zones, so the real database is never touched.
+
+Usage: python bench_reservations.py [--processes 4] [--threads 8] [--seconds 5] [--zones 20] [--hold 0.001]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import database
+from cache import ZoneCache, AVAILABLE, RESERVED, PICKUP_RESERVED, IN_TRANSIT, OCCUPIED
+
+
+def setup(directory, zones):
+    path = os.path.join(directory, "reservations.db")
+    shutil.copy(database.DB_PATH, path)
+    database.DB_PATH = path
+    database.initialize_database()
+    with database.transaction() as conn:
+        conn.execute("DELETE FROM zones")
+        conn.executemany("INSERT INTO zones (name, x, y, z, status) VALUES (?, 200, 0, -72, 'available')",
+                         [(f"S{number}",) for number in range(zones)])
+    database.close_all()
+    return path
+
+
+class Reservations:
+    """The conditional updates of ZoneCache."""
+
+    def __init__(self):
+        self.cache = ZoneCache()
+        self.cache.load()
+
+    def take(self, zone_id):
+        """Returns (token, storage?) or (None, None)."""
+        token = self.cache.reserve(zone_id)
+        if token:
+            return token, True
+        token = self.cache.reserve(zone_id, from_status=OCCUPIED, to_status=PICKUP_RESERVED)
+        return (token, False) if token else (None, None)
+
+    def move(self, zone_id, token, storage):
+        return self.cache.transition(zone_id, token, RESERVED if storage else PICKUP_RESERVED, IN_TRANSIT)
+
+    def finish(self, zone_id, token, storage):
+        return self.cache.transition(zone_id, token, IN_TRANSIT, OCCUPIED if storage else AVAILABLE, release=True)
+
+    def give_back(self, zone_id, token, storage):
+        return bool(self.cache.release(token, zone_id))
+
+
+class CheckThenWrite:
+    """What /storage/ did before: read the status, decide, write it in a separate statement."""
+
+    def take(self, zone_id):
+        status = database.fetch_one("SELECT status FROM zones WHERE name = ?", (zone_id,))[0]
+        if status == AVAILABLE:
+            database.execute(database.UPDATE_ZONE_STATUS, (RESERVED, zone_id))
+            return "legacy", True
+        if status == OCCUPIED:
+            database.execute(database.UPDATE_ZONE_STATUS, (PICKUP_RESERVED, zone_id))
+            return "legacy", False
+        return None, None
+
+    def move(self, zone_id, token, storage):
+        database.execute(database.UPDATE_ZONE_STATUS, (IN_TRANSIT, zone_id))
+        return True
+
+    def finish(self, zone_id, token, storage):
+        database.execute(database.UPDATE_ZONE_STATUS, (OCCUPIED if storage else AVAILABLE, zone_id))
+        return True
+
+    def give_back(self, zone_id, token, storage):
+        database.execute(database.UPDATE_ZONE_STATUS, (AVAILABLE if storage else OCCUPIED, zone_id))
+        return True
+
+
+def worker(path, mode, threads, seconds, zones, hold, rollback, seed):
+    """One process. Returns (holds, attempts, lost, latencies): holds are (zone, start, end, ok)."""
+    database.DB_PATH = path
+    strategy = Reservations() if mode == "conditional" else CheckThenWrite()
+    names = [f"S{number}" for number in range(zones)]
+    holds, latencies = [], []
+    counts = {"attempts": 0, "lost": 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def run(number):
+        rng = random.Random(seed * 1000 + number)
+        while time.monotonic() < deadline:
+            zone_id = rng.choice(names)
+            started = time.monotonic()
+            token, storage = strategy.take(zone_id)
+            taken = time.monotonic()
+            with lock:
+                counts["attempts"] += 1
+                latencies.append(taken - started)
+                if token is None:
+                    counts["lost"] += 1
+            if token is None:
+                continue
+            time.sleep(hold)
+            if rng.random() < rollback:
+                end = time.monotonic()
+                ok = strategy.give_back(zone_id, token, storage)
+            else:
+                ok = strategy.move(zone_id, token, storage)
+                time.sleep(hold)
+                end = time.monotonic()
+                ok = strategy.finish(zone_id, token, storage) and ok
+            with lock:
+                holds.append((zone_id, taken, end, ok))
+
+    workers = [threading.Thread(target=run, args=(number,)) for number in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    database.close_all()
+    return holds, counts["attempts"], counts["lost"], latencies
+
+
+def double_bookings(holds):
+    """Number of holds that started before the previous hold of the same zone had ended."""
+    by_zone = {}
+    for zone_id, start, end, _ in holds:
+        by_zone.setdefault(zone_id, []).append((start, end))
+    overlaps = 0
+    for intervals in by_zone.values():
+        intervals.sort()
+        latest_end = float("-inf")
+        for start, end in intervals:
+            if start < latest_end:
+                overlaps += 1
+            latest_end = max(latest_end, end)
+    return overlaps
+
+
+def leftovers(path):
+    """Zones still reserved or in transit, or holding a token, after every worker finished."""
+    database.DB_PATH = path
+    rows = database.fetch_all("SELECT name FROM zones WHERE status NOT IN ('available', 'occupied') OR reservation IS NOT NULL")
+    database.close_all()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="worker threads per process")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--zones", type=int, default=20, help="fewer zones, more contention")
+    parser.add_argument("--hold", type=float, default=0.001, help="seconds in each state, stands in for the arm")
+    parser.add_argument("--rollback", type=float, default=0.1, help="share of operations given back half way")
+    args = parser.parse_args()
+
+    source = database.DB_PATH
+    directory = tempfile.mkdtemp(prefix="reservations_bench_")
+    context = multiprocessing.get_context("spawn")
+    print(f"{args.processes} processes x {args.threads} threads, {args.zones} zones, {args.seconds:g} s per mode")
+    print(f"{'mode':<16} {'attempts':>9} {'won':>7} {'lost':>7} {'ops/s':>8} {'p50 ms':>7} {'p95 ms':>7} "
+          f"{'double-booked':>14} {'left over':>10}")
+    failed = False
+    try:
+        for mode in ("check-then-write", "conditional"):
+            database.DB_PATH = source
+            path = setup(directory, args.zones)
+            with context.Pool(args.processes) as pool:
+                results = pool.starmap(worker, [(path, mode, args.threads, args.seconds, args.zones, args.hold, args.rollback, seed)
+                                                for seed in range(args.processes)])
+            holds = [hold for result in results for hold in result[0]]
+            attempts = sum(result[1] for result in results)
+            lost = sum(result[2] for result in results)
+            latencies = sorted(latency for result in results for latency in result[3])
+            overlaps = double_bookings(holds)
+            left = leftovers(path)
+            print(f"{mode:<16} {attempts:9d} {len(holds):7d} {lost:7d} {len(holds) / args.seconds:8.0f} "
+                  f"{latencies[len(latencies) // 2] * 1000:7.2f} {latencies[int(len(latencies) * 0.95)] * 1000:7.2f} "
+                  f"{overlaps:14d} {left:10d}")
+            if mode == "conditional" and (overlaps or left or not all(hold[3] for hold in holds)):
+                failed = True
+    finally:
+        database.DB_PATH = source
+        shutil.rmtree(directory, ignore_errors=True)
+    if failed:
+        raise SystemExit("Conditional reservations double-booked a zone or left one behind.")
+    print("conditional reservations: no double bookings")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark /zones/search lookups as the zones table grows.
+
+Fills temporary databases with N synthetic stored products and times exact code,
+prefix, type+status and time-range searches with and without the secondary indexes.
+
+Usage: python bench_search.py [--sizes 1000,10000,100000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import database
+
+PRODUCT_TYPES = ["food", "parts", "tools", "medical", "textile", "paper", "misc", "glass"]
+
+
+def fill(size):
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(size):
+        occupied = i % 4 != 0
+        rows.append((
+            f"Z{i}", 200 + i % 100, -150 + i % 300, -72,
+            "occupied" if occupied else "available",
+            f"P{random.randrange(10 ** 8):08d}" if occupied else None,
+            random.choice(PRODUCT_TYPES) if occupied else None,
+            None,
+            (start + timedelta(minutes=i)).isoformat() if occupied else None,
+        ))
+    with database.transaction() as conn:
+        conn.executemany("INSERT OR IGNORE INTO zones (name, x, y, z, status, productCode, productType, additionalInfo, datetime) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return [row[5] for row in rows if row[5]], start
+
+
+def time_queries(queries):
+    latencies = []
+    for kwargs in queries:
+        started = time.perf_counter()
+        database.search_zones(**kwargs)
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(1)
+    workdir = tempfile.mkdtemp(prefix="bench_search_")
+    try:
+        print(f"{'rows':>8} {'indexes':>8} | {'code':>9} {'prefix':>9} {'type+status':>12} {'time range':>11}  (median us)")
+        for size in (int(value) for value in args.sizes.split(",")):
+            database.close_all()
+            database.DB_PATH = os.path.join(workdir, f"zones_{size}.db")
+            database.initialize_database()
+            codes, start = fill(size)
+            queries = {
+                "code": [{"product_code": random.choice(codes)} for _ in range(args.queries)],
+                "prefix": [{"code_prefix": random.choice(codes)[:5], "limit": 50} for _ in range(args.queries)],
+                "type+status": [{"product_type": random.choice(PRODUCT_TYPES), "status": "occupied", "limit": 50}
+                                for _ in range(args.queries)],
+                "time range": [{"stored_after": (start + timedelta(minutes=offset)).isoformat(),
+                                "stored_before": (start + timedelta(minutes=offset + 60)).isoformat()}
+                               for offset in (random.randrange(size) for _ in range(args.queries))],
+            }
+            for indexed in (False, True):
+                with database.transaction() as conn:
+                    if indexed:
+                        database.create_indexes(conn)
+                    else:
+                        for index_name in database.ZONE_INDEXES:
+                            conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+                    conn.execute("ANALYZE")
+                results = [time_queries(queries[name]) for name in ("code", "prefix", "type+status", "time range")]
+                print(f"{size:8d} {'yes' if indexed else 'no':>8} | {results[0]:9.1f} {results[1]:9.1f} {results[2]:12.1f} {results[3]:11.1f}")
+    finally:
+        database.close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark ZoneIndex queries on a synthetic multi-rack layout.
+
+Builds N zones spread over several racks, marks a share of them occupied and times
+nearest-available, k-nearest and bounding-box queries against a plain Python scan.
+
+Usage: python bench_spatial_index.py [--zones 5000] [--racks 4] [--occupied 0.7] [--queries 2000]
+"""
+import argparse
+import math
+import random
+import time
+
+from spatial_index import ZoneIndex
+
+
+def make_zones(count, racks, occupied):
+    """Zones on a grid of slots per rack, racks placed around the arm base."""
+    per_rack = math.ceil(count / racks)
+    columns = math.ceil(math.sqrt(per_rack))
+    zones = []
+    for i in range(count):
+        rack, slot = divmod(i, per_rack)
+        angle = math.radians(-90 + 180 * rack / max(racks - 1, 1))
+        radius = 180 + (slot % columns) * 2
+        zones.append({
+            "name": f"R{rack}-{slot}",
+            "x": radius * math.cos(angle) + slot // columns * 0.5,
+            "y": radius * math.sin(angle),
+            "z": -72 + (slot // columns) % 5 * 40,
+            "status": "occupied" if random.random() < occupied else "available",
+        })
+    return zones
+
+
+def scan_nearest(zones, x, y, k):
+    free = [zone for zone in zones if zone["status"] == "available"]
+    free.sort(key=lambda zone: math.hypot(zone["x"] - x, zone["y"] - y))
+    return [zone["name"] for zone in free[:k]]
+
+
+def scan_within(zones, min_x, min_y, max_x, max_y):
+    return [zone["name"] for zone in zones if min_x <= zone["x"] <= max_x and min_y <= zone["y"] <= max_y]
+
+
+def timed(label, queries, func):
+    started = time.perf_counter()
+    for query in queries:
+        func(*query)
+    elapsed = time.perf_counter() - started
+    print(f"{label:>28}: {elapsed / len(queries) * 1e6:9.1f} us/query")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--zones", type=int, default=5000)
+    parser.add_argument("--racks", type=int, default=4)
+    parser.add_argument("--occupied", type=float, default=0.7, help="Share of zones that are occupied")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    zones = make_zones(args.zones, args.racks, args.occupied)
+    started = time.perf_counter()
+    index = ZoneIndex(zones)
+    print(f"{len(index)} zones, {args.racks} racks, built in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    points = [(random.uniform(-300, 300), random.uniform(-300, 300)) for _ in range(args.queries)]
+    boxes = [(x, y, x + 40, y + 40) for x, y in points]
+
+    # Sanity check: both implementations agree
+    for x, y in points[:20]:
+        assert [name for name, _ in index.nearest(x, y, k=5)] == scan_nearest(zones, x, y, 5)
+
+    timed("scan nearest", points, lambda x, y: scan_nearest(zones, x, y, 1))
+    timed("index nearest", points, lambda x, y: index.nearest(x, y))
+    timed("index 10-nearest", points, lambda x, y: index.nearest(x, y, k=10))
+    timed("index nearest (3d)", points, lambda x, y: index.nearest(x, y, 0, k=1))
+    timed("scan bbox", boxes, lambda *box: scan_within(zones, *box))
+    timed("index bbox", boxes, lambda *box: index.within(*box))
+    names = [zone["name"] for zone in zones]
+    timed("index set_status", points, lambda x, y: index.set_status(random.choice(names), "available"))
+
+
+if __name__ == "__main__":
+    main()
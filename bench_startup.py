@@ -0,0 +1,81 @@
+"""Measure time to first response and time to ready of the API process.
+
+Starts uvicorn with the simulated arm and camera, whose connect takes --connect-delay seconds
+like opening a real Dobot's serial port, and polls /zones/ and /health/ready until they
+answer 200. Runs once with the old blocking startup (STARTUP_WAIT_FOR_HARDWARE=1) and once
+with hardware brought up in the background. Uses a temporary copy of robot_zones.db.
+
+Usage: python bench_startup.py [--connect-delay 2] [--arms 1] [--runs 3] [--port 8765]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+import database
+
+
+def status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return None
+
+
+def start_once(port, env, timeout=60):
+    """Returns (seconds to the first /zones/ response, seconds to /health/ready == 200)."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    first_response = ready = None
+    try:
+        while time.perf_counter() - started < timeout and ready is None:
+            if first_response is None and status(f"http://127.0.0.1:{port}/zones/") == 200:
+                first_response = time.perf_counter() - started
+            if first_response is not None and status(f"http://127.0.0.1:{port}/health/ready") == 200:
+                ready = time.perf_counter() - started
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        process.wait(10)
+    return first_response, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connect-delay", type=float, default=2.0, help="seconds to connect one simulated arm")
+    parser.add_argument("--arms", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="startup_bench_")
+    try:
+        path = os.path.join(directory, "robot_zones.db")
+        shutil.copy(database.DB_PATH, path)
+        env = dict(os.environ, ROBOT_DB_PATH=path, DOBOT_BACKEND="sim", CAMERA_BACKEND="sim", BARCODE_PREVIEW="0",
+                   SIM_CONNECT_DELAY=str(args.connect_delay), FLEET_SIM_ARMS=str(args.arms))
+        print(f"{args.arms} simulated arm(s), {args.connect_delay:g} s to connect each, {args.runs} runs")
+        print(f"{'startup':<12} {'first response s':>17} {'ready s':>9}")
+        for label, wait in (("blocking", "1"), ("background", "0")):
+            results = [start_once(args.port, dict(env, STARTUP_WAIT_FOR_HARDWARE=wait)) for _ in range(args.runs)]
+            first = [result[0] for result in results if result[0] is not None]
+            ready = [result[1] for result in results if result[1] is not None]
+            if not first or not ready:
+                print(f"{label:<12} did not come up, check that uvicorn and the dependencies are installed")
+                continue
+            print(f"{label:<12} {sorted(first)[len(first) // 2]:17.3f} {sorted(ready)[len(ready) // 2]:9.3f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
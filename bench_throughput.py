@@ -0,0 +1,206 @@
+"""End-to-end throughput benchmark on the simulated arm and camera.
+
+Drives /storage/ + /pickup-from-store/ cycles from several clients while other clients
+poll /zones/, then reports ops/hour and p50/p95/p99 latency per endpoint. With --batch N
+each client stores N packages per /storage/batch call instead. Runs the app in-process
+against a temporary copy of robot_zones.db, so no hardware is needed.
+
+Usage: python bench_throughput.py [--clients 2] [--cycles 5] [--batch 0] [--zone-readers 4] [--conditional] [--time-scale 0.05]
+                                  [--json results.json] [--max-p95-ms storage=60000]
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.packages = 0  # packages stored
+        self.zones_bytes = 0  # /zones/ payload received
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.zones_bytes += count
+
+    def add_packages(self, count):
+        with self._lock:
+            self.packages += count
+
+    def record(self, name, seconds, ok=True):
+        with self._lock:
+            if ok:
+                self.latencies.setdefault(name, []).append(seconds)
+            else:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def report(self, wall_seconds):
+        results = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            values = self.latencies.get(name, [])
+            results[name] = {
+                "count": len(values),
+                "errors": self.errors.get(name, 0),
+                "ops_per_hour": len(values) / wall_seconds * 3600 if wall_seconds else None,
+                "p50_ms": percentile(values, 0.50) * 1000 if values else None,
+                "p95_ms": percentile(values, 0.95) * 1000 if values else None,
+                "p99_ms": percentile(values, 0.99) * 1000 if values else None,
+            }
+        return results
+
+
+def wait_for_job(client, job_id, poll_interval=0.02, timeout=600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(poll_interval)
+    return None
+
+
+def run_job(client, recorder, name, method, url, **kwargs):
+    """Submit an operation and time it from the HTTP call until the job finishes."""
+    started = time.perf_counter()
+    response = getattr(client, method)(url, **kwargs)
+    if response.status_code != 202:
+        recorder.record(name, 0, ok=False)
+        return None
+    job = wait_for_job(client, response.json()["job_id"])
+    ok = job is not None and job["status"] == "succeeded"
+    recorder.record(name, time.perf_counter() - started, ok)
+    return job if ok else None
+
+
+def operations_client(client, recorder, zones, cycles):
+    for cycle in range(cycles):
+        zone_id = zones[cycle % len(zones)]
+        stored = run_job(client, recorder, "storage", "post", "/storage/",
+                         json={"zone_id": zone_id, "productType": "bench", "additionalInfo": f"cycle {cycle}"})
+        if stored:
+            recorder.add_packages(1)
+            run_job(client, recorder, "pickup", "post", "/pickup-from-store/", params={"zone_id": zone_id})
+
+
+def batch_client(client, recorder, batch_size, cycles):
+    for cycle in range(cycles):
+        items = [{"productType": "bench", "additionalInfo": f"cycle {cycle} item {i}"} for i in range(batch_size)]
+        job = run_job(client, recorder, "storage_batch", "post", "/storage/batch", json={"items": items})
+        stored = [item["zone_id"] for item in job["result"]["items"] if item["status"] == "success"] if job else []
+        recorder.add_packages(len(stored))
+        for zone_id in stored:
+            run_job(client, recorder, "pickup", "post", "/pickup-from-store/", params={"zone_id": zone_id})
+
+
+def zones_client(client, recorder, stop, conditional=False):
+    etag = None
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.get("/zones/", headers={"If-None-Match": etag} if etag else None)
+        recorder.record("zones", time.perf_counter() - started, response.status_code in (200, 304))
+        recorder.add_bytes(len(response.content))
+        if conditional:
+            etag = response.headers.get("etag")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2, help="Concurrent storage/pickup clients")
+    parser.add_argument("--cycles", type=int, default=5, help="Storage + pickup cycles per client")
+    parser.add_argument("--batch", type=int, default=0, help="Packages per /storage/batch call (0: one /storage/ call per package)")
+    parser.add_argument("--zone-readers", type=int, default=4, help="Concurrent /zones/ pollers")
+    parser.add_argument("--conditional", action="store_true", help="/zones/ readers poll with If-None-Match")
+    parser.add_argument("--time-scale", type=float, default=0.05, help="Simulated arm time scale")
+    parser.add_argument("--camera-source", default="", help="Image directory or video to replay (default: synthetic QR code)")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--max-p95-ms", action="append", default=[],
+                        help="Fail if an endpoint's p95 exceeds a limit, e.g. storage=60000 (repeatable)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_throughput_")
+    db_path = os.path.join(workdir, "robot_zones.db")
+    shutil.copy("robot_zones.db", db_path)
+    os.environ.update({
+        "ROBOT_DB_PATH": db_path,
+        "DOBOT_BACKEND": "sim",
+        "CAMERA_BACKEND": "sim",
+        "SIM_TIME_SCALE": str(args.time_scale),
+        "SIM_CAMERA_SOURCE": args.camera_source,
+        "BARCODE_PREVIEW": "0",
+    })
+
+    # Imported here so the environment above is in place first
+    from fastapi.testclient import TestClient
+    import main as app_module
+
+    recorder = Recorder()
+    try:
+        with TestClient(app_module.app) as client:
+            zones = [zone["name"] for zone in client.get("/zones/").json()["zones"] if zone["status"] == "available"]
+            if not zones:
+                print("No available zones in the database")
+                return 1
+            stop = threading.Event()
+            readers = [threading.Thread(target=zones_client, args=(client, recorder, stop, args.conditional)) for _ in range(args.zone_readers)]
+            if args.batch:
+                operators = [threading.Thread(target=batch_client, args=(client, recorder, args.batch, args.cycles))
+                             for _ in range(args.clients)]
+            else:
+                operators = [threading.Thread(target=operations_client,
+                                              args=(client, recorder, zones[i::args.clients] or zones[:1], args.cycles))
+                             for i in range(args.clients)]
+            started = time.perf_counter()
+            for thread in readers + operators:
+                thread.start()
+            for thread in operators:
+                thread.join()
+            stop.set()
+            for thread in readers:
+                thread.join()
+            wall_seconds = time.perf_counter() - started
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = recorder.report(wall_seconds)
+    print(f"{args.clients} clients x {args.cycles} cycles, {args.zone_readers} /zones/ readers, "
+          f"time scale {args.time_scale}, {wall_seconds:.1f}s wall clock")
+    for name, result in results.items():
+        p50, p95, p99 = (f"{result[key]:10.1f}" if result[key] is not None else f"{'-':>10}"
+                         for key in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"{name:>13}: {result['count']:6d} ok {result['errors']:4d} err | {result['ops_per_hour']:12.0f} ops/h | "
+              f"p50 {p50} ms | p95 {p95} ms | p99 {p99} ms")
+    packages_per_hour = recorder.packages / wall_seconds * 3600 if wall_seconds else 0
+    print(f"{recorder.packages} packages stored, {packages_per_hour:.0f} packages/h, "
+          f"{recorder.zones_bytes / 1024:.0f} KiB of /zones/ payload")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"wall_seconds": wall_seconds, "time_scale": args.time_scale, "packages_per_hour": packages_per_hour,
+                       "results": results}, f, indent=2)
+
+    failed = False
+    for limit in args.max_p95_ms:
+        name, value = limit.split("=")
+        p95 = results.get(name, {}).get("p95_ms")
+        if p95 is None or p95 > float(value):
+            print(f"FAIL: {name} p95 {p95} ms exceeds {value} ms")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
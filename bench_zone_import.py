@@ -0,0 +1,101 @@
+"""Time bulk zone provisioning: a generated rack of --zones zones imported in one transaction.
+
+Generates the rack, checks it against the default envelope, and times the single-transaction
+upsert (new zones), a re-import that moves every zone, a no-op re-import and the zone cache
+reload, next to inserting the same zones with one commit per zone as a baseline.
+Runs against temporary copies of robot_zones.db, so the real database is never touched.
+
+Usage: python bench_zone_import.py [--zones 10000] [--synchronous NORMAL] [--per-zone-limit 2000]
+"""
+import argparse
+import math
+import os
+import shutil
+import tempfile
+import time
+
+import database
+import layout
+from cache import ZoneCache
+from route_planner import Envelope
+
+
+def rack(count):
+    """A rack of about 'count' zones inside the default envelope, on two levels."""
+    levels = 2
+    columns = 100
+    rows = math.ceil(count / (levels * columns))
+    zones = layout.generate_rack({"x": 160, "y": -100, "z": -72}, rows, columns, row_pitch=120 / rows,
+                                 column_pitch=2, levels=levels, level_pitch=10, rack="R",
+                                 name_format="{rack}{row}{column}-{level}")
+    return zones[:count]
+
+
+def fresh_database(directory, name):
+    path = os.path.join(directory, name)
+    shutil.copy(database.DB_PATH, path)
+    database.close_all()
+    database.DB_PATH = path
+    database.initialize_database()
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--zones", type=int, default=10000)
+    parser.add_argument("--synchronous", default=database.SYNCHRONOUS)
+    parser.add_argument("--per-zone-limit", type=int, default=2000, help="zones inserted one commit at a time (extrapolated)")
+    args = parser.parse_args()
+    database.SYNCHRONOUS = args.synchronous.upper()
+
+    envelope = Envelope.from_env()
+    generate_seconds, zones = timed(rack, args.zones)
+    validate_seconds, (zones, errors) = timed(layout.validate_zones, zones, lambda name: [envelope])
+    if errors:
+        print(f"{len(errors)} generated zones were rejected, e.g. {errors[0]}")
+        return
+
+    directory = tempfile.mkdtemp(prefix="zone_import_")
+    try:
+        fresh_database(directory, "bulk.db")
+        cache = ZoneCache()
+        cache.load()
+        insert_seconds, inserted = timed(cache.upsert_positions, zones)
+        moved = [dict(zone, z=zone["z"] + 1) for zone in zones]
+        move_seconds, updated = timed(cache.upsert_positions, moved)
+        noop_seconds, unchanged = timed(cache.upsert_positions, moved)
+        reload_seconds, _ = timed(cache.load)
+        assert inserted["inserted"] == updated["updated"] == unchanged["unchanged"] == len(zones)
+        assert len(cache.index) >= len(zones)
+
+        fresh_database(directory, "per_zone.db")
+        sample = zones[:args.per_zone_limit]
+        started = time.perf_counter()
+        for zone in sample:
+            database.execute(database.UPSERT_ZONE_POSITION, (zone["name"], zone["x"], zone["y"], zone["z"]))
+        per_zone_seconds = (time.perf_counter() - started) / len(sample) * len(zones)
+        database.close_all()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{len(zones)} zones, synchronous={database.SYNCHRONOUS}")
+    print(f"{'step':<34} {'seconds':>9} {'zones/s':>10}")
+    for label, seconds in (
+            ("generate layout", generate_seconds),
+            ("validate (envelope)", validate_seconds),
+            ("import new, one transaction", insert_seconds),
+            ("import moved, one transaction", move_seconds),
+            ("import unchanged", noop_seconds),
+            ("zone cache + index reload", reload_seconds),
+            (f"one commit per zone (from {len(sample)})", per_zone_seconds)):
+        print(f"{label:<34} {seconds:9.3f} {len(zones) / seconds:10.0f}")
+    print(f"one transaction is {per_zone_seconds / insert_seconds:.0f}x faster than a commit per zone")
+
+
+if __name__ == "__main__":
+    main()
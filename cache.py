@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+import database
+from spatial_index import ZoneIndex
+
+
+ZONE_FIELDS = ("name", "x", "y", "z", "status", "productCode", "productType", "additionalInfo", "datetime")
+
+# Zone states. A storage goes available -> reserved -> in_transit -> occupied, a pickup
+# occupied -> pickup_reserved -> in_transit -> available. A reservation that is released or
+# expires goes back where it came from; a move that fails half way leaves the zone 'failed'
+# until an operator resolves it, as nobody knows where the package ended up.
+AVAILABLE = "available"
+RESERVED = "reserved"
+PICKUP_RESERVED = "pickup_reserved"
+IN_TRANSIT = "in_transit"
+OCCUPIED = "occupied"
+FAILED = "failed"
+
+ZONE_RESERVATION_TTL = float(os.environ.get("ZONE_RESERVATION_TTL", "600"))  # seconds a queued job may hold a zone
+ZONE_RESERVATION_SWEEP = float(os.environ.get("ZONE_RESERVATION_SWEEP", "5"))  # seconds between expiry checks
+
+
+class ZoneCache:
+    """In-memory copy of the coordinates and zones tables.
+
+    Reads are dictionary lookups. Every zone mutation goes through the write-through
+    methods below, which update SQLite first and then the cached row, so the cache
+    never holds data the database does not. Status changes are conditional updates
+    (reserve / transition / release), so no caller can overwrite a reserved zone. The spatial index over the zones is kept
+    in step with every status change.
+
+    Every mutation bumps 'version'. It starts from the load time in milliseconds, so it
+    keeps increasing across restarts and clients can use it as an ETag and for deltas.
+    """
+
+    def __init__(self, on_change=None):
+        self._lock = threading.RLock()
+        self.on_change = on_change  # called with (zone, version) after every change, zone is None after a reload
+        self._coordinates = {}
+        self._zones = {}
+        self.index = ZoneIndex()
+        self.version = 0
+        self._changed_at = {}  # zone name -> version of its last change
+        self._reloaded_at = 0  # version of the last full (re)load
+        self._snapshot = None  # (version, serialized /zones/ body)
+        self.loaded = False
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+
+    def load(self):
+        """(Re)load both tables from the database, discarding anything cached."""
+        coordinates = {
+            name: {"x": x, "y": y, "z": z}
+            for name, x, y, z in database.fetch_all(database.SELECT_ALL_COORDINATES)
+        }
+        zones = {row[0]: dict(zip(ZONE_FIELDS, row)) for row in database.fetch_all(database.SELECT_ALL_ZONES)}
+        with self._lock:
+            self._coordinates = coordinates
+            self._zones = zones
+            self.index.rebuild(zones.values())
+            self.version = max(self.version + 1, int(time.time() * 1000))
+            self._reloaded_at = self.version
+            self._changed_at = dict.fromkeys(zones, self.version)
+            self.loaded = True
+            if self.on_change:
+                self.on_change(None, self.version)
+
+    def invalidate(self):
+        self.load()
+
+    def get_coordinate(self, name: str):
+        with self._lock:
+            coordinate = self._coordinates.get(name)
+            return dict(coordinate) if coordinate else None
+
+    def get_zone(self, zone_id: str):
+        with self._lock:
+            zone = self._zones.get(zone_id)
+            return dict(zone) if zone else None
+
+    def get_zones(self):
+        with self._lock:
+            return [dict(zone) for zone in self._zones.values()]
+
+    def snapshot(self):
+        """Return (version, JSON body of /zones/), serialized once per version."""
+        with self._lock:
+            if self._snapshot is None or self._snapshot[0] != self.version:
+                body = json.dumps({"version": self.version, "zones": list(self._zones.values())}, separators=(",", ":"))
+                self._snapshot = (self.version, body.encode())
+            return self._snapshot
+
+    def changes_since(self, version: int):
+        """Zones changed after 'version'.
+
+        Returns (current version, full, zones). 'full' is True when the cache was
+        reloaded since then (or the version is unknown) and 'zones' holds every zone.
+        """
+        with self._lock:
+            if version < self._reloaded_at or version > self.version:
+                return self.version, True, [dict(zone) for zone in self._zones.values()]
+            changed = [dict(self._zones[name]) for name, changed_at in self._changed_at.items() if changed_at > version]
+            return self.version, False, changed
+
+    def get_available_zone_names(self):
+        with self._lock:
+            return [name for name, zone in self._zones.items() if zone["status"] == "available"]
+
+    # Reservations: conditional updates in SQLite first, the cached row only when they matched
+
+    def reserve(self, zone_id: str, from_status: str = AVAILABLE, to_status: str = RESERVED, token: str = None,
+                ttl: float = ZONE_RESERVATION_TTL):
+        """Take a zone that is in 'from_status' for one operation.
+
+        Returns the reservation token (a new one unless given), or None if the zone was not
+        in 'from_status', e.g. because a concurrent request took it first.
+        """
+        token = token or uuid.uuid4().hex
+        with self._lock:
+            if database.execute(database.RESERVE_ZONE, (to_status, token, time.time() + ttl, zone_id, from_status)) != 1:
+                return None
+            self._update(zone_id, status=to_status)
+            return token
+
+    def renew(self, zone_id: str, token: str, ttl: float = ZONE_RESERVATION_TTL):
+        """Extend a reservation (when its job starts). False if it expired or was released meanwhile."""
+        with self._lock:
+            return database.execute(database.RENEW_RESERVATION, (time.time() + ttl, zone_id, token)) == 1
+
+    def transition(self, zone_id: str, token, from_status: str, to_status: str, release: bool = False, **fields):
+        """Move a zone on from 'from_status' if it still holds 'token' (None: no reservation), setting 'fields'.
+
+        release=True ends the reservation. Returns False if the zone was not in that state.
+        """
+        unknown = set(fields) - set(ZONE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown zone fields: {', '.join(sorted(unknown))}")
+        assignments = ["status = ?"] + [f"{name} = ?" for name in fields]
+        if release:
+            assignments += ["reservation = NULL", "reserved_until = NULL"]
+        sql = f"UPDATE zones SET {', '.join(assignments)} WHERE name = ? AND status = ? AND reservation IS ?"
+        with self._lock:
+            if database.execute(sql, (to_status, *fields.values(), zone_id, from_status, token)) != 1:
+                return False
+            self._update(zone_id, status=to_status, **fields)
+            return True
+
+    def release(self, token: str, zone_id: str = None):
+        """Roll back the zone (default: every zone) still reserved under 'token'; returns their names."""
+        with self._lock:
+            if zone_id is None:
+                return self._rolled_back(database.execute_returning(database.RELEASE_RESERVATION, (token,)))
+            return self._rolled_back(database.execute_returning(database.RELEASE_ZONE_RESERVATION, (token, zone_id)))
+
+    def renew_all(self, tokens, ttl: float = ZONE_RESERVATION_TTL):
+        """Extend every zone held under any of 'tokens'."""
+        until = time.time() + ttl
+        for token in tokens:
+            database.execute(database.RENEW_RESERVATIONS, (until, token))
+
+    def expire_reservations(self, now: float = None):
+        with self._lock:
+            return self._rolled_back(database.execute_returning(database.EXPIRE_RESERVATIONS, (now or time.time(),)))
+
+    def _rolled_back(self, rows):
+        for name, status in rows:
+            self._update(name, status=status)
+        return [name for name, _ in rows]
+
+    def start_sweeper(self, interval: float = ZONE_RESERVATION_SWEEP, live_reservations=None, ttl: float = ZONE_RESERVATION_TTL):
+        """Background thread that rolls back expired reservations every 'interval' seconds.
+
+        'live_reservations' returns the tokens still owned by queued or running jobs; those
+        are renewed first, so a reservation only expires once nothing will use it.
+        """
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._stop_sweeper.clear()
+        self._sweeper = threading.Thread(target=self._sweep, args=(interval, live_reservations, ttl),
+                                         name="reservation-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop_sweeper.set()
+        if self._sweeper:
+            self._sweeper.join(2.0)
+            self._sweeper = None
+
+    def _sweep(self, interval: float, live_reservations, ttl: float):
+        while not self._stop_sweeper.wait(interval):
+            try:
+                if live_reservations:
+                    self.renew_all(live_reservations(), ttl)
+                expired = self.expire_reservations()
+                if expired:
+                    print(f"Reservations expired, zones released: {', '.join(expired)}")
+            except Exception as e:
+                print(f"Reservation sweep failed: {e}")
+
+    def upsert_positions(self, zones, dry_run: bool = False):
+        """Bulk insert or move zones (database.upsert_zone_positions), then reload so the index covers them."""
+        with self._lock:
+            counts = database.upsert_zone_positions(zones, dry_run)
+            if not dry_run and (counts["inserted"] or counts["updated"]):
+                self.load()
+            return counts
+
+    def _update(self, zone_id: str, **fields):
+        zone = self._zones.get(zone_id)
+        if zone is not None:
+            zone.update(fields)
+            self.version += 1
+            self._changed_at[zone_id] = self.version
+            if self.on_change:
+                self.on_change(dict(zone), self.version)
+            if "status" in fields:
+                self.index.set_status(zone_id, fields["status"])
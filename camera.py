@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+import metrics
+
+
+CAMERA_INDEX = int(os.environ.get("CAMERA_INDEX", "0"))
+CAMERA_BUFFER_SIZE = int(os.environ.get("CAMERA_BUFFER_SIZE", "8"))
+# Reopen the device after this many consecutive failed reads
+MAX_CONSECUTIVE_FAILURES = 30
+
+
+class CameraService:
+    """Long-lived camera owner.
+
+    A background thread keeps grabbing frames into a preallocated ring buffer of the
+    newest N frames, so callers get the freshest frame without opening the device or
+    draining stale buffered frames.
+    """
+
+    def __init__(self, source=CAMERA_INDEX, buffer_size: int = CAMERA_BUFFER_SIZE):
+        self.source = source
+        self.buffer_size = buffer_size
+        self._capture = None
+        self._buffer = None  # (buffer_size, height, width, channels) uint8, allocated on the first frame
+        self._timestamps = np.zeros(buffer_size, dtype=np.float64)
+        self._sequence = 0  # number of frames written so far; newest frame is in slot (sequence - 1) % N
+        self._last_consumed = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+        # Counters
+        self.frames_captured = 0
+        self.read_failures = 0
+        self.dropped_frames = 0  # frames overwritten without ever being handed to a consumer
+        self.reconnects = 0
+        self.fps = 0.0
+        self.started_at = None
+
+    @property
+    def is_running(self):
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def open_capture(self):
+        """Open the underlying capture device. Overridden by other camera backends."""
+        return cv2.VideoCapture(self.source)
+
+    def start(self):
+        if self.is_running:
+            return
+        self._running = True
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name="camera-grabber", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._release()
+
+    def _release(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def _store(self, frame):
+        with self._condition:
+            if self._buffer is None or self._buffer.shape[1:] != frame.shape:
+                self._buffer = np.empty((self.buffer_size,) + frame.shape, dtype=frame.dtype)
+            slot = self._sequence % self.buffer_size
+            np.copyto(self._buffer[slot], frame)
+            self._timestamps[slot] = time.time()
+            self._sequence += 1
+            # The frame we just overwrote was never handed out
+            if self._sequence - self._last_consumed > self.buffer_size:
+                self.dropped_frames += 1
+                self._last_consumed = self._sequence - self.buffer_size
+            self._condition.notify_all()
+
+    def _run(self):
+        failures = 0
+        window_start = time.perf_counter()
+        window_frames = 0
+        while self._running:
+            if self._capture is None or not self._capture.isOpened():
+                self._release()
+                self._capture = self.open_capture()
+                if not self._capture.isOpened():
+                    print("Could not open the webcam, retrying in 1 second")
+                    time.sleep(1)
+                    continue
+
+            with metrics.timed("frame_grab_seconds"):
+                ret, frame = self._capture.read()
+            if not ret:
+                self.read_failures += 1
+                failures += 1
+                if failures >= MAX_CONSECUTIVE_FAILURES:
+                    print("Camera stopped delivering frames, reopening the device")
+                    self._release()
+                    self.reconnects += 1
+                    failures = 0
+                time.sleep(0.01)
+                continue
+
+            failures = 0
+            self._store(frame)
+            self.frames_captured += 1
+
+            window_frames += 1
+            elapsed = time.perf_counter() - window_start
+            if elapsed >= 1.0:
+                self.fps = window_frames / elapsed
+                window_start = time.perf_counter()
+                window_frames = 0
+        self._release()
+
+    def get_latest_frame(self, after: int = None, timeout: float = 5.0):
+        """Return (sequence, timestamp, frame) for the newest frame.
+
+        If 'after' is given, wait until a frame newer than that sequence number is
+        available, so consecutive calls never return the same frame twice.
+        Returns None if no such frame arrives within 'timeout' seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with metrics.timed("frame_wait_seconds"), self._condition:
+            while self._sequence == 0 or (after is not None and self._sequence <= after):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._condition.wait(remaining)
+            slot = (self._sequence - 1) % self.buffer_size
+            self._last_consumed = self._sequence
+            return self._sequence, float(self._timestamps[slot]), self._buffer[slot].copy()
+
+    def get_recent_frames(self, count: int = None):
+        """Return up to 'count' newest frames as a list of (sequence, timestamp, frame), oldest first."""
+        with self._condition:
+            available = min(self._sequence, self.buffer_size)
+            count = available if count is None else min(count, available)
+            frames = []
+            for sequence in range(self._sequence - count + 1, self._sequence + 1):
+                slot = (sequence - 1) % self.buffer_size
+                frames.append((sequence, float(self._timestamps[slot]), self._buffer[slot].copy()))
+            self._last_consumed = self._sequence
+            return frames
+
+    def stats(self):
+        return {
+            "running": self.is_running,
+            "source": str(self.source),
+            "buffer_size": self.buffer_size,
+            "frame_shape": list(self._buffer.shape[1:]) if self._buffer is not None else None,
+            "fps": round(self.fps, 2),
+            "frames_captured": self.frames_captured,
+            "dropped_frames": self.dropped_frames,
+            "read_failures": self.read_failures,
+            "reconnects": self.reconnects,
+            "latest_frame_age": time.time() - float(self._timestamps[(self._sequence - 1) % self.buffer_size])
+            if self._sequence else None,
+        }
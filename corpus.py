@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+import cv2
+import numpy as np
+
+from jobs import current_job
+
+
+# Directory to record the frames seen while scanning packages into; empty disables recording
+FRAME_CORPUS_DIR = os.environ.get("FRAME_CORPUS_DIR", "")
+FRAME_CORPUS_PER_ATTEMPT = int(os.environ.get("FRAME_CORPUS_PER_ATTEMPT", "5"))  # frames kept per scan attempt
+FRAME_CORPUS_MAX_MB = float(os.environ.get("FRAME_CORPUS_MAX_MB", "2048"))  # recording stops at this size
+FRAME_CORPUS_GRAYSCALE = os.environ.get("FRAME_CORPUS_GRAYSCALE", "0") != "0"  # a third of the size, like the decoder sees it
+FRAME_CORPUS_ROI_ONLY = os.environ.get("FRAME_CORPUS_ROI_ONLY", "0") != "0"  # keep only the decode ROI of each frame
+FRAME_CORPUS_MAX_PENDING = 64  # frames waiting for the writer; newer ones are dropped beyond this
+
+FRAMES_FILE = "frames.bin"
+INDEX_FILE = "index.jsonl"
+
+
+def new_scan_id():
+    return uuid.uuid4().hex[:12]
+
+
+class FrameCorpus:
+    """Append-only store of camera frames with what the decoder made of them.
+
+    Pixels go to one raw file (frames.bin) back to back and every frame gets a JSON line in
+    index.jsonl with its byte offset, shape and metadata, so CorpusReader can memory-map the
+    file and hand out frames without decoding or copying them. record() only queues a copy;
+    a writer thread appends it, so scans never wait on the disk. The index line is written
+    after the pixels, so a crash never leaves an entry pointing past the end of frames.bin.
+    """
+
+    def __init__(self, directory: str = FRAME_CORPUS_DIR, max_bytes: float = FRAME_CORPUS_MAX_MB * 1024 * 1024,
+                 grayscale: bool = FRAME_CORPUS_GRAYSCALE, roi_only: bool = FRAME_CORPUS_ROI_ONLY,
+                 max_pending: int = FRAME_CORPUS_MAX_PENDING):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.grayscale = grayscale
+        self.roi_only = roi_only
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._writer = None
+        self._size = 0
+        self.recorded = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def is_running(self):
+        return self._writer is not None and self._writer.is_alive()
+
+    def start(self):
+        with self._condition:
+            if self.is_running:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, FRAMES_FILE)
+            self._size = os.path.getsize(path) if os.path.exists(path) else 0  # appends to an existing corpus
+            self._stopping = False
+            self._writer = threading.Thread(target=self._run, name="frame-corpus-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the writer after it has written every queued frame."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._writer:
+            self._writer.join(timeout)
+            self._writer = None
+
+    def record(self, frame, roi=None, **metadata):
+        """Queue a copy of a BGR frame with its metadata (scan, attempt, found, data, decode_ms, ...).
+
+        'roi' is the decode ROI; with roi_only only that part is kept. The job ID and arm
+        of the job running on this thread are added. Returns False if the frame was dropped.
+        """
+        if not self.is_running:
+            return False
+        if self.roi_only and roi:
+            x, y, w, h = roi
+            frame = frame[y:y + h, x:x + w]
+            metadata["roi"] = list(roi)
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        frame = np.array(frame, copy=True, order="C")  # the caller may draw on its frame afterwards
+        job = current_job()
+        if job is not None:
+            metadata.setdefault("job_id", job.id)
+            metadata.setdefault("arm", job.kwargs.get("arm"))
+        metadata.setdefault("t", time.time())
+        with self._condition:
+            if len(self._pending) >= self.max_pending or self._size + frame.nbytes > self.max_bytes:
+                self.dropped += 1
+                return False
+            self._size += frame.nbytes
+            self._pending.append((frame, metadata))
+            self._condition.notify()
+        return True
+
+    def _run(self):
+        frames_path = os.path.join(self.directory, FRAMES_FILE)
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        with open(frames_path, "ab") as frames_file, open(index_path, "a") as index_file:
+            offset = frames_file.tell()
+            while True:
+                with self._condition:
+                    while not self._pending and not self._stopping:
+                        self._condition.wait()
+                    if not self._pending:
+                        return
+                    batch = list(self._pending)
+                    self._pending.clear()
+                try:
+                    lines = []
+                    for frame, metadata in batch:
+                        frames_file.write(memoryview(frame).cast("B"))
+                        lines.append(json.dumps({"offset": offset, "shape": list(frame.shape), "dtype": frame.dtype.str,
+                                                 **metadata}, separators=(",", ":"), default=str))
+                        offset += frame.nbytes
+                    frames_file.flush()
+                    index_file.write("\n".join(lines) + "\n")
+                    index_file.flush()
+                    self.recorded += len(batch)
+                except OSError as e:
+                    self.errors += 1
+                    print(f"Frame corpus write of {len(batch)} frames failed: {e}")
+                    offset = frames_file.tell()
+
+    def stats(self):
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            "directory": self.directory,
+            "running": self.is_running,
+            "recorded": self.recorded,
+            "pending": pending,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "size_mb": round(self._size / 1024 / 1024, 1),
+            "max_mb": round(self.max_bytes / 1024 / 1024, 1),
+            "grayscale": self.grayscale,
+            "roi_only": self.roi_only,
+        }
+
+
+class CorpusReader:
+    """Read-only view of a recorded corpus: frames are slices of one memory map, not copies."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.entries = []
+        with open(os.path.join(directory, INDEX_FILE)) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        break  # torn last line after a crash
+        path = os.path.join(directory, FRAMES_FILE)
+        size = os.path.getsize(path)
+        self.entries = [entry for entry in self.entries
+                        if entry["offset"] + int(np.prod(entry["shape"])) * np.dtype(entry["dtype"]).itemsize <= size]
+        self._map = np.memmap(path, dtype=np.uint8, mode="r") if size else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def frame(self, number: int):
+        entry = self.entries[number]
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"]))
+        return np.frombuffer(self._map, dtype=dtype, count=count, offset=entry["offset"]).reshape(entry["shape"])
+
+    def __iter__(self):
+        for number, entry in enumerate(self.entries):
+            yield entry, self.frame(number)
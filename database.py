@@ -0,0 +1,349 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+
+# Database settings (override with environment variables)
+DB_PATH = os.environ.get("ROBOT_DB_PATH", "robot_zones.db")
+# OFF | NORMAL | FULL | EXTRA. NORMAL is safe with WAL and avoids an fsync per commit.
+SYNCHRONOUS = os.environ.get("ROBOT_DB_SYNCHRONOUS", "NORMAL").upper()
+BUSY_TIMEOUT_MS = int(os.environ.get("ROBOT_DB_BUSY_TIMEOUT_MS", "5000"))
+STATEMENT_CACHE_SIZE = 128
+
+# SQL statements are kept as constants so every call reuses the same text and
+# hits sqlite3's per-connection prepared statement cache.
+SELECT_COORDINATE = "SELECT x, y, z FROM coordinates WHERE name = ?"
+SELECT_ALL_COORDINATES = "SELECT name, x, y, z FROM coordinates"
+SELECT_ZONE = "SELECT x, y, z, status, productCode, productType, additionalInfo FROM zones WHERE name = ?"
+SELECT_ALL_ZONES = "SELECT name, x, y, z, status, productCode, productType, additionalInfo, datetime FROM zones"
+SELECT_AVAILABLE_ZONE_NAMES = "SELECT name FROM zones WHERE status = 'available'"
+UPDATE_ZONE_STATUS = "UPDATE zones SET status = ? WHERE name = ?"
+# Bulk provisioning: new zones start out available, existing ones only get their position updated
+UPSERT_ZONE_POSITION = '''
+    INSERT INTO zones (name, x, y, z, status) VALUES (?, ?, ?, ?, 'available')
+    ON CONFLICT(name) DO UPDATE SET x = excluded.x, y = excluded.y, z = excluded.z
+'''
+
+# Reservations: every state change is one conditional UPDATE, so of two concurrent requests
+# for the same zone only one can win it. Expired or released reservations roll back to the
+# state they were taken from: 'reserved' (for a storage) to available, 'pickup_reserved' to occupied.
+RESERVE_ZONE = "UPDATE zones SET status = ?, reservation = ?, reserved_until = ? WHERE name = ? AND status = ?"
+RENEW_RESERVATION = "UPDATE zones SET reserved_until = ? WHERE name = ? AND reservation = ?"
+RENEW_RESERVATIONS = "UPDATE zones SET reserved_until = ? WHERE reservation = ?"
+_ROLLBACK = '''
+    UPDATE zones SET status = CASE status WHEN 'reserved' THEN 'available' ELSE 'occupied' END,
+                     reservation = NULL, reserved_until = NULL
+    WHERE status IN ('reserved', 'pickup_reserved') AND '''
+RELEASE_RESERVATION = _ROLLBACK + "reservation = ? RETURNING name, status"
+RELEASE_ZONE_RESERVATION = _ROLLBACK + "reservation = ? AND name = ? RETURNING name, status"
+EXPIRE_RESERVATIONS = _ROLLBACK + "reserved_until < ? RETURNING name, status"
+# After a restart no job holds a reservation any more; a package that was being moved may be anywhere
+RECOVER_RESERVATIONS = _ROLLBACK + "1 RETURNING name, status"
+RECOVER_IN_TRANSIT = "UPDATE zones SET status = 'failed', reservation = NULL, reserved_until = NULL WHERE status = 'in_transit' RETURNING name, status"
+
+# Secondary indexes for product search (name is already indexed by its UNIQUE constraint)
+ZONE_INDEXES = {
+    "idx_zones_productCode": "productCode",
+    "idx_zones_productType": "productType",
+    "idx_zones_status": "status",
+    "idx_zones_datetime": "datetime",
+    "idx_zones_reservation": "reservation",
+}
+SEARCH_MAX_LIMIT = 1000
+
+# Report queries filter the journal by kind or zone and a time range
+JOURNAL_INDEXES = {
+    "idx_journal_kind_t": "kind, t",
+    "idx_journal_zone_t": "zone, t",
+}
+
+# Metric label for each statement
+_QUERY_NAMES = {
+    SELECT_COORDINATE: "select_coordinate",
+    SELECT_ALL_COORDINATES: "select_all_coordinates",
+    SELECT_ZONE: "select_zone",
+    SELECT_ALL_ZONES: "select_all_zones",
+    SELECT_AVAILABLE_ZONE_NAMES: "select_available_zones",
+    UPDATE_ZONE_STATUS: "update_zone_status",
+    UPSERT_ZONE_POSITION: "upsert_zone_position",
+    RESERVE_ZONE: "reserve_zone",
+    RENEW_RESERVATION: "renew_reservation",
+    RENEW_RESERVATIONS: "renew_reservation",
+    RELEASE_RESERVATION: "release_reservation",
+    RELEASE_ZONE_RESERVATION: "release_reservation",
+    EXPIRE_RESERVATIONS: "expire_reservations",
+}
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+
+
+def _connect():
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={SYNCHRONOUS}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def get_connection():
+    """Return this thread's pooled connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _connect()
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+def close_all():
+    """Close every pooled connection (called on shutdown)."""
+    with _connections_lock:
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+    _local.__dict__.clear()
+
+
+@contextmanager
+def transaction():
+    """Run a block of writes on this thread's connection and commit once."""
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _query_name(sql: str):
+    return _QUERY_NAMES.get(sql) or sql.split(None, 1)[0].lower()
+
+
+def fetch_one(sql: str, params=()):
+    with metrics.timed("db_query_seconds", query=_query_name(sql)):
+        return get_connection().execute(sql, params).fetchone()
+
+
+def fetch_all(sql: str, params=()):
+    with metrics.timed("db_query_seconds", query=_query_name(sql)):
+        return get_connection().execute(sql, params).fetchall()
+
+
+def execute(sql: str, params=()):
+    """Execute a single write statement and commit. Returns the number of changed rows."""
+    with metrics.timed("db_query_seconds", query=_query_name(sql)):
+        with transaction() as conn:
+            return conn.execute(sql, params).rowcount
+
+
+def upsert_zone_positions(zones, dry_run: bool = False):
+    """Insert or move many zones ({"name", "x", "y", "z"}) in one transaction.
+
+    The write lock is taken up front so no storage or pickup can change a zone between the
+    check and the write. A zone that is not available (holding or expecting a package)
+    must keep its position; if any would move, nothing is written and ValueError lists them.
+    Returns {"inserted", "updated", "unchanged"}.
+    """
+    with metrics.timed("db_query_seconds", query="upsert_zone_positions"):
+        with transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            existing = {name: (x, y, z, status) for name, x, y, z, status in
+                        conn.execute("SELECT name, x, y, z, status FROM zones")}
+            counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+            changed = []
+            blocked = []
+            for zone in zones:
+                position = (zone["x"], zone["y"], zone["z"])
+                current = existing.get(zone["name"])
+                if current is None:
+                    counts["inserted"] += 1
+                elif current[:3] == position:
+                    counts["unchanged"] += 1
+                    continue
+                elif current[3] != "available":
+                    blocked.append(f"{zone['name']} ({current[3]})")
+                    continue
+                else:
+                    counts["updated"] += 1
+                changed.append((zone["name"], *position))
+            if blocked:
+                raise ValueError(f"Zones that are not available can't be moved: {', '.join(blocked[:50])}")
+            if not dry_run:
+                conn.executemany(UPSERT_ZONE_POSITION, changed)
+            return counts
+
+
+def _prefix_upper_bound(prefix: str):
+    # Smallest string greater than every string starting with 'prefix', or None if there is none
+    # (the prefix is all U+10FFFF). Surrogates can't be stored as UTF-8, so U+D7FF is followed by U+E000.
+    prefix = prefix.rstrip(chr(0x10FFFF))
+    if not prefix:
+        return None
+    following = ord(prefix[-1]) + 1
+    return prefix[:-1] + chr(0xE000 if 0xD800 <= following <= 0xDFFF else following)
+
+
+def search_zones(product_code: str = None, code_prefix: str = None, product_type: str = None, status: str = None,
+                 stored_after: str = None, stored_before: str = None, limit: int = 100, cursor: int = None):
+    """Search zones by product and status using the secondary indexes.
+
+    Prefix matches are written as a range so SQLite can use the productCode index
+    (LIKE cannot, as it is case-insensitive). Results are ordered by row id and
+    paged with a keyset cursor: pass the returned cursor to get the next page.
+    Returns (rows, next_cursor); rows start with the row id followed by SELECT_ALL_ZONES' columns.
+    """
+    conditions = []
+    params = []
+    if product_code is not None:
+        conditions.append("productCode = ?")
+        params.append(product_code)
+    if code_prefix:
+        upper = _prefix_upper_bound(code_prefix)
+        conditions.append("productCode >= ?" if upper is None else "productCode >= ? AND productCode < ?")
+        params += [code_prefix] if upper is None else [code_prefix, upper]
+    if product_type is not None:
+        conditions.append("productType = ?")
+        params.append(product_type)
+    if status is not None:
+        conditions.append("status = ?")
+        params.append(status)
+    if stored_after is not None:
+        conditions.append("datetime >= ?")
+        params.append(stored_after)
+    if stored_before is not None:
+        conditions.append("datetime < ?")
+        params.append(stored_before)
+    if cursor is not None:
+        conditions.append("id > ?")
+        params.append(cursor)
+
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    sql = "SELECT id, name, x, y, z, status, productCode, productType, additionalInfo, datetime FROM zones"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY id LIMIT ?"
+    params.append(limit + 1)  # one extra row tells whether there is a next page
+
+    with metrics.timed("db_query_seconds", query="search_zones"):
+        rows = get_connection().execute(sql, params).fetchall()
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def execute_returning(sql: str, params=()):
+    """Execute a single write statement with a RETURNING clause, commit and return its rows."""
+    with metrics.timed("db_query_seconds", query=_query_name(sql)):
+        with transaction() as conn:
+            return conn.execute(sql, params).fetchall()
+
+
+def recover_reservations():
+    """Roll back reservations left over from before a restart; zones caught mid-move become 'failed'."""
+    with transaction() as conn:
+        return conn.execute(RECOVER_RESERVATIONS).fetchall() + conn.execute(RECOVER_IN_TRANSIT).fetchall()
+
+
+def add_reservation_columns(conn):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(zones)")}
+    for column, kind in (("reservation", "TEXT"), ("reserved_until", "REAL")):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE zones ADD COLUMN {column} {kind}")
+
+
+def create_indexes(conn):
+    for index_name, column in ZONE_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON zones ({column})")
+
+
+def create_journal(conn):
+    """Append-only operation journal written by journal.Journal."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS journal (
+            id INTEGER PRIMARY KEY,
+            t REAL NOT NULL,
+            kind TEXT NOT NULL,
+            status TEXT,
+            duration REAL,
+            zone TEXT,
+            productCode TEXT,
+            productType TEXT,
+            job_id TEXT,
+            arm TEXT,
+            attempt INTEGER,
+            details TEXT
+        )
+    ''')
+    for index_name, columns in JOURNAL_INDEXES.items():
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON journal ({columns})")
+
+
+# Initialize SQLite Database with zones and coordinates
+def initialize_database():
+    with transaction() as conn:
+        cursor = conn.cursor()
+
+        # Create coordinates table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS coordinates (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE,
+                x REAL,
+                y REAL,
+                z REAL
+            )
+        ''')
+
+        # Create zones table with additional columns for productType and additionalInfo
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS zones (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE,
+                x REAL,
+                y REAL,
+                z REAL,
+                status TEXT,
+                productCode TEXT,
+                productType TEXT,
+                additionalInfo TEXT,
+                datetime TEXT,
+                reservation TEXT,
+                reserved_until REAL
+            )
+        ''')
+        add_reservation_columns(conn)  # databases created before reservations
+
+        # Insert default coordinates for pickup, drop, and safe zones
+        coordinates_data = [
+            ("pickup_zone", -10.702980995178223, -292.842529296875, -77.93537902832031),
+            ("drop_zone", -14.7539701461792, 226.28904724121094, -71.42035675048828),
+            ("safe_zone", 247.40579223632812, -0.2371116727590561, 126.39020538330078)
+        ]
+        cursor.executemany("INSERT OR IGNORE INTO coordinates (name, x, y, z) VALUES (?, ?, ?, ?)", coordinates_data)
+
+        # Insert default zones for storage with new columns for productType and additionalInfo
+        zones_data = [
+            ("A1", 285.9593200683594, 108.25691223144531, -72, "available", None, None, None, None),
+            ("A2", 285.9593200683594, -3.4887490272521973, -72, "available", None, None, None, None),
+            ("A3", 285.9593200683594, -103.77864074707031, -72, "available", None, None, None, None),
+            ("B1", 190.71324157714844, 103.214599609375, -72, "available", None, None, None, None),
+            ("B3", 190.71324157714844, -114.82876586914062, -72, "available", None, None, None, None)
+        ]
+        cursor.executemany("INSERT OR IGNORE INTO zones (name, x, y, z, status, productCode, productType, additionalInfo,datetime) VALUES (?, ?, ?, ?, ?, ?, ?, ?,?)", zones_data)
+
+        create_indexes(conn)
+        create_journal(conn)
@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import shared_memory, get_context, util
+
+import cv2
+import numpy as np
+
+import metrics
+
+
+DECODE_POOL_SIZE = int(os.environ.get("DECODE_POOL_SIZE", "0"))  # 0 disables the process pool
+DEFAULT_STRATEGIES = ("gray", "otsu", "adaptive", "rot90", "upscale", "sharpen")
+DECODE_STRATEGIES = tuple(
+    name.strip() for name in os.environ.get("DECODE_STRATEGIES", ",".join(DEFAULT_STRATEGIES)).split(",") if name.strip()
+)
+
+
+# Preprocessing variants. They run inside the worker processes, so only the name is sent over.
+
+def _gray(image):
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+STRATEGIES = {
+    "raw": lambda image: image,
+    "gray": _gray,
+    "otsu": lambda image: cv2.threshold(_gray(image), 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],
+    "adaptive": lambda image: cv2.adaptiveThreshold(_gray(image), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                                    cv2.THRESH_BINARY, 31, 10),
+    "rot90": lambda image: cv2.rotate(_gray(image), cv2.ROTATE_90_CLOCKWISE),
+    "rot180": lambda image: cv2.rotate(_gray(image), cv2.ROTATE_180),
+    "rot270": lambda image: cv2.rotate(_gray(image), cv2.ROTATE_90_COUNTERCLOCKWISE),
+    "upscale": lambda image: cv2.resize(_gray(image), None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC),
+    "downscale": lambda image: cv2.resize(_gray(image), None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA),
+    "sharpen": lambda image: cv2.filter2D(_gray(image), -1, np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])),
+}
+
+# Scale of each variant relative to the input frame, for mapping rects back (rotations are left out)
+STRATEGY_SCALES = {"raw": 1.0, "gray": 1.0, "otsu": 1.0, "adaptive": 1.0, "upscale": 2.0, "downscale": 0.5, "sharpen": 1.0}
+
+
+# Worker process state
+_worker_segments = {}  # slot number -> attached SharedMemory
+_worker_cancelled = None
+
+
+def _init_worker(cancelled):
+    global _worker_cancelled
+    _worker_cancelled = cancelled
+    # Pool workers leave through os._exit, which skips atexit but still runs multiprocessing finalizers
+    util.Finalize(None, _detach_all, exitpriority=10)
+
+
+def _close_segment(segment):
+    try:
+        segment.close()
+    except BufferError:
+        pass  # a frame view is still alive; the mapping goes with the process
+
+
+def _detach_all():
+    for segment in _worker_segments.values():
+        _close_segment(segment)
+    _worker_segments.clear()
+
+
+def _attach(slot: int, name: str):
+    segment = _worker_segments.get(slot)
+    if segment is not None and segment.name != name:
+        # The engine replaced this slot with a larger segment: drop the mapping of the old one
+        _close_segment(segment)
+        segment = None
+    if segment is None:
+        segment = shared_memory.SharedMemory(name=name)
+        _worker_segments[slot] = segment
+    return segment
+
+
+def _decode_task(slot: int, segment_name: str, shape, dtype: str, frame_id: int, strategy: str, symbols):
+    """Runs in a worker: decode one preprocessing variant of the frame stored in shared memory slot 'slot'."""
+    from pyzbar.pyzbar import decode, ZBarSymbol
+
+    # Another variant already found the barcode for this frame
+    if _worker_cancelled is not None and _worker_cancelled.value >= frame_id:
+        return None
+    segment = _attach(slot, segment_name)
+    frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+    image = STRATEGIES[strategy](frame)
+    if symbols:
+        barcodes = decode(image, symbols=[ZBarSymbol[name] for name in symbols])
+    else:
+        barcodes = decode(image)
+    scale = STRATEGY_SCALES.get(strategy)
+    results = []
+    for barcode in barcodes:
+        x, y, w, h = barcode.rect
+        # Rotated variants don't map back to frame pixels directly
+        rect = (int(x / scale), int(y / scale), int(w / scale), int(h / scale)) if scale else None
+        results.append({"data": barcode.data.decode("utf-8"), "type": barcode.type, "rect": rect, "strategy": strategy})
+    return results
+
+
+class _Slot:
+    def __init__(self, size: int, number: int):
+        self.segment = shared_memory.SharedMemory(create=True, size=size)
+        self.number = number  # kept when the slot is replaced by a larger one, see _attach
+        self.pending = 0  # tasks that may still read this slot
+
+
+class DecodeEngine:
+    """Fans barcode decoding out to a process pool.
+
+    Frames are copied once into a shared-memory slot and workers read them in place,
+    so nothing is pickled except the slot name. Every configured preprocessing
+    variant runs in parallel; the first one that decodes wins and the others are
+    cancelled (queued ones are dropped, started ones skip their work).
+    """
+
+    def __init__(self, pool_size: int = None, strategies=DECODE_STRATEGIES, symbols=None, roi=None, slots: int = None):
+        self.pool_size = pool_size or os.cpu_count() or 2
+        self.strategies = tuple(strategies)
+        unknown = [name for name in self.strategies if name not in STRATEGIES]
+        if unknown:
+            raise ValueError(f"Unknown decode strategies: {', '.join(unknown)}")
+        self.symbols = [symbol.name for symbol in symbols] if symbols else None
+        self.roi = roi
+        self.slot_count = slots or self.pool_size * 2
+        context = get_context("spawn")
+        self._cancelled = context.Value("q", 0)
+        self._executor = ProcessPoolExecutor(self.pool_size, mp_context=context,
+                                             initializer=_init_worker, initargs=(self._cancelled,))
+        self._slots = []
+        self._free = []
+        self._lock = threading.Condition()
+        self._frame_id = 0
+        self.frames = 0
+        self.hits = 0
+        self.wins = {name: 0 for name in self.strategies}
+        self.busy_seconds = 0.0
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            for slot in self._slots:
+                slot.segment.close()
+                slot.segment.unlink()
+            self._slots = []
+            self._free = []
+
+    def _acquire_slot(self, nbytes: int):
+        with self._lock:
+            while True:
+                for slot in self._free:
+                    if slot.segment.size >= nbytes:
+                        self._free.remove(slot)
+                        return slot
+                if len(self._slots) < self.slot_count:
+                    slot = _Slot(nbytes, len(self._slots))
+                    self._slots.append(slot)
+                    return slot
+                if self._free:
+                    # Frames got bigger: replace a free slot that is too small
+                    old = self._free.pop()
+                    old.segment.close()
+                    old.segment.unlink()
+                    slot = _Slot(nbytes, old.number)
+                    self._slots[self._slots.index(old)] = slot
+                    return slot
+                self._lock.wait()
+
+    def _release_slot(self, slot: _Slot):
+        with self._lock:
+            slot.pending -= 1
+            if slot.pending == 0:
+                self._free.append(slot)
+                self._lock.notify()
+
+    def _submit(self, frame, strategies):
+        if self.roi:
+            x, y, w, h = self.roi
+            frame = frame[y:y + h, x:x + w]
+        frame = np.ascontiguousarray(frame)
+        slot = self._acquire_slot(frame.nbytes)
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=slot.segment.buf)[...] = frame
+
+        with self._lock:
+            self._frame_id += 1
+            frame_id = self._frame_id
+            slot.pending = len(strategies)
+        futures = []
+        for strategy in strategies:
+            future = self._executor.submit(_decode_task, slot.number, slot.segment.name, frame.shape, frame.dtype.str,
+                                           frame_id, strategy, self.symbols)
+            future.add_done_callback(lambda _, slot=slot: self._release_slot(slot))
+            futures.append(future)
+        return frame_id, futures
+
+    def decode(self, frame, timeout: float = 5.0):
+        """Decode one frame with every strategy in parallel. Returns the first non-empty result or []."""
+        started = time.perf_counter()
+        frame_id, futures = self._submit(frame, self.strategies)
+        results = []
+        pending = set(futures)
+        deadline = time.monotonic() + timeout
+        while pending and not results:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                found = future.result()
+                if found:
+                    results = found
+                    break
+        if pending:
+            # Tell started workers to skip this frame and drop the queued ones
+            with self._cancelled.get_lock():
+                self._cancelled.value = max(self._cancelled.value, frame_id)
+            for future in pending:
+                future.cancel()
+
+        elapsed = time.perf_counter() - started
+        metrics.observe("barcode_decode_seconds", elapsed, stage="pool", found=bool(results))
+        self.frames += 1
+        self.busy_seconds += elapsed
+        if results:
+            if self.roi:
+                for result in results:
+                    if result["rect"]:
+                        x, y, w, h = result["rect"]
+                        result["rect"] = (x + self.roi[0], y + self.roi[1], w, h)
+            self.hits += 1
+            self.wins[results[0]["strategy"]] += 1
+        return results
+
+    def decode_many(self, frames, strategy: str = "gray"):
+        """Throughput mode: decode many frames concurrently with a single strategy."""
+        submitted = [self._submit(frame, (strategy,))[1][0] for frame in frames]
+        return [future.result() or [] for future in submitted]
+
+    def stats(self):
+        return {
+            "pool_size": self.pool_size,
+            "strategies": list(self.strategies),
+            "frames": self.frames,
+            "hits": self.hits,
+            "wins_per_strategy": self.wins,
+            "frames_per_second": self.frames / self.busy_seconds if self.busy_seconds else None,
+        }
@@ -0,0 +1,229 @@
+import os
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import metrics
+
+
+def load_zbar():
+    """pyzbar, imported on first use: a missing zbar library then fails decoding, not the whole API."""
+    from pyzbar import pyzbar
+    return pyzbar
+
+
+def parse_roi(value: str):
+    """Parse "x,y,w,h" into a tuple of ints, or None when unset."""
+    if not value:
+        return None
+    x, y, w, h = (int(float(part)) for part in value.split(","))
+    return x, y, w, h
+
+
+def parse_symbols(value: str):
+    """Parse "CODE128,EAN13" into a list of ZBarSymbol, or None for all symbologies."""
+    if not value:
+        return None
+    ZBarSymbol = load_zbar().ZBarSymbol
+    return [ZBarSymbol[name.strip().upper()] for name in value.split(",") if name.strip()]
+
+
+class DecodeConfig:
+    def __init__(self, roi=None, grayscale: bool = True, downscale: float = 0.5, refine: bool = True,
+                 full_frame_fallback: bool = False, symbols=None, candidate_padding: int = 20):
+        self.roi = roi  # (x, y, w, h) around the pickup zone in camera pixels, None for the full frame
+        self.grayscale = grayscale
+        self.downscale = downscale  # scale of the fast pass, 1.0 disables it
+        self.refine = refine  # retry at full resolution on the candidate region only
+        self.full_frame_fallback = full_frame_fallback  # last resort: decode the whole ROI at full resolution
+        self.symbols = symbols  # list of ZBarSymbol, None for every symbology zbar knows
+        self.candidate_padding = candidate_padding
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            roi=parse_roi(os.environ.get("BARCODE_ROI", "")),
+            grayscale=os.environ.get("BARCODE_GRAYSCALE", "1") != "0",
+            downscale=float(os.environ.get("BARCODE_DOWNSCALE", "0.5")),
+            refine=os.environ.get("BARCODE_REFINE", "1") != "0",
+            full_frame_fallback=os.environ.get("BARCODE_FULL_FALLBACK", "0") != "0",
+            symbols=parse_symbols(os.environ.get("BARCODE_SYMBOLS", "")),
+        )
+
+    def to_dict(self):
+        return {
+            "roi": self.roi,
+            "grayscale": self.grayscale,
+            "downscale": self.downscale,
+            "refine": self.refine,
+            "full_frame_fallback": self.full_frame_fallback,
+            "symbols": [symbol.name for symbol in self.symbols] if self.symbols else None,
+        }
+
+
+def find_barcode_candidate(gray):
+    """Locate the most barcode-like region of a grayscale image, even if it can't be decoded.
+
+    Uses the classic gradient approach: barcodes have strong gradients in one direction,
+    so |Gx| - |Gy| lights up bars; closing and thresholding turns them into one blob.
+    Returns ((cx, cy), (w, h), angle) as given by cv2.minAreaRect, or None.
+    """
+    grad_x = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=-1)
+    grad_y = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=-1)
+    gradient = cv2.convertScaleAbs(cv2.absdiff(np.abs(grad_x), np.abs(grad_y)))
+    blurred = cv2.blur(gradient, (9, 9))
+    _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (21, 7))
+    closed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+    closed = cv2.erode(closed, None, iterations=4)
+    closed = cv2.dilate(closed, None, iterations=4)
+    contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return None
+    largest = max(contours, key=cv2.contourArea)
+    if cv2.contourArea(largest) < 0.001 * gray.shape[0] * gray.shape[1]:
+        return None
+    return cv2.minAreaRect(largest)
+
+
+def locate_barcode(gray, min_coherence: float = 0.5):
+    """Find a 1D barcode at any orientation and tell which way its bars run.
+
+    find_barcode_candidate only sees bars close to vertical. Here the region is found
+    from the gradient magnitude and each blob is scored by how much its gradients share
+    one direction (the coherence of the structure tensor): close to 1 for bars, lower
+    for text and edges. Returns {"center": (cx, cy), "size": (w, h), "bar_angle": degrees
+    in [-90, 90) measured from the image x axis towards +y, "coherence"} or None.
+    """
+    grad_x = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    magnitude = cv2.blur(cv2.magnitude(grad_x, grad_y), (9, 9))
+    magnitude = cv2.convertScaleAbs(magnitude, alpha=255.0 / max(float(magnitude.max()), 1e-6))
+    _, thresh = cv2.threshold(magnitude, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    closed = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (15, 15)))
+    closed = cv2.erode(closed, None, iterations=4)
+    closed = cv2.dilate(closed, None, iterations=4)
+    contours, _ = cv2.findContours(closed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    jxx, jyy, jxy = grad_x * grad_x, grad_y * grad_y, grad_x * grad_y
+    min_area = 0.001 * gray.shape[0] * gray.shape[1]
+    best = None
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < min_area:
+            continue
+        mask = np.zeros(gray.shape, dtype=np.uint8)
+        cv2.drawContours(mask, [contour], -1, 255, -1)
+        sxx, syy, sxy = cv2.mean(jxx, mask)[0], cv2.mean(jyy, mask)[0], cv2.mean(jxy, mask)[0]
+        coherence = np.hypot(sxx - syy, 2 * sxy) / max(sxx + syy, 1e-6)
+        if coherence < min_coherence or (best and area * coherence <= best[0]):
+            continue
+        gradient_angle = 0.5 * np.degrees(np.arctan2(2 * sxy, sxx - syy))  # across the bars
+        best = (area * coherence, contour, gradient_angle, coherence)
+    if best is None:
+        return None
+    _, contour, gradient_angle, coherence = best
+    (cx, cy), (w, h), _ = cv2.minAreaRect(contour)
+    bar_angle = (gradient_angle + 90 + 90) % 180 - 90
+    return {"center": (float(cx), float(cy)), "size": (float(w), float(h)), "bar_angle": float(bar_angle),
+            "coherence": float(coherence)}
+
+
+def _barcode_dicts(barcodes, offset_x: int = 0, offset_y: int = 0, scale: float = 1.0):
+    results = []
+    for barcode in barcodes:
+        x, y, w, h = barcode.rect
+        results.append({
+            "data": barcode.data.decode("utf-8"),
+            "type": barcode.type,
+            "rect": (int(x / scale) + offset_x, int(y / scale) + offset_y, int(w / scale), int(h / scale)),
+        })
+    return results
+
+
+class DecodePipeline:
+    """ROI crop -> grayscale -> fast pass on a downscaled image -> full-res retry on the candidate region."""
+
+    def __init__(self, config: DecodeConfig = None, history: int = 500):
+        self.config = config or DecodeConfig.from_env()
+        self.latencies = deque(maxlen=history)  # seconds per decoded frame
+        self.frames = 0
+        self.hits = 0
+
+    def _decode(self, image):
+        zbar = load_zbar()
+        if self.config.symbols:
+            return zbar.decode(image, symbols=self.config.symbols)
+        return zbar.decode(image)
+
+    def decode_frame(self, frame):
+        """Decode one BGR frame. Returns a list of {"data", "type", "rect"} in full-frame pixels."""
+        started = time.perf_counter()
+        results = self._run(frame)
+        elapsed = time.perf_counter() - started
+        self.latencies.append(elapsed)
+        metrics.observe("barcode_decode_seconds", elapsed, stage="pipeline", found=bool(results))
+        self.frames += 1
+        if results:
+            self.hits += 1
+        return results
+
+    def _run(self, frame):
+        config = self.config
+        offset_x = offset_y = 0
+        image = frame
+        if config.roi:
+            x, y, w, h = config.roi
+            image = image[y:y + h, x:x + w]
+            offset_x, offset_y = x, y
+        if config.grayscale and image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        scale = config.downscale
+        if not scale or scale >= 1.0:
+            return _barcode_dicts(self._decode(image), offset_x, offset_y)
+
+        # Fast pass on the downscaled image
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        barcodes = self._decode(small)
+        if barcodes:
+            return _barcode_dicts(barcodes, offset_x, offset_y, scale)
+
+        # Full-resolution retry, only on the region that looks like a barcode
+        if config.refine:
+            small_gray = small if small.ndim == 2 else cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+            candidate = find_barcode_candidate(small_gray)
+            if candidate is not None:
+                box = cv2.boxPoints(candidate) / scale
+                pad = config.candidate_padding
+                x0 = max(int(box[:, 0].min()) - pad, 0)
+                y0 = max(int(box[:, 1].min()) - pad, 0)
+                x1 = min(int(box[:, 0].max()) + pad, image.shape[1])
+                y1 = min(int(box[:, 1].max()) + pad, image.shape[0])
+                if x1 > x0 and y1 > y0:
+                    barcodes = self._decode(image[y0:y1, x0:x1])
+                    if barcodes:
+                        return _barcode_dicts(barcodes, offset_x + x0, offset_y + y0)
+
+        if config.full_frame_fallback:
+            return _barcode_dicts(self._decode(image), offset_x, offset_y)
+        return []
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {"frames": self.frames, "hits": self.hits, "config": self.config.to_dict()}
+        return {
+            "frames": self.frames,
+            "hits": self.hits,
+            "latency_ms": {
+                "last": self.latencies[-1] * 1000,
+                "mean": sum(latencies) / len(latencies) * 1000,
+                "p50": latencies[len(latencies) // 2] * 1000,
+                "p95": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000,
+                "max": latencies[-1] * 1000,
+            },
+            "config": self.config.to_dict(),
+        }
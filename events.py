@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+
+
+POSE_STREAM_HZ = float(os.environ.get("POSE_STREAM_HZ", "5"))  # pose events per second while someone listens
+EVENT_HISTORY = int(os.environ.get("EVENT_HISTORY", "512"))  # events kept for clients that reconnect
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "256"))  # per client, oldest dropped when full
+
+TOPICS = ("zone", "job", "step", "pose")
+
+
+class Event:
+    """One published event, serialized once for every subscriber and transport."""
+
+    __slots__ = ("seq", "topic", "json", "sse")
+
+    def __init__(self, seq: int, topic: str, data):
+        self.seq = seq
+        self.topic = topic
+        self.json = json.dumps({"seq": seq, "topic": topic, "data": data}, separators=(",", ":"), default=str)
+        self.sse = f"id: {seq}\nevent: {topic}\ndata: {self.json}\n\n"
+
+
+class Subscription:
+    def __init__(self, topics=None, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.topics = set(topics) if topics else None  # None: every topic
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = 0
+        self.last_seq = 0  # newest event queued, so a replayed event is never queued twice
+
+    def wants(self, topic: str):
+        return self.topics is None or topic in self.topics
+
+
+class EventHub:
+    """Fan-out of zone, job and pose events to WebSocket/SSE clients.
+
+    Publishers (request handlers, the job worker, the pose streamer) call publish()
+    from any thread. The event is serialized once and handed to the event loop in a
+    single call, which copies it into every matching subscriber queue. A slow client
+    loses its oldest events instead of holding up the others, and clients never cause
+    database or serial traffic of their own.
+    """
+
+    def __init__(self, history: int = EVENT_HISTORY):
+        self._lock = threading.Lock()
+        self._loop = None
+        self._subscribers = set()
+        self._history = deque(maxlen=history)
+        self._seq = 0
+        self.published = 0
+
+    def bind(self, loop):
+        """Attach the hub to the server's event loop (called on startup)."""
+        self._loop = loop
+
+    def publish(self, topic: str, data):
+        with self._lock:
+            self._seq += 1
+            event = Event(self._seq, topic, data)
+            self._history.append(event)
+            self.published += 1
+            listening = bool(self._subscribers)
+        loop = self._loop
+        if loop is not None and listening and not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, event)
+        return event
+
+    def _dispatch(self, event: Event):
+        for subscription in tuple(self._subscribers):
+            if subscription.wants(event.topic):
+                self._dispatch_one(subscription, event)
+
+    def subscribe(self, topics=None, last_seq: int = None):
+        """Register a client (on the event loop). Events after 'last_seq' are replayed from the history.
+
+        The replay and the registration happen under the publish lock: an event published
+        meanwhile is either in the replay or dispatched to the new client, never lost.
+        """
+        subscription = Subscription(topics)
+        with self._lock:
+            # Nothing up to here is queued again, whether the client has it or is new
+            subscription.last_seq = self._seq if last_seq is None else min(last_seq, self._seq)
+            for event in self._history:
+                if subscription.wants(event.topic):
+                    self._dispatch_one(subscription, event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _dispatch_one(self, subscription: Subscription, event: Event):
+        if event.seq <= subscription.last_seq:
+            return
+        subscription.last_seq = event.seq
+        if subscription.queue.full():
+            subscription.queue.get_nowait()
+            subscription.dropped += 1
+        subscription.queue.put_nowait(event)
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def has_subscribers(self, topic: str = None):
+        return any(topic is None or subscription.wants(topic) for subscription in tuple(self._subscribers))
+
+    def stats(self):
+        subscribers = tuple(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "last_seq": self._seq,
+            "dropped": sum(subscription.dropped for subscription in subscribers),
+        }
+
+
+def parse_topics(value: str):
+    """Comma separated topic list from a query parameter; empty means every topic."""
+    topics = [topic.strip() for topic in (value or "").split(",") if topic.strip()]
+    unknown = [topic for topic in topics if topic not in TOPICS]
+    if unknown:
+        raise ValueError(f"Unknown topics: {', '.join(unknown)}. Use: {', '.join(TOPICS)}.")
+    return topics
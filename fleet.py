@@ -0,0 +1,298 @@
+import json
+import os
+import threading
+import time
+
+import metrics
+from jobs import JobQueue, RUNNING
+from route_planner import RoutePlanner
+from serial_link import SerialLink
+from simulation import SimulatedDobot
+from telemetry import PoseSampler
+
+
+# JSON (inline or a file path) describing the arms, e.g.
+# {"arms": [{"name": "left", "port": "/dev/ttyUSB0", "zones": ["A1", "A2"],
+#            "coordinates": {"pickup_zone": {"x": 0, "y": -290, "z": -78}}}]}
+# Without it every Dobot found on the serial ports is used and serves every zone.
+FLEET_CONFIG = os.environ.get("FLEET_CONFIG", "")
+FLEET_SIM_ARMS = int(os.environ.get("FLEET_SIM_ARMS", "1"))  # arms created with DOBOT_BACKEND=sim
+
+# Arms that fail to connect are retried in the background, backing off from the first to the max interval
+FLEET_RECONNECT_INTERVAL = float(os.environ.get("FLEET_RECONNECT_INTERVAL", "1"))
+FLEET_RECONNECT_MAX_INTERVAL = float(os.environ.get("FLEET_RECONNECT_MAX_INTERVAL", "30"))
+FLEET_LINK_LOST_ERRORS = int(os.environ.get("FLEET_LINK_LOST_ERRORS", "20"))  # failed pose reads in a row
+
+# Fleet states
+STARTING = "starting"  # discovering and connecting the arms for the first time
+RUNNING_STATE = "running"
+STOPPED = "stopped"
+
+# USB vendor IDs of the Dobot serial adapters (same list pydobot uses)
+DOBOT_VENDOR_IDS = (4292, 6790)
+
+
+class Arm:
+    """One Dobot with its own serial link, job queue, route planner and pose sampler.
+
+    'zones' limits the storage zones the arm serves (None: all of them) and
+    'coordinates' overrides pickup_zone/drop_zone/safe_zone for this arm.
+    """
+
+    def __init__(self, name: str, port: str = None, backend: str = "real", zones=None, coordinates: dict = None,
+                 on_job_change=None, on_pose_sample=None):
+        self.name = name
+        self.port = port
+        self.backend = backend
+        self.zones = set(zones) if zones else None
+        self.coordinates = coordinates or {}
+        self.device = None
+        self.error = None  # last connection error
+        self.connect_attempts = 0  # failed attempts since the last successful connect
+        self.next_attempt = 0.0  # monotonic time of the next reconnect attempt
+        self.connected_at = None
+        self.job_queue = JobQueue(on_change=on_job_change, name=f"motion-job-worker-{name}")
+        self.route_planner = RoutePlanner()
+        self.pose_sampler = PoseSampler(lambda: self.device,
+                                        on_sample=(lambda sample: on_pose_sample(self, sample)) if on_pose_sample else None)
+        self.last_pose_event = 0.0
+
+    def connect(self):
+        """Open the serial link (or the simulator). Returns True on success."""
+        if self.device:
+            return True
+        try:
+            if self.backend == "sim":
+                raw = SimulatedDobot(port=self.port or self.name)
+            else:
+                from pydobot import Dobot  # imported on first connect, not at startup
+                raw = Dobot(port=self.port)
+            self.device = SerialLink(metrics.InstrumentedDevice(raw))
+            self.error = None
+            self.connect_attempts = 0
+            self.connected_at = time.time()
+            self.pose_sampler.consecutive_errors = 0
+            return True
+        except Exception as e:
+            self.error = str(e)
+            self.connect_attempts += 1
+            interval = min(FLEET_RECONNECT_INTERVAL * 2 ** (self.connect_attempts - 1), FLEET_RECONNECT_MAX_INTERVAL)
+            self.next_attempt = time.monotonic() + interval
+            return False
+
+    def link_lost(self):
+        """True when the pose sampler has not been able to read the arm for a while and no job is using it."""
+        current = self.job_queue.current_job
+        return (self.device is not None and self.pose_sampler.consecutive_errors >= FLEET_LINK_LOST_ERRORS
+                and not (current and current.status == RUNNING))
+
+    def disconnect(self, reason: str = None):
+        device, self.device = self.device, None
+        self.error = reason
+        self.next_attempt = time.monotonic()
+        if device:
+            try:
+                device.close()
+            except Exception as e:
+                print(f"Failed to close {self.name}: {e}")
+
+    def start(self):
+        self.job_queue.start()
+        self.pose_sampler.start()
+
+    def stop(self):
+        self.job_queue.stop()
+        self.pose_sampler.stop()
+        self.disconnect()
+
+    def serves(self, zone_id: str):
+        return self.zones is None or zone_id in self.zones
+
+    def load(self):
+        """Jobs queued or running on this arm, used to pick the least busy arm."""
+        current = self.job_queue.current_job
+        return self.job_queue.pending_count() + (1 if current and current.status == RUNNING else 0)
+
+    def to_dict(self):
+        current = self.job_queue.current_job
+        return {
+            "name": self.name,
+            "port": self.port,
+            "backend": self.backend,
+            "connected": self.device is not None,
+            "error": self.error,
+            "connect_attempts": self.connect_attempts,
+            "connected_at": self.connected_at,
+            "zones": sorted(self.zones) if self.zones is not None else None,
+            "coordinates": self.coordinates,
+            "current_job": current.id if current else None,
+            "pending_jobs": self.job_queue.pending_count(),
+        }
+
+
+def _load_config(value: str):
+    if os.path.isfile(value):
+        with open(value) as f:
+            return json.load(f)
+    return json.loads(value)
+
+
+def discover_ports():
+    """Serial ports with a Dobot adapter; falls back to the first port like the single-arm setup did."""
+    from serial.tools import list_ports
+    ports = list_ports.comports()
+    dobots = [port.device for port in ports if port.vid in DOBOT_VENDOR_IDS]
+    if not dobots and ports:
+        dobots = [ports[0].device]
+    return dobots
+
+
+class Fleet:
+    """Registry of the arms on this host and dispatcher of jobs to them."""
+
+    def __init__(self, backend: str = "real", config: str = FLEET_CONFIG, on_job_change=None, on_pose_sample=None,
+                 on_connect=None):
+        self.backend = backend
+        self.config = config
+        self.on_job_change = on_job_change
+        self.on_pose_sample = on_pose_sample
+        self.on_connect = on_connect  # called with the arm after every successful (re)connect
+        self.arms = {}
+        self.state = STOPPED
+        self.started = threading.Event()  # set once every arm had its first connect attempt
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._supervisor = None
+
+    def _add(self, name: str, **kwargs):
+        self.arms[name] = Arm(name, on_job_change=self.on_job_change, on_pose_sample=self.on_pose_sample, **kwargs)
+
+    def discover(self):
+        """Create the arms from FLEET_CONFIG, or one per simulated/discovered Dobot."""
+        self.arms = {}
+        if self.config:
+            for number, entry in enumerate(_load_config(self.config)["arms"], start=1):
+                self._add(entry.get("name", f"arm{number}"), port=entry.get("port"), backend=entry.get("backend", self.backend),
+                          zones=entry.get("zones"), coordinates=entry.get("coordinates"))
+        elif self.backend == "sim":
+            for number in range(1, FLEET_SIM_ARMS + 1):
+                self._add(f"arm{number}", backend="sim")
+        else:
+            ports = discover_ports()
+            print("Dobot ports:", ports)
+            for number, port in enumerate(ports, start=1):
+                self._add(f"arm{number}", port=port)
+        return list(self.arms.values())
+
+    def connect(self, due_only: bool = False):
+        """Connect every disconnected arm (with due_only, those whose retry is due); returns a message per arm."""
+        messages = {}
+        for arm in list(self.arms.values()):
+            if arm.device or (due_only and time.monotonic() < arm.next_attempt):
+                continue
+            if arm.connect():
+                messages[arm.name] = f"Connected on {arm.port or arm.backend}."
+                if self.on_connect:
+                    self.on_connect(arm)
+            else:
+                messages[arm.name] = f"Failed to connect (attempt {arm.connect_attempts}): {arm.error}"
+        return messages
+
+    def start(self):
+        """Discover and connect the arms on a background thread and keep reconnecting them.
+
+        Returns at once, so the API serves requests while the serial ports are enumerated
+        and opened; 'started' is set after the first round.
+        """
+        if self._supervisor and self._supervisor.is_alive():
+            return
+        self._stop.clear()
+        self.started.clear()
+        self.state = STARTING
+        self._supervisor = threading.Thread(target=self._supervise, name="fleet-supervisor", daemon=True)
+        self._supervisor.start()
+
+    def _supervise(self):
+        try:
+            self.discover()
+            if not self.arms:
+                print("No Dobot found on the serial ports, looking again in the background.")
+            for name, message in self.connect().items():
+                print(f"Dobot {name}: {message}")
+            for arm in list(self.arms.values()):
+                arm.start()
+        except Exception as e:
+            print(f"Fleet startup failed: {e}")
+        self.state = RUNNING_STATE
+        self.started.set()
+
+        while not self._stop.wait(0.5):
+            try:
+                if not self.arms and not self.config:
+                    # Nothing plugged in yet: rescan now and then
+                    if self._stop.wait(FLEET_RECONNECT_MAX_INTERVAL):
+                        break
+                    for arm in self.discover():
+                        arm.start()
+                for arm in list(self.arms.values()):
+                    if arm.link_lost():
+                        print(f"Dobot {arm.name}: lost the serial link, reconnecting.")
+                        arm.disconnect("Serial link lost.")
+                for name, message in self.connect(due_only=True).items():
+                    print(f"Dobot {name}: {message}")
+            except Exception as e:
+                print(f"Fleet supervisor error: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._supervisor:
+            self._supervisor.join(5.0)
+            self._supervisor = None
+        for arm in self.arms.values():
+            arm.stop()
+        self.state = STOPPED
+
+    def to_dict(self):
+        return {"state": self.state, "arms": [arm.to_dict() for arm in self.arms.values()]}
+
+    @property
+    def default(self):
+        """First arm, used when a request does not name one."""
+        return next(iter(self.arms.values()), None)
+
+    def get(self, name: str = None):
+        return self.arms.get(name) if name else self.default
+
+    def dispatch(self, zone_ids=()):
+        """Pick the connected arm that serves all 'zone_ids' with the fewest queued jobs, or None."""
+        candidates = [arm for arm in self.arms.values()
+                      if arm.device is not None and all(arm.serves(zone_id) for zone_id in zone_ids)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda arm: arm.load())
+
+    def submit(self, kind: str, func, for_zones=(), arm: str = None, **kwargs):
+        """Queue a job on the named arm or on the least busy arm serving 'for_zones'.
+
+        The job function gets the arm name as its 'arm' argument. Returns (arm, job),
+        or (None, None) if no connected arm can take it.
+        """
+        with self._lock:
+            target = self.get(arm) if arm else self.dispatch(for_zones)
+            if target is None or target.device is None or not all(target.serves(zone_id) for zone_id in for_zones):
+                return None, None
+            return target, target.job_queue.submit(kind, func, arm=target.name, **kwargs)
+
+    # Jobs across all arms
+
+    def find_job(self, job_id: str):
+        """Return (arm, job) for a job ID, or (None, None)."""
+        for arm in self.arms.values():
+            job = arm.job_queue.get(job_id)
+            if job:
+                return arm, job
+        return None, None
+
+    def list_jobs(self, status: str = None):
+        jobs = [job for arm in self.arms.values() for job in arm.job_queue.list(status)]
+        return sorted(jobs, key=lambda job: job.created_at)
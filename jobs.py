@@ -0,0 +1,233 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import metrics
+
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when a cancel was requested."""
+
+
+# Job being executed by the current worker thread
+_local = threading.local()
+
+
+def current_job():
+    """The job running on this thread, or None outside a job worker."""
+    return getattr(_local, "job", None)
+
+
+class Job:
+    def __init__(self, kind: str, func, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.trace = []  # step timings recorded while the job ran
+        self.cancel_event = threading.Event()
+
+    def to_dict(self, include_trace: bool = False):
+        duration = None
+        if self.started_at is not None:
+            duration = (self.finished_at or time.time()) - self.started_at
+        job_data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": {key: _jsonable(value) for key, value in self.kwargs.items()},
+            "result": self.result,
+            "error": self.error,
+            "cancel_requested": self.cancel_event.is_set(),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration": duration,
+        }
+        if include_trace:
+            job_data["trace"] = self.trace
+        return job_data
+
+
+def _jsonable(value):
+    # Pydantic models (e.g. StorageRequest) are reported as plain dicts
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return value
+
+
+class JobQueue:
+    """FIFO queue of motion jobs executed in order by a single worker thread.
+
+    The worker is the only thread that drives the arm for queued operations,
+    so HTTP handlers only enqueue and return a job ID.
+    """
+
+    def __init__(self, max_history: int = 1000, on_change=None, name: str = "motion-job-worker"):
+        self.max_history = max_history
+        self.name = name
+        self.on_change = on_change  # called with the job after every status change
+        self.current_job = None
+        self._jobs = OrderedDict()
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._worker = None
+        self._stopping = False
+
+    def start(self):
+        with self._condition:
+            if self._worker and self._worker.is_alive():
+                return
+            self._stopping = False
+            self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._condition:
+            self._stopping = True
+            if self.current_job:
+                self.current_job.cancel_event.set()
+            self._condition.notify_all()
+        if self._worker:
+            self._worker.join(timeout)
+            self._worker = None
+
+    def submit(self, kind: str, func, *args, **kwargs) -> Job:
+        job = Job(kind, func, args, kwargs)
+        with self._condition:
+            self._jobs[job.id] = job
+            self._pending.append(job)
+            self._trim_history()
+            # Reported before the worker can pick it up, so 'pending' always precedes 'running'
+            self._notify(job)
+            self._condition.notify()
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def list(self, status: str = None):
+        with self._condition:
+            jobs = list(self._jobs.values())
+        if status:
+            jobs = [job for job in jobs if job.status == status]
+        return jobs
+
+    def has_pending(self):
+        """True if more jobs are waiting behind the current one."""
+        with self._condition:
+            return bool(self._pending)
+
+    def pending_count(self):
+        with self._condition:
+            return len(self._pending)
+
+    def position(self, job: Job):
+        """Return the 0-based position of a pending job in the queue, or None."""
+        with self._condition:
+            try:
+                return self._pending.index(job)
+            except ValueError:
+                return None
+
+    def cancel(self, job_id: str):
+        """Cancel a job. Pending jobs are dropped, running jobs stop at the next checkpoint."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED_STATES:
+                return job
+            job.cancel_event.set()
+            if job.status == PENDING:
+                self._pending.remove(job)
+                job.status = CANCELLED
+                job.finished_at = time.time()
+        self._notify(job)
+        return job
+
+    def check_cancelled(self):
+        """Checkpoint for long-running job code: raise JobCancelled if the current job was cancelled."""
+        job = self.current_job
+        if job and job.cancel_event.is_set():
+            raise JobCancelled(f"Job {job.id} was cancelled.")
+
+    def sleep(self, seconds: float):
+        """Sleep that wakes up early (and raises JobCancelled) when the current job is cancelled."""
+        job = self.current_job
+        if job is None or threading.current_thread() is not self._worker:
+            time.sleep(seconds)
+            return
+        if job.cancel_event.wait(seconds):
+            raise JobCancelled(f"Job {job.id} was cancelled.")
+
+    def _notify(self, job: Job):
+        if self.on_change:
+            try:
+                self.on_change(job)
+            except Exception as e:
+                print(f"Job listener failed: {e}")
+
+    def _trim_history(self):
+        # Drop the oldest finished jobs once we hold more than max_history
+        excess = len(self._jobs) - self.max_history
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES][:excess]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                job = self._pending.popleft()
+                job.status = RUNNING
+                job.started_at = time.time()
+                self.current_job = job
+            self._notify(job)
+
+            _local.job = job
+            try:
+                with metrics.trace_context() as trace:
+                    job.trace = trace
+                    result = job.func(*job.args, **job.kwargs)
+                job.result = result
+                if isinstance(result, dict) and result.get("status") == "error":
+                    job.status = FAILED
+                    job.error = result.get("message")
+                else:
+                    job.status = SUCCEEDED
+            except JobCancelled as e:
+                job.status = CANCELLED
+                job.error = str(e)
+            except Exception as e:
+                job.status = FAILED
+                # HTTPException carries its message in 'detail'
+                job.error = getattr(e, "detail", None) or str(e)
+                print(f"Job {job.id} ({job.kind}) failed: {job.error}")
+            finally:
+                _local.job = None
+                job.finished_at = time.time()
+                metrics.observe("job_seconds", job.finished_at - job.started_at, kind=job.kind, status=job.status)
+                with self._condition:
+                    self.current_job = None
+                self._notify(job)
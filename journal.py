@@ -0,0 +1,284 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import database
+import metrics
+from jobs import current_job
+
+
+JOURNAL_FLUSH_INTERVAL = float(os.environ.get("JOURNAL_FLUSH_INTERVAL", "0.5"))  # seconds between group commits
+JOURNAL_BATCH_SIZE = int(os.environ.get("JOURNAL_BATCH_SIZE", "500"))  # flush early once this many events wait
+JOURNAL_MAX_PENDING = int(os.environ.get("JOURNAL_MAX_PENDING", "100000"))  # oldest events dropped beyond this
+
+# Event kinds written by the server
+STORAGE, PICKUP, BARCODE, STEP, REORIENT = "storage", "pickup", "barcode", "step", "reorient"
+
+JOURNAL_COLUMNS = ("id", "t", "kind", "status", "duration", "zone", "productCode", "productType",
+                   "job_id", "arm", "attempt", "details")
+INSERT_EVENT = '''
+    INSERT INTO journal (t, kind, status, duration, zone, productCode, productType, job_id, arm, attempt, details)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+DEFAULT_REPORT_SECONDS = 24 * 3600  # report window when 'since' is omitted
+
+
+class Journal:
+    """Append-only record of storages, pickups, barcode attempts and motion steps.
+
+    record() only appends a row to an in-memory buffer, so jobs never wait on SQLite.
+    A writer thread drains the buffer every JOURNAL_FLUSH_INTERVAL (or as soon as
+    JOURNAL_BATCH_SIZE rows are waiting) and inserts them with one executemany and one
+    commit. A failed flush puts the rows back and is retried on the next interval.
+    """
+
+    def __init__(self, flush_interval: float = JOURNAL_FLUSH_INTERVAL, batch_size: int = JOURNAL_BATCH_SIZE,
+                 max_pending: int = JOURNAL_MAX_PENDING):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._stopping = False
+        self._writer = None
+        self.written = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def is_running(self):
+        return self._writer is not None and self._writer.is_alive()
+
+    def start(self):
+        with self._condition:
+            if self._writer and self._writer.is_alive():
+                return
+            self._stopping = False
+            self._writer = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the writer and commit whatever is still buffered."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._writer:
+            self._writer.join(timeout)
+            self._writer = None
+        self._flush()
+
+    def record(self, kind: str, status: str = None, duration: float = None, zone: str = None, product_code: str = None,
+               product_type: str = None, attempt: int = None, job_id: str = None, arm: str = None, t: float = None, **details):
+        """Buffer one event. The job ID and arm default to those of the job running on this thread."""
+        job = current_job()
+        if job is not None:
+            job_id = job_id or job.id
+            arm = arm or job.kwargs.get("arm")
+        row = (t or time.time(), kind, status, duration, zone, product_code, product_type, job_id, arm, attempt,
+               json.dumps(details, separators=(",", ":"), default=str) if details else None)
+        with self._condition:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                if self._stopping:
+                    return
+            self._flush()
+
+    def _flush(self):
+        with self._condition:
+            rows = list(self._pending)
+            self._pending.clear()
+        if not rows:
+            return
+        try:
+            with metrics.timed("journal_flush_seconds"):
+                with database.transaction() as conn:
+                    conn.executemany(INSERT_EVENT, rows)
+        except Exception as e:
+            self.errors += 1
+            print(f"Journal flush of {len(rows)} events failed: {e}")
+            with self._condition:
+                self._pending.extendleft(reversed(rows))
+            return
+        self.written += len(rows)
+        self.flushes += 1
+
+    def stats(self):
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "written": self.written,
+            "flushes": self.flushes,
+            "average_batch": self.written / self.flushes if self.flushes else None,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+def parse_time(value, default: float = None):
+    """Unix seconds or an ISO 8601 timestamp (local time) as Unix seconds."""
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time '{value}'. Use Unix seconds or ISO 8601.")
+
+
+def report_window(since: str = None, until: str = None):
+    until = parse_time(until, time.time())
+    since = parse_time(since, until - DEFAULT_REPORT_SECONDS)
+    if since >= until:
+        raise ValueError("'since' must be before 'until'.")
+    return since, until
+
+
+def _fetch(name: str, sql: str, params):
+    with metrics.timed("db_query_seconds", query=name):
+        return database.get_connection().execute(sql, params).fetchall()
+
+
+def list_events(kind: str = None, zone: str = None, job_id: str = None, since: float = None, until: float = None,
+                limit: int = 100, cursor: int = None):
+    """Journal rows, newest first, paged by row id. Returns (events, next_cursor)."""
+    conditions = []
+    params = []
+    for column, value in (("kind", kind), ("zone", zone), ("job_id", job_id)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        conditions.append("t >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("t < ?")
+        params.append(until)
+    if cursor is not None:
+        conditions.append("id < ?")
+        params.append(cursor)
+    limit = max(1, min(limit, database.SEARCH_MAX_LIMIT))
+    sql = f"SELECT {', '.join(JOURNAL_COLUMNS)} FROM journal"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    rows = _fetch("journal_list", sql, params)
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    events = []
+    for row in rows[:limit]:
+        event = dict(zip(JOURNAL_COLUMNS, row))
+        event["details"] = json.loads(event["details"]) if event["details"] else None
+        events.append(event)
+    return events, next_cursor
+
+
+def throughput_report(since: float, until: float, bucket: float = 3600):
+    """Storages and pickups per time bucket with their success count and average duration."""
+    rows = _fetch("journal_throughput", '''
+        SELECT CAST(t / ? AS INTEGER) * ? AS start, kind, COUNT(*), SUM(status = 'success'), AVG(duration)
+        FROM journal
+        WHERE kind IN (?, ?) AND t >= ? AND t < ?
+        GROUP BY start, kind
+        ORDER BY start
+    ''', (bucket, bucket, STORAGE, PICKUP, since, until))
+
+    buckets = {}
+    totals = {kind: {"count": 0, "succeeded": 0} for kind in (STORAGE, PICKUP)}
+    for start, kind, count, succeeded, average in rows:
+        entry = buckets.setdefault(start, {"start": start})
+        entry[kind] = {"count": count, "succeeded": succeeded, "average_duration": average}
+        totals[kind]["count"] += count
+        totals[kind]["succeeded"] += succeeded
+    hours = (until - since) / 3600
+    succeeded = totals[STORAGE]["succeeded"] + totals[PICKUP]["succeeded"]
+    return {"since": since, "until": until, "bucket": bucket, "totals": totals,
+            "packages_per_hour": succeeded / hours, "buckets": list(buckets.values())}
+
+
+def dwell_report(since: float, until: float, zone: str = None):
+    """How long packages stayed in each zone.
+
+    A stay is a successful storage followed by a successful pickup in the same zone.
+    Completed stays are the pickups in the window, each joined to the zone's previous
+    storage/pickup through the (zone, t) index; packages still stored at 'until' are the
+    zones whose last such event is a storage. Both are index lookups, so the cost grows
+    with the window and the number of zones, not with the length of the history.
+    """
+    previous = "SELECT id FROM journal WHERE zone = {zone} AND t < {t} AND kind IN (?, ?) AND status = 'success' ORDER BY t DESC LIMIT 1"
+    zone_filter = "AND pickup.zone = ?" if zone else ""
+    completed = _fetch("journal_dwell", f'''
+        SELECT pickup.zone, COUNT(*), AVG(pickup.t - stored.t), MIN(pickup.t - stored.t), MAX(pickup.t - stored.t)
+        FROM journal AS pickup
+        JOIN journal AS stored ON stored.id = ({previous.format(zone="pickup.zone", t="pickup.t")})
+        WHERE pickup.kind = ? AND pickup.status = 'success' AND pickup.t >= ? AND pickup.t < ? {zone_filter}
+              AND stored.kind = ?
+        GROUP BY pickup.zone
+    ''', [STORAGE, PICKUP, PICKUP, since, until] + ([zone] if zone else []) + [STORAGE])
+
+    zone_filter = "WHERE name = ?" if zone else ""
+    stored = _fetch("journal_dwell_open", f'''
+        SELECT last.zone, last.t
+        FROM (SELECT ({previous.format(zone="zones.name", t="?")}) AS id FROM zones {zone_filter}) AS latest
+        JOIN journal AS last ON last.id = latest.id
+        WHERE last.kind = ?
+    ''', [until, STORAGE, PICKUP] + ([zone] if zone else []) + [STORAGE])
+
+    zones = {}
+    for name, count, average, shortest, longest in completed:
+        zones[name] = {"zone": name, "completed": count, "average_dwell": average, "min_dwell": shortest,
+                       "max_dwell": longest, "stored": False, "stored_age": None}
+    for name, stored_at in stored:
+        entry = zones.setdefault(name, {"zone": name, "completed": 0, "average_dwell": None, "min_dwell": None,
+                                        "max_dwell": None})
+        entry.update(stored=True, stored_age=until - stored_at)
+    return {"since": since, "until": until, "zones": sorted(zones.values(), key=lambda entry: entry["zone"])}
+
+
+def retry_report(since: float, until: float, bucket: float = 3600):
+    """Barcode scans per time bucket: how many needed a re-orientation and how many never read.
+
+    Each scan writes one barcode event per attempt, so attempt 1 counts scans, attempt 2
+    the scans that needed a retry and higher attempts count retries. retry_rate is the
+    share of scans that needed one, retries_per_scan the extra attempts per scan.
+    """
+    rows = _fetch("journal_retries", '''
+        SELECT CAST(t / ? AS INTEGER) * ? AS start,
+               SUM(attempt = 1), SUM(attempt = 2), SUM(attempt > 1), SUM(status = 'found'), AVG(duration)
+        FROM journal
+        WHERE kind = ? AND t >= ? AND t < ?
+        GROUP BY start
+        ORDER BY start
+    ''', (bucket, bucket, BARCODE, since, until))
+
+    def rates(scans, retried, retries, found):
+        return {"scans": scans, "retried": retried, "retries": retries, "found": found,
+                "retry_rate": retried / scans if scans else None,
+                "retries_per_scan": retries / scans if scans else None,
+                "read_rate": found / scans if scans else None}
+
+    buckets = []
+    totals = [0, 0, 0, 0]
+    for start, scans, retried, retries, found, average in rows:
+        buckets.append(dict(rates(scans, retried, retries, found), start=start, average_attempt_seconds=average))
+        totals = [total + value for total, value in zip(totals, (scans, retried, retries, found))]
+    return {"since": since, "until": until, "bucket": bucket, "totals": rates(*totals), "buckets": buckets}
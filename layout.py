@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+import math
+import os
+
+from cache import ZONE_FIELDS
+from motion import STORE_CLEARANCE
+
+
+ZONE_IMPORT_MAX = int(os.environ.get("ZONE_IMPORT_MAX", "100000"))  # zones per import request
+DEFAULT_NAME_FORMAT = "{rack}{row}{column}"  # A1, A2, B1 ... like the taught-in zones
+MAX_ERRORS = 50  # validation errors reported per request
+
+
+def row_label(index: int):
+    """0 -> A, 25 -> Z, 26 -> AA, like spreadsheet columns."""
+    label = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(ord("A") + remainder) + label
+    return label
+
+
+def generate_rack(origin: dict, rows: int, columns: int, row_pitch: float, column_pitch: float, levels: int = 1,
+                  level_pitch: float = 0, angle: float = 0, rack: str = "", name_format: str = DEFAULT_NAME_FORMAT,
+                  first_column: int = 1):
+    """Zones of a rack laid out as a grid, as [{"name", "x", "y", "z"}].
+
+    'origin' is the zone in the first row, column and level. Rows advance along the rack's
+    x axis by row_pitch, columns along its y axis by column_pitch and levels up by
+    level_pitch (pitches may be negative); the rack axes are turned 'angle' degrees from
+    the arm's. Names come from 'name_format' with {rack}, {row} (A, B, ...), {row_number},
+    {column} and {level}.
+    """
+    if rows < 1 or columns < 1 or levels < 1:
+        raise ValueError("rows, columns and levels must be at least 1.")
+    if rows * columns * levels > ZONE_IMPORT_MAX:
+        raise ValueError(f"A rack can have at most {ZONE_IMPORT_MAX} zones.")
+    cos_a, sin_a = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    zones = []
+    for level in range(levels):
+        for row in range(rows):
+            for column in range(columns):
+                dx, dy = row * row_pitch, column * column_pitch
+                try:
+                    name = name_format.format(rack=rack, row=row_label(row), row_number=row + 1,
+                                              column=first_column + column, level=level + 1)
+                except (KeyError, IndexError, ValueError) as e:
+                    raise ValueError(f"Invalid name format '{name_format}': {e}")
+                zones.append({
+                    "name": name,
+                    "x": round(origin["x"] + dx * cos_a - dy * sin_a, 3),
+                    "y": round(origin["y"] + dx * sin_a + dy * cos_a, 3),
+                    "z": round(origin["z"] + level * level_pitch, 3),
+                })
+    return zones
+
+
+def parse_zones_json(text):
+    """Zones from a JSON list, or from {"zones": [...]} as written by export."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if isinstance(data, dict):
+        data = data.get("zones")
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of zones or {\"zones\": [...]}.")
+    return data
+
+
+def parse_zones_csv(text):
+    """Zones from CSV with a header row; name, x, y and z are required, other columns are ignored."""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"name", "x", "y", "z"} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"CSV is missing the column(s) {', '.join(sorted(missing))}.")
+    return list(reader)
+
+
+def zones_to_csv(zones):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=ZONE_FIELDS, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(zones)
+    return out.getvalue()
+
+
+def validate_zones(zones, envelopes_for):
+    """Normalized zones and a list of errors.
+
+    Every zone needs a unique name and finite x/y/z, and both the zone and the point above
+    it where the arm approaches (z + STORE_CLEARANCE) must lie inside the envelope of at
+    least one arm. envelopes_for(name) returns the envelopes of the arms serving that zone.
+    """
+    if len(zones) > ZONE_IMPORT_MAX:
+        return [], [f"At most {ZONE_IMPORT_MAX} zones can be imported at once, got {len(zones)}."]
+    normalized = []
+    errors = []
+    seen = set()
+    for number, zone in enumerate(zones, start=1):
+        if len(errors) >= MAX_ERRORS:
+            errors.append("Too many errors, stopped checking.")
+            break
+        if not isinstance(zone, dict):
+            errors.append(f"#{number}: expected an object with name, x, y and z.")
+            continue
+        name = str(zone.get("name") or "").strip()
+        if not name:
+            errors.append(f"#{number}: zone without a name.")
+            continue
+        if name in seen:
+            errors.append(f"{name}: listed more than once.")
+            continue
+        seen.add(name)
+        try:
+            x, y, z = (float(zone[axis]) for axis in ("x", "y", "z"))
+        except (KeyError, TypeError, ValueError):
+            errors.append(f"{name}: x, y and z must be numbers.")
+            continue
+        if not all(math.isfinite(value) for value in (x, y, z)):
+            errors.append(f"{name}: x, y and z must be finite.")
+            continue
+        envelopes = envelopes_for(name)
+        if not any(envelope.contains(x, y, z) and envelope.contains(x, y, z + STORE_CLEARANCE) for envelope in envelopes):
+            errors.append(f"{name}: ({x:g}, {y:g}, {z:g}) is outside the workspace of "
+                          f"{'every arm serving it' if envelopes else 'the arms (none serves it)'}.")
+            continue
+        normalized.append({"name": name, "x": x, "y": y, "z": z})
+    return normalized, errors
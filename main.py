@@ -1,17 +1,39 @@
 from typing import Union, Optional
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
-from serial.tools import list_ports
-from pydobot import Dobot
-from pyzbar.pyzbar import decode
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 import cv2
 import numpy as np
 from typing import Optional
-import time
+import asyncio
+import os
 import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+import database
+import journal
+import layout
+import metrics
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from datetime import datetime
+from jobs import JobCancelled, FINISHED_STATES, current_job
+from events import EventHub, POSE_STREAM_HZ, parse_topics
+from telemetry import POSE_COLUMNS
+from fleet import Fleet, STARTING
+from cache import ZoneCache, ZONE_FIELDS, AVAILABLE, RESERVED, PICKUP_RESERVED, IN_TRANSIT, OCCUPIED, FAILED
+from camera import CameraService
+from decoder import DecodePipeline, load_zbar
+from vision import CalibrationStore, CameraCalibration, VISION_REORIENT, locate_label, plan_reorientation
+from settle import SettleDetector
+from corpus import FrameCorpus, FRAME_CORPUS_DIR, FRAME_CORPUS_PER_ATTEMPT, new_scan_id
+from decode_pool import DecodeEngine, DECODE_POOL_SIZE
+from simulation import SimulatedCamera
+from allocation import assign_zones
+from route_planner import ROUTE_OPTIMIZE, Envelope
+from motion import (QUEUED, STEP, FAST_TRANSIT, PROFILES, build_pickup_plan, build_storage_plan, build_reorient_plan,
+                    build_recenter_plan, assign_profiles, apply_speed, execute_plan, cycle_time_summary)
 
 
 app = FastAPI()
@@ -21,6 +43,40 @@ class StorageRequest(BaseModel):
     productType: str
     additionalInfo: str
 
+class BatchStorageItem(BaseModel):
+    productType: str
+    additionalInfo: str
+    zone_id: Optional[str] = None  # assigned automatically when omitted
+
+class BatchStorageRequest(BaseModel):
+    items: list[BatchStorageItem]
+    policy: str = "nearest"  # zone assignment policy, see allocation.POLICIES
+
+class CalibrationPoint(BaseModel):
+    u: float  # camera pixel
+    v: float
+    x: float  # arm position of the same spot
+    y: float
+
+class RackLayout(BaseModel):
+    origin_x: float  # zone in the first row, column and level
+    origin_y: float
+    origin_z: float = -72
+    rows: int
+    columns: int
+    row_pitch: float  # mm between rows (rack x axis) and columns (rack y axis), may be negative
+    column_pitch: float
+    levels: int = 1
+    level_pitch: float = 0
+    angle: float = 0  # rack axes relative to the arm's, degrees
+    rack: str = ""
+    name_format: str = layout.DEFAULT_NAME_FORMAT
+    first_column: int = 1
+
+class RouteOperation(BaseModel):
+    kind: str  # "storage" or "pickup"
+    zone_id: str
+
 # Add CORS Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,506 +86,1108 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize SQLite Database with zones and coordinates
-def initialize_database():
-    conn = sqlite3.connect("robot_zones.db")
-    cursor = conn.cursor()
-
-    # Create coordinates table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS coordinates (
-            id INTEGER PRIMARY KEY,
-            name TEXT UNIQUE,
-            x REAL,
-            y REAL,
-            z REAL
-        )
-    ''')
-
-    # Create zones table with additional columns for productType and additionalInfo
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS zones (
-            id INTEGER PRIMARY KEY,
-            name TEXT UNIQUE,
-            x REAL,
-            y REAL,
-            z REAL,
-            status TEXT,
-            productCode TEXT,
-            productType TEXT,
-            additionalInfo TEXT,
-            datetime TEXT
-        )
-    ''')
-
-    # Insert default coordinates for pickup, drop, and safe zones
-    coordinates_data = [
-        ("pickup_zone", -10.702980995178223, -292.842529296875, -77.93537902832031),
-        ("drop_zone", -14.7539701461792, 226.28904724121094, -71.42035675048828),
-        ("safe_zone", 247.40579223632812, -0.2371116727590561, 126.39020538330078)
-    ]
-    cursor.executemany("INSERT OR IGNORE INTO coordinates (name, x, y, z) VALUES (?, ?, ?, ?)", coordinates_data)
-
-    # Insert default zones for storage with new columns for productType and additionalInfo
-    zones_data = [
-        ("A1", 285.9593200683594, 108.25691223144531, -72, "available", None, None, None, None),
-        ("A2", 285.9593200683594, -3.4887490272521973, -72, "available", None, None, None, None),
-        ("A3", 285.9593200683594, -103.77864074707031, -72, "available", None, None, None, None),
-        ("B1", 190.71324157714844, 103.214599609375, -72, "available", None, None, None, None),
-        ("B3", 190.71324157714844, -114.82876586914062, -72, "available", None, None, None, None)
-    ]
-    cursor.executemany("INSERT OR IGNORE INTO zones (name, x, y, z, status, productCode, productType, additionalInfo,datetime) VALUES (?, ?, ?, ?, ?, ?, ?, ?,?)", zones_data)
-
-    conn.commit()
-    conn.close()
-
-initialize_database()
+def format_server_timing(trace):
+    entries = []
+    for entry in trace:
+        name = entry["step"].removesuffix("_seconds")
+        labels = ",".join(f"{key}={value}" for key, value in entry.items() if key not in ("step", "ms"))
+        entries.append(f'{name};dur={entry["ms"]};desc="{labels}"' if labels else f'{name};dur={entry["ms"]}')
+    return ", ".join(entries)
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Record request time per route; with ?trace=true also return a per-step trace in Server-Timing."""
+    started = time.perf_counter()
+    if request.query_params.get("trace") in ("1", "true"):
+        with metrics.trace_context() as trace:
+            response = await call_next(request)
+        if trace:
+            response.headers["Server-Timing"] = format_server_timing(trace)
+    else:
+        response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.observe("http_request_seconds", time.perf_counter() - started,
+                    method=request.method, route=route.path if route else "unmatched")
+    return response
+
+# Pushes zone changes, job progress and the arm pose to /events and /ws/events subscribers
+event_hub = EventHub()
+
+def publish_zone_change(zone, version):
+    if zone is None:
+        event_hub.publish("zone", {"version": version, "reloaded": True})
+    else:
+        event_hub.publish("zone", {"version": version, "zone": zone})
+
+# In-memory copy of the coordinates and zones tables, kept coherent by write-through
+zone_cache = ZoneCache(on_change=publish_zone_change)
 
 def get_coordinate(name: str):
-    conn = sqlite3.connect("robot_zones.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT x, y, z FROM coordinates WHERE name = ?", (name,))
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        return {"x": row[0], "y": row[1], "z": row[2]}
+    coordinate = zone_cache.get_coordinate(name)
+    if coordinate:
+        return coordinate
     else:
         raise HTTPException(status_code=404, detail=f"Coordinate '{name}' not found.")
 
 def get_zone(zone_id: str):
-    conn = sqlite3.connect("robot_zones.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT x, y, z, status, productCode, productType, additionalInfo FROM zones WHERE name = ?", (zone_id,))
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        return {
-            "x": row[0],
-            "y": row[1],
-            "z": row[2],
-            "status": row[3],
-            "productCode": row[4],
-            "productType": row[5],
-            "additionalInfo": row[6]
-        }
+    zone = zone_cache.get_zone(zone_id)
+    if zone:
+        return zone
     else:
         raise HTTPException(status_code=404, detail=f"Zone '{zone_id}' not found.")
 
 
-def update_zone_status(zone_id: str, status: str):
-    conn = sqlite3.connect("robot_zones.db")
-    cursor = conn.cursor()
-    cursor.execute("UPDATE zones SET status = ? WHERE name = ?", (status, zone_id))
-    conn.commit()
-    conn.close()
+# Workspace checked by zone imports while no arm is configured (ENVELOPE_* env vars)
+default_envelope = Envelope.from_env()
+
+# Serializes zone assignment of batches; single zones are taken by one conditional update
+allocation_lock = threading.Lock()
+BATCH_ALLOCATION_TRIES = 3  # assignments tried when concurrent requests take the chosen zones
 
+def finish_zone_move(zone_id: str, reservation: str, to_status: str, **fields):
+    """in_transit -> 'to_status' once the arm has put the package down (or picked it up)."""
+    if not zone_cache.transition(zone_id, reservation, IN_TRANSIT, to_status, release=True, **fields):
+        print(f"Zone {zone_id} was no longer in transit for this operation, left as {get_zone(zone_id)['status']}.")
+
+def roll_back_zone(zone_id: str, reservation: str):
+    """After a failed operation: a zone caught mid-move is flagged 'failed', a merely reserved one is given back."""
+    if zone_cache.transition(zone_id, reservation, IN_TRANSIT, FAILED, release=True):
+        print(f"Zone {zone_id} marked as failed: the move was interrupted, check the package.")
+    else:
+        zone_cache.release(reservation, zone_id)
+
+def on_job_change(job):
+    event_hub.publish("job", job.to_dict())
+    # Safety net: whatever way a job ended (cancelled while queued, arm gone, error), no reservation outlives it
+    if job.status in FINISHED_STATES and job.kwargs.get("reservation"):
+        released = zone_cache.release(job.kwargs["reservation"])
+        if released:
+            print(f"Job {job.id} ended, zones released: {', '.join(released)}")
+
+def live_reservations():
+    """Reservation tokens of jobs still queued or running, kept alive by the reservation sweeper."""
+    return {job.kwargs["reservation"] for arm in list(fleet.arms.values()) for job in arm.job_queue.list()
+            if job.status not in FINISHED_STATES and job.kwargs.get("reservation")}
+
+
+# Hardware backends: "real" (default) or "sim" for the simulated arm / replayed camera
+DOBOT_BACKEND = os.environ.get("DOBOT_BACKEND", "real")
+CAMERA_BACKEND = os.environ.get("CAMERA_BACKEND", "real")
+# Show detected barcodes in an OpenCV window (needs a display)
+BARCODE_PREVIEW = os.environ.get("BARCODE_PREVIEW", "1") != "0"
+# Hold the API back until every arm had its first connect attempt (the old blocking startup)
+STARTUP_WAIT_FOR_HARDWARE = os.environ.get("STARTUP_WAIT_FOR_HARDWARE", "0") != "0"
+# Subsystems that must be ready for /health/ready to answer 200
+READY_REQUIRES = [name.strip() for name in os.environ.get("READY_REQUIRES", "database,zones,arms,camera,decoder").split(",") if name.strip()]
+CAMERA_STALE_SECONDS = 5  # a camera whose newest frame is older than this is not ready
 
 # Default speed parameters (adjust as needed)
 DEFAULT_VELOCITY = 50  # Set a lower value for slower speed (e.g., 50)
 DEFAULT_ACCELERATION = 50  # Set a lower value for slower acceleration (e.g., 50)
 
-# Global variable to store the Dobot device and a flag to track connection status
-device = None
-is_connected = False  # Flag to track connection status
-
-# Function to connect to Dobot and store the device globally
-def connect_to_dobot():
-    global device, is_connected  # Use the global 'device' and 'is_connected' variables
-    
-    # If the device is already connected, skip reconnection
-    if is_connected and device:
-        return device, "Dobot is already connected."
-
-    available_ports = list_ports.comports()
-    
-    # Check if any ports are available
-    if not available_ports:
-        return None, "No available serial ports found. Make sure Dobot is connected."
-
-    # Print the available ports for debugging purposes
-    print("Available ports:", [port.device for port in available_ports])
-
-    # Get the first available port
-    port = available_ports[0].device
-    print(f"Trying to connect to Dobot on port: {port}")
-
+# Append-only history of storages, pickups, barcode attempts and motion steps (group-committed in the background)
+operation_journal = journal.Journal()
+
+def publish_step(plan, number, step, duration):
+    """execute_plan progress callback: report each completed step of the running job."""
+    job = current_job()
+    label = step.label or step.kind
+    event_hub.publish("step", {"job_id": job.id if job else None, "arm": job.kwargs.get("arm") if job else None,
+                               "plan": plan.name, "step": number + 1, "steps": len(plan.steps), "label": label})
+    operation_journal.record(journal.STEP, status="done", duration=duration, plan=plan.name, step=number + 1, label=label)
+
+def publish_pose(arm, sample):
+    """Pose sampler callback: forward samples to 'pose' subscribers at most POSE_STREAM_HZ times a second per arm."""
+    t, x, y, z, r, *joints = sample.tolist()
+    if t - arm.last_pose_event < 1 / POSE_STREAM_HZ or not event_hub.has_subscribers("pose"):
+        return
+    arm.last_pose_event = t
+    event_hub.publish("pose", {"arm": arm.name, "t": t, "x": x, "y": y, "z": z, "r": r, "joints": joints})
+
+# Every arm on this host, each with its own serial link, job queue (a single worker thread owns
+# the arm while executing them), route planner and pose sampler. Jobs go to the least busy arm.
+# Arms are discovered and (re)connected on a background thread, so the API is up before they are.
+fleet = Fleet(backend=DOBOT_BACKEND, on_job_change=on_job_change,
+              on_pose_sample=publish_pose, on_connect=lambda arm: set_dobot_speed(arm=arm))
+
+def get_arm(name: Optional[str] = None, connected: bool = True):
+    """Arm by name (the first arm when omitted); raises 404/503 if it is unknown or not connected."""
+    arm = fleet.get(name)
+    if arm is None and fleet.state == STARTING:
+        raise HTTPException(status_code=503, detail="Dobot arms are still being connected.")
+    if arm is None:
+        raise HTTPException(status_code=404, detail=f"Arm '{name}' not found." if name else "No Dobot arms configured.")
+    if connected and arm.device is None:
+        raise HTTPException(status_code=503, detail=f"Dobot {arm.name} is not connected. Please connect first.")
+    return arm
+
+def arm_coordinate(arm, name: str):
+    """pickup_zone/drop_zone/safe_zone of an arm: its own override or the shared coordinate."""
+    return arm.coordinates.get(name) or get_coordinate(name)
+
+# Long-lived camera with a background grabber; decode code reads the newest frame from it
+camera_service = SimulatedCamera() if CAMERA_BACKEND == "sim" else CameraService()
+
+# Barcode decode pipeline (ROI, grayscale, downscale-then-refine), configured from BARCODE_* env vars
+decode_pipeline = DecodePipeline()
+
+# Detects when the package has stopped moving in the pickup ROI, replacing the fixed pre-scan sleep
+settle_detector = SettleDetector(camera_service, roi=decode_pipeline.config.roi)
+
+# Pixel -> arm homography per arm, used to compute the re-orientation move from the label pose
+calibrations = CalibrationStore()
+
+# Frames seen while scanning, recorded for offline replay (bench_corpus.py) when FRAME_CORPUS_DIR is set
+frame_corpus = FrameCorpus() if FRAME_CORPUS_DIR else None
+
+# Optional multi-process decode engine (DECODE_POOL_SIZE > 0), started in the background on startup
+decode_engine = None
+# zbar and the decode engine are loaded off the startup path; /health/ready reports how that went
+vision_status = {"state": "stopped", "error": None}
+started_at = time.time()
+
+def start_vision():
+    global decode_engine
+    vision_status.update(state="starting", error=None)
     try:
-        # Attempt to create the Dobot object
-        device = Dobot(port=port)
-        
-        # Check if Dobot was successfully created
-        if device is None:
-            return None, "Failed to create Dobot instance. The connection may not be established."
-
-        is_connected = True  # Set the connection flag to True
-        return device, "Dobot connected successfully!"
-    except AttributeError as attr_err:
-        return None, f"Attribute error while connecting to Dobot: {attr_err}"
+        load_zbar()
+        if DECODE_POOL_SIZE > 0:
+            decode_engine = DecodeEngine(DECODE_POOL_SIZE, symbols=decode_pipeline.config.symbols, roi=decode_pipeline.config.roi)
+        vision_status["state"] = "ready"
     except Exception as e:
-        return None, f"Failed to connect to Dobot: {e}"
+        vision_status.update(state="down", error=str(e))
+        print(f"Barcode decoding is unavailable: {e}")
 
 # Function to set the speed of the Dobot
-def set_dobot_speed(velocity: float = DEFAULT_VELOCITY, acceleration: float = DEFAULT_ACCELERATION):
+def set_dobot_speed(velocity: float = DEFAULT_VELOCITY, acceleration: float = DEFAULT_ACCELERATION, arm=None):
     """Set the speed and acceleration of the Dobot."""
-    global device
-    if device:
-        device.speed(velocity, acceleration)
-        print(f"Dobot speed set to velocity: {velocity}, acceleration: {acceleration}")
+    arm = arm or fleet.default
+    if arm and arm.device:
+        # Queued like the plan speed changes; Dobot.speed() would busy-wait on the controller holding the link
+        apply_speed(arm.device, velocity, acceleration)
+        print(f"Dobot {arm.name} speed set to velocity: {velocity}, acceleration: {acceleration}")
     else:
         print("Dobot is not connected. Cannot set speed.")
 
+@contextmanager
+def direct_control(arm):
+    """Hold the arm's serial link for commands sent outside its job queue.
+
+    Raises 409 while the arm has jobs queued or running, so a direct command never lands in the middle of a plan.
+    """
+    with arm.device.exclusive():
+        if arm.load():
+            raise HTTPException(status_code=409, detail=f"Dobot {arm.name} is busy with queued jobs. Try again when its queue is empty.")
+        yield
+
 # FastAPI event handler to run on startup
 @app.on_event("startup")
 async def startup_event():
-    global device
-    device, message = connect_to_dobot()
-    if device:
-        print("Dobot connected successfully on startup!")
-        set_dobot_speed()  # Set default speed on startup
-    else:
-        print(f"Failed to connect Dobot on startup: {message}")
+    # Schema, migrations and the zone cache are set up here rather than on import, so importing main stays cheap
+    database.initialize_database()
+    # Jobs don't survive a restart, so neither do their zone reservations
+    for name, status in database.recover_reservations():
+        print(f"Zone {name} was reserved before the restart, now {status}.")
+    zone_cache.load()
+    event_hub.bind(asyncio.get_running_loop())
+    operation_journal.start()
+    camera_service.start()
+    if frame_corpus:
+        frame_corpus.start()
+    zone_cache.start_sweeper(live_reservations=live_reservations)
+    # Serial enumeration, connecting (default speed on every connect) and decoder loading run in the background
+    threading.Thread(target=start_vision, name="vision-init", daemon=True).start()
+    fleet.start()
+    if STARTUP_WAIT_FOR_HARDWARE:
+        await asyncio.to_thread(fleet.started.wait)
 
 # FastAPI event handler to run on shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
-    global device, is_connected
-    if device:
-        print("Disconnecting Dobot on shutdown...")
-        device.close()
-        device = None  # Reset the device
-        is_connected = False  # Reset the connection flag
-        print("Dobot disconnected successfully.")
+    print("Disconnecting Dobot arms on shutdown...")
+    fleet.stop()
+    camera_service.stop()
+    if decode_engine:
+        decode_engine.close()
+    if frame_corpus:
+        frame_corpus.stop()
+    zone_cache.stop_sweeper()
+    operation_journal.stop()
+    database.close_all()
+    print("Dobot arms disconnected successfully.")
 
 @app.get("/")
 def read_root():
     return {"message": "FastAPI server is running"}
 
 @app.post("/set-home")
-def set_home_position():
-    global device  # Ensure we're using the global 'device' variable
+def set_home_position(arm: Optional[str] = None):
+    arm = get_arm(arm, connected=False)
 
     # Ensure Dobot is connected
-    if not device:
+    if not arm.device:
         return {"status": "error", "message": "Dobot is not connected. Please connect first."}
 
-    try:
-        # Call the command to set the home position
-        device._set_home_cmd()
-        return {"status": "success", "message": "Home position set successfully."}
-    except Exception as e:
-        return {"status": "error", "message": f"Failed to set home position: {e}"}
+    with direct_control(arm):
+        try:
+            # Call the command to set the home position
+            arm.device._set_home_cmd()
+            arm.route_planner.last_position = None
+            return {"status": "success", "message": "Home position set successfully."}
+        except Exception as e:
+            return {"status": "error", "message": f"Failed to set home position: {e}"}
 
 
 @app.get("/set-speed")
-def set_speed_endpoint(velocity: float = DEFAULT_VELOCITY, acceleration: float = DEFAULT_ACCELERATION):
+def set_speed_endpoint(velocity: float = DEFAULT_VELOCITY, acceleration: float = DEFAULT_ACCELERATION, arm: Optional[str] = None):
     """Endpoint to set Dobot speed."""
-    set_dobot_speed(velocity, acceleration)
+    arm = get_arm(arm, connected=False)
+    if arm.device:
+        with direct_control(arm):
+            set_dobot_speed(velocity, acceleration, arm)
+    else:
+        set_dobot_speed(velocity, acceleration, arm)
     return {"status": "success", "message": f"Dobot speed set to velocity: {velocity}, acceleration: {acceleration}"}
 
 @app.get("/dobot-status")
-def check_dobot_connection():
-    global device  # Ensure we're using the global 'device' variable
-    if device:
-        return {"status": "success", "message": "Dobot is connected."}
+def check_dobot_connection(arm: Optional[str] = None):
+    arm = fleet.get(arm)
+    if arm and arm.device:
+        return {"status": "success", "message": f"Dobot {arm.name} is connected."}
     else:
         return {"status": "error", "message": "Dobot is not connected."}
 
+@app.get("/fleet/")
+def get_fleet():
+    """Every arm with its connection state, served zones and queue."""
+    return fleet.to_dict()
+
+@app.get("/health/live")
+def health_live():
+    """The process is up and serving requests."""
+    return {"status": "alive", "uptime": round(time.time() - started_at, 3)}
+
+def subsystem_health():
+    subsystems = {}
+    try:
+        database.fetch_one("SELECT 1")
+        subsystems["database"] = {"state": "ready"}
+    except sqlite3.Error as e:
+        subsystems["database"] = {"state": "down", "error": str(e)}
+    subsystems["zones"] = {"state": "ready" if zone_cache.loaded else "starting", "zones": len(zone_cache.index),
+                           "version": zone_cache.version}
+    subsystems["journal"] = {"state": "ready" if operation_journal.is_running else "down"}
+    arms = [{"name": arm.name, "connected": arm.device is not None, "error": arm.error, "connect_attempts": arm.connect_attempts}
+            for arm in fleet.arms.values()]
+    if any(arm["connected"] for arm in arms):
+        state = "ready"
+    else:
+        state = "starting" if fleet.state == STARTING else "down"
+    subsystems["arms"] = {"state": state, "fleet": fleet.state, "arms": arms}
+    camera = camera_service.stats()
+    if camera["running"] and camera["latest_frame_age"] is not None and camera["latest_frame_age"] < CAMERA_STALE_SECONDS:
+        state = "ready"
+    else:
+        state = "starting" if camera["running"] and not camera["frames_captured"] else "down"
+    subsystems["camera"] = {"state": state, "fps": camera["fps"], "latest_frame_age": camera["latest_frame_age"]}
+    subsystems["decoder"] = dict(vision_status)
+    if DECODE_POOL_SIZE > 0:
+        subsystems["decode_pool"] = {"state": "ready" if decode_engine else vision_status["state"]}
+    return subsystems
+
+@app.get("/health/ready")
+def health_ready():
+    """Each subsystem's state; 200 once the ones in READY_REQUIRES are ready, 503 until then."""
+    subsystems = subsystem_health()
+    ready = all(subsystems.get(name, {}).get("state") == "ready" for name in READY_REQUIRES)
+    body = {"status": "ready" if ready else "not_ready", "uptime": round(time.time() - started_at, 3),
+            "requires": READY_REQUIRES, "subsystems": subsystems}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
 @app.get("/dobot-position")
-def get_dobot_position():
-    global device  # Ensure we're using the global 'device' variable
+def get_dobot_position(arm: Optional[str] = None):
+    arm = get_arm(arm, connected=False)
     # Ensure Dobot is connected
-    if not device:
+    if not arm.device:
         return {"status": "error", "message": "Dobot is not connected. Please connect first."}
     
     try:
-        # Get the current pose of the Dobot
-        pose = device.get_pose()
-
-        # Access the attributes from the nested Position and Joints objects
-        position = pose.position  # Get the Position object
-        joints = pose.joints  # Get the Joints object
+        # Served from the pose sampler; only read the arm directly if the sample is stale
+        pose_sampler = arm.pose_sampler
+        sample = pose_sampler.latest()
+        if sample is None or time.time() - sample["t"] > max(2 / pose_sampler.rate, 1.0):
+            row = pose_sampler.sample(arm.device)
+            if row is None:
+                return {"status": "error", "message": "Failed to get Dobot position."}
+            sample = dict(zip(POSE_COLUMNS, row.tolist()))
 
         # Return the position and joint information
         return {
             "status": "success",
-            "x": position.x,
-            "y": position.y,
-            "z": position.z,
-            "r": position.r,
-            "joint1": joints.j1,
-            "joint2": joints.j2,
-            "joint3": joints.j3,
-            "joint4": joints.j4,
+            "x": sample["x"],
+            "y": sample["y"],
+            "z": sample["z"],
+            "r": sample["r"],
+            "joint1": sample["j1"],
+            "joint2": sample["j2"],
+            "joint3": sample["j3"],
+            "joint4": sample["j4"],
+            "timestamp": sample["t"],
         }
     except Exception as e:
         return {"status": "error", "message": f"Failed to get Dobot position: {e}"}
 
+@app.get("/dobot-position/history")
+def get_dobot_position_history(seconds: Optional[float] = None, max_points: Optional[int] = 1000, arm: Optional[str] = None):
+    """Recent trajectory from the pose sampler as rows of [t, x, y, z, r, j1, j2, j3, j4], oldest first."""
+    pose_sampler = get_arm(arm, connected=False).pose_sampler
+    samples = pose_sampler.history(seconds, max_points)
+    return {"status": "success", "columns": POSE_COLUMNS, "samples": samples.round(3).tolist(), "sampler": pose_sampler.stats()}
+
 
 @app.get("/move-to/")
-def move_dobot_to(x: float, y: float, z: float, r: Optional[float] = 0, velocity: float = DEFAULT_VELOCITY, acceleration: float = DEFAULT_ACCELERATION):
-    global device  # Ensure we're using the global 'device' variable
+def move_dobot_to(x: float, y: float, z: float, r: Optional[float] = 0, velocity: float = DEFAULT_VELOCITY, acceleration: float = DEFAULT_ACCELERATION, arm: Optional[str] = None):
+    arm = get_arm(arm, connected=False)
     # Ensure Dobot is connected
-    if not device:
+    if not arm.device:
         return {"status": "error", "message": "Dobot is not connected. Please connect first."}
 
-    try:
-        # Set the desired speed before movement
-        set_dobot_speed(velocity, acceleration)
-        
-        # Move Dobot to the specified position
-        device.move_to(x, y, z, r)
-        return {"status": "success", "message": f"Moved Dobot to position ({x}, {y}, {z}, {r}) with velocity: {velocity} and acceleration: {acceleration}"}
-    except Exception as e:
-        return {"status": "error", "message": f"Failed to move Dobot: {e}"}
-
-
-@app.post("/pickup-from-store/")
-def pickup_from_store_operation(zone_id: str, velocity: float = DEFAULT_VELOCITY, acceleration: float = DEFAULT_ACCELERATION):
-    global device  # Ensure we're using the global 'device' variable
+    with direct_control(arm):
+        try:
+            # Set the desired speed before movement (skipped when it is already set)
+            apply_speed(arm.device, velocity, acceleration)
+
+            # Move Dobot to the specified position
+            arm.device.move_to(x, y, z, r)
+            arm.route_planner.last_position = (x, y, z, r)
+            return {"status": "success", "message": f"Moved Dobot to position ({x}, {y}, {z}, {r}) with velocity: {velocity} and acceleration: {acceleration}"}
+        except Exception as e:
+            arm.route_planner.last_position = None
+            return {"status": "error", "message": f"Failed to move Dobot: {e}"}
+
+
+def fixed_speed(velocity: Optional[float], acceleration: Optional[float]):
+    """(velocity, acceleration) when a request asks for one speed for the whole plan, None to use the motion profiles."""
+    if velocity is None and acceleration is None:
+        return None
+    return (velocity if velocity is not None else DEFAULT_VELOCITY, acceleration if acceleration is not None else DEFAULT_ACCELERATION)
+
+
+def route_plan(arm, plan, velocity: Optional[float], acceleration: Optional[float], more_follows: bool = False):
+    """Optimize a plan against where the arm is now and whether another operation follows it, then assign speeds."""
+    route_planner = arm.route_planner
+    fixed = fixed_speed(velocity, acceleration)
+    if not ROUTE_OPTIMIZE:
+        route_planner.last_position = None
+        return assign_profiles(plan, fixed), None
+    plan, report = route_planner.optimize(plan, start=route_planner.last_position,
+                                          end_at_safe=not (more_follows or arm.job_queue.has_pending()),
+                                          velocity=(fixed or PROFILES[FAST_TRANSIT])[0], acceleration=(fixed or PROFILES[FAST_TRANSIT])[1])
+    route_planner.last_position = plan_end_position(plan, route_planner.last_position)
+    return assign_profiles(plan, fixed), report
+
+
+def plan_end_position(plan, default=None):
+    moves = [step for step in plan.steps if step.kind == "move"]
+    return (moves[-1].x, moves[-1].y, moves[-1].z, moves[-1].r) if moves else default
+
+def validate_motion_mode(motion_mode: Optional[str]):
+    if motion_mode not in (None, QUEUED, STEP):
+        raise HTTPException(status_code=400, detail=f"Unknown motion mode '{motion_mode}'. Use '{QUEUED}' or '{STEP}'.")
+
+@app.post("/pickup-from-store/", status_code=202)
+def pickup_from_store_operation(zone_id: str, velocity: Optional[float] = None, acceleration: Optional[float] = None, motion_mode: Optional[str] = None, arm: Optional[str] = None):
+    # Validate the request up front so obvious errors are reported immediately
+    validate_motion_mode(motion_mode)
+    zone = get_zone(zone_id)
+    # Taking the zone is one conditional update: of two requests for the same package only one gets it
+    reservation = zone_cache.reserve(zone_id, from_status=OCCUPIED, to_status=PICKUP_RESERVED)
+    if reservation is None:
+        raise HTTPException(status_code=409, detail=f"Zone {zone_id} is {zone['status']}, not occupied. No package to pick up.")
+
+    target, job = fleet.submit("pickup", run_pickup_operation, for_zones=[zone_id], arm=arm, zone_id=zone_id, reservation=reservation,
+                               velocity=velocity, acceleration=acceleration, motion_mode=motion_mode)
+    if job is None:
+        zone_cache.release(reservation)
+        raise HTTPException(status_code=503, detail=f"No connected arm serves zone {zone_id}.")
+    return {"status": "queued", "job_id": job.id, "arm": target.name, "message": f"Pickup from zone {zone_id} queued."}
+
+
+def run_pickup_operation(zone_id: str, reservation: str = None, velocity: Optional[float] = None, acceleration: Optional[float] = None, motion_mode: Optional[str] = None, arm: Optional[str] = None):
+    # Zones still reserved when the job ends are released by on_job_change
+    arm = fleet.get(arm)
+    if not arm or not arm.device:
+        return {"status": "error", "message": "Dobot is not connected. Please connect first."}
 
-    # Retrieve storage zone details from the database
+    # The reservation may have expired while the job was queued
     zone = get_zone(zone_id)
-    if zone["status"] != "occupied":
-        raise HTTPException(status_code=400, detail=f"Zone {zone_id} is not occupied. No package to pick up.")
+    if not zone_cache.renew(zone_id, reservation):
+        return {"status": "error", "message": f"The reservation of zone {zone_id} expired before the pickup started."}
 
     # Retrieve safe and drop zone coordinates
-    safe_zone = get_coordinate("safe_zone")
-    drop_zone = get_coordinate("drop_zone")
+    safe_zone = arm_coordinate(arm, "safe_zone")
+    drop_zone = arm_coordinate(arm, "drop_zone")
 
+    started = time.monotonic()
     try:
-        # Step 1: Set speed
-        set_dobot_speed(velocity, acceleration)
-
-        # Step 2: Move to the safe zone before interacting with the storage zone
-        device.move_to(safe_zone["x"], safe_zone["y"], safe_zone["z"], 0)
-        print(f"Moved to safe zone {safe_zone} before interacting with storage zone.")
-
-        # Step 3: Move to the storage zone (along z-axis)
-        z_up_store = zone["z"] + 110  # Move to a position above the storage zone
-        device.move_to(zone["x"], zone["y"], z_up_store, 0)  # Move above the storage zone
-        device.move_to(zone["x"], zone["y"], zone["z"], 0)  # Move down into the storage zone
-        device.suck(True)  # Activate suction to pick up the package
-        print(f"Picked up package from storage zone {zone_id} at ({zone['x']}, {zone['y']}, {zone['z']})")
-
-        # Step 4: Move up for safety after picking up the package
-        device.move_to(zone["x"], zone["y"], z_up_store, 0)  # Move back up to a safe height
-        print(f"Moved up to a safe height after picking up the package from storage zone.")
-
-        # Step 5: Move to the drop zone (along z-axis)
-        z_above_drop = drop_zone["z"] + 110  # Move to a position above the drop zone
-        device.move_to(drop_zone["x"], drop_zone["y"], z_above_drop, 0)  # Move above the drop zone
-        device.move_to(drop_zone["x"], drop_zone["y"], drop_zone["z"], 0)  # Move down into the drop zone
-        device.suck(False)  # Deactivate suction to drop the package
-        print(f"Dropped package at drop zone at ({drop_zone['x']}, {drop_zone['y']}, {drop_zone['z']})")
-
-        # Step 6: Move back up for safety after dropping the package
-        device.move_to(drop_zone["x"], drop_zone["y"], z_above_drop, 0)
-        print(f"Moved back up to a safe height after dropping the package.")
-
-        # Step 7: Move back to the safe zone after dropping the package
-        device.move_to(safe_zone["x"], safe_zone["y"], safe_zone["z"], 0)
-        print(f"Moved back to safe zone {safe_zone} after dropping the package.")
-
-        # Step 8: Update the zone's status to "available" and clear additional data
-        conn = sqlite3.connect("robot_zones.db")
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE zones
-            SET status = "available", productCode = NULL, productType = NULL, additionalInfo = NULL, datetime = NULL
-            WHERE name = ?
-        ''', (zone_id,))
-        conn.commit()
-        conn.close()
-
-        return {"status": "success", "message": f"Package picked up from {zone_id} and dropped at the drop zone."}
+        # Step 1: Safe zone -> storage zone (pick) -> drop zone (release) -> safe zone, as one plan
+        plan, route = route_plan(arm, build_pickup_plan(zone, drop_zone, safe_zone), velocity, acceleration)
+        if not zone_cache.transition(zone_id, reservation, PICKUP_RESERVED, IN_TRANSIT):
+            raise HTTPException(status_code=409, detail=f"Zone {zone_id} is no longer reserved for this pickup.")
+        execution = execute_plan(arm.device, plan, motion_mode, progress=publish_step, check=arm.job_queue.check_cancelled)
+        execution["route"] = route
+        print(f"Picked up package from storage zone {zone_id} and dropped it at the drop zone.")
+
+        # Step 2: Update the zone's status to "available" and clear additional data; the journal keeps the product
+        finish_zone_move(zone_id, reservation, AVAILABLE, productCode=None, productType=None, additionalInfo=None, datetime=None)
+        operation_journal.record(journal.PICKUP, status="success", duration=time.monotonic() - started, zone=zone_id,
+                                 product_code=zone["productCode"], product_type=zone["productType"],
+                                 additionalInfo=zone["additionalInfo"], cycle_time=execution["cycle_time"])
+
+        return {"status": "success", "message": f"Package picked up from {zone_id} and dropped at the drop zone.", "motion": execution}
     except Exception as e:
+        # The plan may not have run (or not to the end): the arm is no longer known to be where it ends
+        arm.route_planner.last_position = None
+        roll_back_zone(zone_id, reservation)
+        operation_journal.record(journal.PICKUP, status="cancelled" if isinstance(e, JobCancelled) else "error",
+                                 duration=time.monotonic() - started, zone=zone_id, product_code=zone["productCode"],
+                                 product_type=zone["productType"], error=str(e))
         return {"status": "error", "message": f"Failed to complete operation: {e}"}
     
-@app.post("/storage/")
-def storage_operation(request: StorageRequest, max_barcode_attempts: Optional[int] = 3, velocity: float = DEFAULT_VELOCITY, acceleration: float = DEFAULT_ACCELERATION):
+@app.post("/storage/", status_code=202)
+def storage_operation(request: StorageRequest, max_barcode_attempts: Optional[int] = 3, velocity: Optional[float] = None, acceleration: Optional[float] = None, motion_mode: Optional[str] = None, arm: Optional[str] = None):
+    # Validate the request up front so obvious errors are reported immediately
+    validate_motion_mode(motion_mode)
+    zone = get_zone(request.zone_id)
+    # Taking the zone is one conditional update: of two requests for the same zone only one gets it
+    reservation = zone_cache.reserve(request.zone_id)
+    if reservation is None:
+        raise HTTPException(status_code=409, detail=f"Zone {request.zone_id} is not available ({zone['status']}).")
+
+    target, job = fleet.submit("storage", run_storage_operation, for_zones=[request.zone_id], arm=arm, request=request, reservation=reservation,
+                               max_barcode_attempts=max_barcode_attempts, velocity=velocity, acceleration=acceleration, motion_mode=motion_mode)
+    if job is None:
+        zone_cache.release(reservation)
+        raise HTTPException(status_code=503, detail=f"No connected arm serves zone {request.zone_id}.")
+    return {"status": "queued", "job_id": job.id, "arm": target.name, "message": f"Storage into zone {request.zone_id} queued."}
+
+
+def run_storage_operation(request: StorageRequest, reservation: str = None, max_barcode_attempts: Optional[int] = 3, velocity: Optional[float] = None, acceleration: Optional[float] = None, motion_mode: Optional[str] = None, arm: Optional[str] = None):
     zone_id = request.zone_id
     productType = request.productType
     additionalInfo = request.additionalInfo
-    global device  # Ensure we're using the global 'device' variable
+    # Zones still reserved when the job ends are released by on_job_change
+    arm = fleet.get(arm)
+    if not arm or not arm.device:
+        return {"status": "error", "message": "Dobot is not connected. Please connect first."}
 
     # Get pickup and safe zone coordinates from the database
-    pickup_zone = get_coordinate("pickup_zone")
-    safe_zone = get_coordinate("safe_zone")
+    pickup_zone = arm_coordinate(arm, "pickup_zone")
+    safe_zone = arm_coordinate(arm, "safe_zone")
     
-    # Retrieve the specified storage zone data
+    # The reservation may have expired while the job was queued
     zone = get_zone(zone_id)
-    if zone["status"] != "available":
-        raise HTTPException(status_code=400, detail=f"Zone {zone_id} is not available.")
-
-    # Step 1: Attempt to read the barcode
-    print("Attempting to read barcode before storing the package.")
-    barcode_data = barcode_reader_and_handle_package(max_attempts=max_barcode_attempts)
-    if not barcode_data:
-        print(f"No barcode detected after {max_barcode_attempts} attempts. Operation canceled.")
-        return JSONResponse(content={"status": "error", "message": f"No barcode detected after {max_barcode_attempts} attempts."}, status_code=404)
-
-    # Retrieve the barcode data
-    product_code = barcode_data[0]['data']  # Use the first detected barcode
-
-    # Step 2: Update the zone with the captured `product_code`, `productType`, `additionalInfo`, and current datetime
-    current_datetime = datetime.now().isoformat()  # Get the current date and time
-    conn = sqlite3.connect("robot_zones.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE zones
-        SET productCode = ?, productType = ?, additionalInfo = ?, status = "occupied", datetime = ?
-        WHERE name = ?
-    ''', (product_code, productType, additionalInfo, current_datetime, zone_id))
-    conn.commit()
-    conn.close()
-
-    # Step 3: Perform the storage operation
-    set_dobot_speed(velocity, acceleration)
-    device.move_to(safe_zone["x"], safe_zone["y"], safe_zone["z"], 0)
-    
-    # Pickup operations
-    z_above_pickup = pickup_zone["z"] + 150
-    device.move_to(pickup_zone["x"], pickup_zone["y"], z_above_pickup, 0)
-    device.move_to(pickup_zone["x"], pickup_zone["y"], pickup_zone["z"], 0)
-    device.suck(True)
-    device.move_to(pickup_zone["x"], pickup_zone["y"], z_above_pickup)
+    if not zone_cache.renew(zone_id, reservation):
+        return {"status": "error", "message": f"The reservation of zone {zone_id} expired before the storage started."}
+
+    return store_package(arm, zone, reservation, productType, additionalInfo, pickup_zone, safe_zone, max_barcode_attempts, velocity, acceleration, motion_mode)
+
+
+def store_package(arm, zone: dict, reservation: str, productType: str, additionalInfo: str, pickup_zone: dict, safe_zone: dict,
+                  max_barcode_attempts: int, velocity: Optional[float], acceleration: Optional[float], motion_mode: Optional[str],
+                  more_follows: bool = False):
+    """Scan the package waiting at the arm's pickup zone and move it into 'zone', reserved under 'reservation'.
 
-    # Storage operations
-    z_up_store = zone["z"] + 110
-    device.move_to(zone["x"], zone["y"], z_up_store, 0)
-    device.move_to(zone["x"], zone["y"], zone["z"], 0)
-    device.suck(False)
-    device.move_to(zone["x"], zone["y"], z_up_store)
-    device.move_to(safe_zone["x"], safe_zone["y"], safe_zone["z"], 0)
+    The zone is given back if the package can't be scanned and flagged 'failed' if the move breaks off.
+    """
+    zone_id = zone["name"]
+    started = time.monotonic()
+    product_code = None
 
-    return {"status": "success", "message": f"Package stored in zone {zone_id} with type {productType} and additional info {additionalInfo}."}
+    try:
+        # Step 1: Attempt to read the barcode
+        print("Attempting to read barcode before storing the package.")
+        barcode_data = barcode_reader_and_handle_package(arm, max_attempts=max_barcode_attempts)
+        if not barcode_data:
+            zone_cache.release(reservation, zone_id)
+            print(f"No barcode detected after {max_barcode_attempts} attempts. Operation canceled.")
+            operation_journal.record(journal.STORAGE, status="no_barcode", duration=time.monotonic() - started, zone=zone_id,
+                                     product_type=productType, attempt=max_barcode_attempts)
+            return {"status": "error", "message": f"No barcode detected after {max_barcode_attempts} attempts."}
+
+        # Last chance to cancel before the zone is committed and the package moved
+        arm.job_queue.check_cancelled()
+
+        # Retrieve the barcode data
+        product_code = barcode_data[0]['data']  # Use the first detected barcode
+
+        # Step 2: The package is on its way: record the captured `product_code`, `productType`, `additionalInfo` and datetime
+        current_datetime = datetime.now().isoformat()  # Get the current date and time
+        plan, route = route_plan(arm, build_storage_plan(pickup_zone, zone, safe_zone), velocity, acceleration, more_follows)
+        if not zone_cache.transition(zone_id, reservation, RESERVED, IN_TRANSIT, productCode=product_code, productType=productType,
+                                     additionalInfo=additionalInfo, datetime=current_datetime):
+            raise HTTPException(status_code=409, detail=f"Zone {zone_id} is no longer reserved for this storage.")
+
+        # Step 3: Perform the storage operation
+        execution = execute_plan(arm.device, plan, motion_mode, progress=publish_step, check=arm.job_queue.check_cancelled)
+        execution["route"] = route
+        finish_zone_move(zone_id, reservation, OCCUPIED)
+    except Exception as e:
+        arm.route_planner.last_position = None  # see run_pickup_operation
+        roll_back_zone(zone_id, reservation)
+        operation_journal.record(journal.STORAGE, status="cancelled" if isinstance(e, JobCancelled) else "error",
+                                 duration=time.monotonic() - started, zone=zone_id, product_code=product_code,
+                                 product_type=productType, error=getattr(e, "detail", None) or str(e))
+        raise
+
+    operation_journal.record(journal.STORAGE, status="success", duration=time.monotonic() - started, zone=zone_id,
+                             product_code=product_code, product_type=productType, additionalInfo=additionalInfo,
+                             cycle_time=execution["cycle_time"])
+    return {"status": "success", "message": f"Package stored in zone {zone_id} with type {productType} and additional info {additionalInfo}.",
+            "productCode": product_code, "motion": execution}
+
+
+@app.post("/storage/batch", status_code=202)
+def storage_batch_operation(request: BatchStorageRequest, max_barcode_attempts: Optional[int] = 3, velocity: Optional[float] = None, acceleration: Optional[float] = None, motion_mode: Optional[str] = None, arm: Optional[str] = None):
+    """Store several packages as one job. Zones are assigned (and reserved) up front by the chosen policy."""
+    validate_motion_mode(motion_mode)
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No packages given.")
+
+    # The whole batch runs on one arm: the named one or the least busy arm serving the pinned zones
+    pinned = [item.zone_id for item in request.items if item.zone_id]
+    target = get_arm(arm) if arm else fleet.dispatch(pinned)
+    if target is None:
+        raise HTTPException(status_code=503, detail="No connected arm serves the requested zones.")
+
+    with allocation_lock:
+        for _ in range(BATCH_ALLOCATION_TRIES):
+            zones = [zone for zone in zone_cache.get_zones() if target.serves(zone["name"])]
+            try:
+                zone_ids = assign_zones(request.items, zones, arm_coordinate(target, "pickup_zone"), zone_cache.index, request.policy)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            # Reserved zones are no longer listed as available, so nobody else takes them
+            reservation = uuid.uuid4().hex
+            if all(zone_cache.reserve(zone_id, token=reservation) for zone_id in zone_ids):
+                break
+            # A single storage took one of the zones meanwhile: give back the others and assign again
+            zone_cache.release(reservation)
+        else:
+            raise HTTPException(status_code=409, detail="Zones kept being taken by concurrent requests, try again.")
+
+    target, job = fleet.submit("storage_batch", run_storage_batch, for_zones=zone_ids, arm=target.name, items=request.items, zone_ids=zone_ids,
+                               reservation=reservation, max_barcode_attempts=max_barcode_attempts, velocity=velocity,
+                               acceleration=acceleration, motion_mode=motion_mode)
+    if job is None:
+        zone_cache.release(reservation)
+        raise HTTPException(status_code=503, detail="The arm for this batch is no longer connected.")
+    return {"status": "queued", "job_id": job.id, "arm": target.name, "zones": zone_ids, "message": f"Storage of {len(zone_ids)} packages queued."}
+
+
+def run_storage_batch(items: list, zone_ids: list, reservation: str = None, max_barcode_attempts: Optional[int] = 3, velocity: Optional[float] = None, acceleration: Optional[float] = None, motion_mode: Optional[str] = None, arm: Optional[str] = None):
+    """Store the packages one after another without returning to the safe zone in between."""
+    arm = fleet.get(arm)
+    if not arm or not arm.device:
+        return {"status": "error", "message": "Dobot is not connected. Please connect first."}
+    pickup_zone = arm_coordinate(arm, "pickup_zone")
+    safe_zone = arm_coordinate(arm, "safe_zone")
+    results = [{"zone_id": zone_id, "status": "pending"} for zone_id in zone_ids]
+
+    index = 0
+    try:
+        for index, (item, zone_id) in enumerate(zip(items, zone_ids)):
+            zone = get_zone(zone_id)
+            # Keep the reservations of this and the remaining items from expiring during a long batch
+            renewed = [zone_cache.renew(other, reservation) for other in zone_ids[index:]]
+            if not renewed[0]:
+                results[index].update(status="error", message=f"Zone {zone_id} is no longer reserved for this batch.")
+                continue
+            result = store_package(arm, zone, reservation, item.productType, item.additionalInfo, pickup_zone, safe_zone, max_barcode_attempts,
+                                   velocity, acceleration, motion_mode, more_follows=index < len(items) - 1)
+            results[index].update(result)
+            if result["status"] != "success":
+                # The unreadable package is still at the pickup zone, later items can't be scanned
+                break
+    except Exception as e:
+        results[index].update(status="error", message=getattr(e, "detail", None) or str(e))
+        if isinstance(e, JobCancelled):
+            raise
+    finally:
+        # Give back the zones of items that were not stored
+        zone_cache.release(reservation)
+        for result in results:
+            if result["status"] == "pending":
+                result["status"] = "skipped"
+
+    stored = sum(1 for result in results if result["status"] == "success")
+    if stored == len(results):
+        status = "success"
+    else:
+        status = "partial" if stored else "error"
+    return {"status": status, "message": f"Stored {stored} of {len(results)} packages.", "items": results}
 
 
 rotation_angle = 90  # Fixed rotation angle
 initial_r = 50  # Fixed rotation value for all operations
 
 # Function to capture barcode from webcam and handle package if not found
-def barcode_reader_and_handle_package(max_attempts: int = 50, delay: float = 10):
-    global device  # Assuming the Dobot is connected
+def barcode_reader_and_handle_package(arm, max_attempts: int = 50, delay: float = 10):
+    device = arm.device
 
     if not device:
         raise HTTPException(status_code=500, detail="Dobot is not connected. Please connect first.")
 
-    # Open the webcam
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        raise HTTPException(status_code=500, detail="Could not open the webcam")
+    # Frames come from the long-lived camera service, no need to open the webcam here
+    if not camera_service.is_running:
+        raise HTTPException(status_code=500, detail="Camera service is not running")
 
     barcode_data_list = []
+    scan_id = new_scan_id()
 
     try:
-        # Retrieve pickup_zone coordinates from the database
-        pickup_zone = get_coordinate("pickup_zone")
+        # Retrieve pickup_zone coordinates (cached)
+        pickup_zone = arm_coordinate(arm, "pickup_zone")
         x_pickup, y_pickup, z_pickup = pickup_zone["x"], pickup_zone["y"], pickup_zone["z"]
 
         # Capture frames and attempt to read barcodes and move the package
         for attempt in range(max_attempts):
-            time.sleep(delay)  # Delay before trying again
+            # Wait until the package is still in the pickup ROI; 'delay' is only the fallback timeout
+            attempt_started = time.monotonic()
+            settled, waited = settle_detector.wait_for_settle(timeout=delay, checkpoint=arm.job_queue.check_cancelled)
+            print(f"Scene {'settled' if settled else 'did not settle'} after {waited:.2f}s (attempt {attempt + 1}/{max_attempts})")
             detected_barcodes = []  # Reset in each attempt
 
-            # Read and process frames from the webcam
+            # Read and process fresh frames from the camera service
+            sequence = None
             for i in range(100):
-                ret, frame = cap.read()
-                if not ret:
+                latest = camera_service.get_latest_frame(after=sequence)
+                if latest is None:
                     raise HTTPException(status_code=500, detail="Failed to capture image from webcam")
-
-                detected_barcodes_temp = decode(frame)
+                sequence, captured_at, frame = latest
+
+                decode_started = time.perf_counter()
+                detected_barcodes_temp = decode_pipeline.decode_frame(frame)
+                if not detected_barcodes_temp and decode_engine:
+                    # Fast pipeline missed: try every preprocessing variant in parallel
+                    detected_barcodes_temp = decode_engine.decode(frame)
+                if frame_corpus and (detected_barcodes_temp or i < FRAME_CORPUS_PER_ATTEMPT - 1 or i == 99):
+                    # The first frames of each attempt, the one that decoded and the last one of a miss
+                    frame_corpus.record(frame, roi=decode_pipeline.config.roi, scan=scan_id, attempt=attempt + 1,
+                                        number=i + 1, t=captured_at, found=bool(detected_barcodes_temp),
+                                        data=[barcode["data"] for barcode in detected_barcodes_temp],
+                                        decode_ms=round((time.perf_counter() - decode_started) * 1000, 3),
+                                        engine=decode_engine is not None, settled=settled)
                 if detected_barcodes_temp:
                     detected_barcodes = detected_barcodes_temp
                     break  # Exit loop if barcode is detected
 
+            operation_journal.record(journal.BARCODE, status="found" if detected_barcodes else "missed",
+                                     duration=time.monotonic() - attempt_started, attempt=attempt + 1,
+                                     product_code=detected_barcodes[0]["data"] if detected_barcodes else None,
+                                     settled=settled, settle_wait=waited, scan=scan_id)
             if detected_barcodes:
+                settle_detector.record_decode(time.monotonic() - attempt_started)
+
                 # Process each detected barcode
                 for barcode in detected_barcodes:
-                    (x, y, w, h) = barcode.rect
-                    cv2.rectangle(frame, (x-10, y-10), (x + w+10, y + h+10), (255, 0, 0), 2)
-                    barcode_data = {"data": barcode.data.decode('utf-8'), "type": barcode.type}
+                    if barcode.get("rect"):
+                        (x, y, w, h) = barcode["rect"]
+                        cv2.rectangle(frame, (x-10, y-10), (x + w+10, y + h+10), (255, 0, 0), 2)
+                    barcode_data = {"data": barcode["data"], "type": barcode["type"]}
                     barcode_data_list.append(barcode_data)
 
-                cv2.imshow("Barcode Detection", frame)
-                cv2.waitKey(1000)  # Show the frame for 1 second
+                if BARCODE_PREVIEW:
+                    cv2.imshow("Barcode Detection", frame)
+                    cv2.waitKey(1000)  # Show the frame for 1 second
 
                 # Move the robot arm up a little before storing the package
                 z_up_safe = z_pickup + 50
                 device.move_to(x_pickup, y_pickup, z_up_safe, 0)  # Move up slightly before continuing
+                arm.route_planner.last_position = (x_pickup, y_pickup, z_up_safe, 0)
                 return barcode_data_list  # Return as soon as barcode is detected
 
             # If no barcode is found, move and handle the package
             print(f"Barcode not found. Attempting to pick up and handle package (Attempt {attempt + 1}/{max_attempts})")
-            move_and_handle_package(attempt)
+            move_and_handle_package(arm, attempt, frame)
 
         return None  # Return None if no barcode detected after max attempts
 
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
+        if BARCODE_PREVIEW:
+            cv2.destroyAllWindows()
 
 
-# Function to move the Dobot and handle package operations without rotation
-def move_and_handle_package(attempt: int):
-    global device  # Assuming the Dobot is connected
-
+# Function to move the Dobot and handle package operations after a failed scan
+def move_and_handle_package(arm, attempt: int, frame=None):
     try:
         current_r = initial_r  # Use fixed r
 
-        # Retrieve pickup_zone coordinates from the database
-        pickup_zone = get_coordinate("pickup_zone")
-        x_pickup, y_pickup, z_pickup = pickup_zone["x"], pickup_zone["y"], pickup_zone["z"]
-        z_above_pickup = z_pickup + 150  # Move to a position above the pickup zone
-
-        # Move above the pickup zone, pick up, and handle the package
-        device.move_to(x_pickup, y_pickup, z_above_pickup, current_r)
-        device.move_to(x_pickup, y_pickup, z_pickup, current_r)
-        device.suck(True)  # Pickup the package
-        device.move_to(x_pickup, y_pickup, z_above_pickup, current_r)
-        device.move_to(x_pickup, y_pickup, z_above_pickup, current_r - rotation_angle)
-        print(f"Picked up package in attempt {attempt+1} with fixed r={current_r}.")
-
-        # Move down to place the package
-        device.move_to(x_pickup, y_pickup, z_pickup, current_r - rotation_angle)
-        device.suck(False)  # Drop the package
+        # Retrieve pickup_zone coordinates (cached)
+        pickup_zone = arm_coordinate(arm, "pickup_zone")
+
+        # If the label is visible but unreadable, grab it where it is, turn it upright and center it in one move;
+        # otherwise pick the package up above the pickup zone, rotate it by the fixed angle and put it back down
+        reorientation = None
+        if VISION_REORIENT and frame is not None:
+            reorientation = plan_reorientation(frame, calibrations.get(arm.name), pickup_zone, roi=decode_pipeline.config.roi)
+        if reorientation:
+            strategy, rotation = "computed", reorientation["rotation"]
+            plan = build_recenter_plan(pickup_zone, reorientation["grab"], current_r, rotation)
+        else:
+            strategy, rotation = "blind", -rotation_angle
+            plan = build_reorient_plan(pickup_zone, current_r, rotation_angle)
+        started = time.monotonic()
+        with metrics.timed("barcode_retry_seconds"):
+            execute_plan(arm.device, assign_profiles(plan), progress=publish_step, check=arm.job_queue.check_cancelled)
+        arm.route_planner.last_position = plan_end_position(plan, arm.route_planner.last_position)
+        operation_journal.record(journal.REORIENT, status=strategy, duration=time.monotonic() - started, attempt=attempt + 1,
+                                 rotation=rotation, grab=reorientation["grab"] if reorientation else None)
+        print(f"Re-oriented package ({strategy}, {rotation:+.1f} deg) in attempt {attempt+1} with fixed r={current_r}.")
 
         return True
+    except JobCancelled:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to move or handle the package: {e}")
 
 @app.get("/zones/")
-def get_zones():
-    conn = sqlite3.connect("robot_zones.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT name, x, y, z, status, productCode, productType, additionalInfo, datetime FROM zones")
-    rows = cursor.fetchall()
-    conn.close()
-    
-    # Format the data into a list of dictionaries for easy access on the frontend
-    zones_data = []
-    for row in rows:
-        zones_data.append({
-            "name": row[0],
-            "x": row[1],
-            "y": row[2],
-            "z": row[3],
-            "status": row[4],
-            "productCode": row[5],
-            "productType": row[6],
-            "additionalInfo": row[7],
-            "datetime": row[8]
-        })
-    
-    return {"zones": zones_data}
+def get_zones(request: Request, since: Optional[int] = None):
+    """All zones, or with ?since=<version> only the zones changed after that version.
+
+    Responses carry the inventory version as ETag; a matching If-None-Match gets a 304.
+    The full list is served from a JSON snapshot that is only rebuilt after a change.
+    """
+    version, body = zone_cache.snapshot()
+    etag = f'"{version}"'
+    if request.headers.get("if-none-match") == etag or since == version:
+        return Response(status_code=304, headers={"ETag": etag})
+    if since is None:
+        return Response(body, media_type="application/json", headers={"ETag": etag})
+    version, full, zones = zone_cache.changes_since(since)
+    return JSONResponse({"version": version, "full": full, "zones": zones}, headers={"ETag": f'"{version}"'})
 
 @app.get("/available-zones/")
 def get_available_zones():
-    conn = sqlite3.connect("robot_zones.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM zones WHERE status = 'available'")
-    rows = cursor.fetchall()
-    conn.close()
-    
-    available_zones = [row[0] for row in rows]  # Extract zone names
-    return {"available_zones": available_zones}
\ No newline at end of file
+    return {"available_zones": zone_cache.get_available_zone_names()}
+
+@app.get("/zones/search")
+def search_zones(productCode: Optional[str] = None, prefix: Optional[str] = None, productType: Optional[str] = None,
+                 status: Optional[str] = None, stored_after: Optional[str] = None, stored_before: Optional[str] = None,
+                 limit: int = 100, cursor: Optional[int] = None):
+    """Find zones by product code (exact or prefix), type, status and storage time (ISO 8601), paged by cursor."""
+    rows, next_cursor = database.search_zones(productCode, prefix, productType, status, stored_after, stored_before, limit, cursor)
+    return {"zones": [dict(zip(ZONE_FIELDS, row[1:])) for row in rows], "next_cursor": next_cursor}
+
+@app.get("/zones/nearest")
+def get_nearest_zones(x: float, y: float, z: Optional[float] = None, k: int = 1, status: Optional[str] = "available"):
+    """The k zones closest to a point (x/y plane unless z is given), nearest first. Pass status= for any status."""
+    nearest = zone_cache.index.nearest(x, y, z, k=k, status=status or None)
+    return {"zones": [dict(zone_cache.get_zone(name), distance=distance) for name, distance in nearest]}
+
+@app.get("/zones/region")
+def get_zones_in_region(min_x: float, min_y: float, max_x: float, max_y: float, min_z: Optional[float] = None,
+                        max_z: Optional[float] = None, status: Optional[str] = None):
+    """Zones inside a bounding box, optionally limited to one status."""
+    names = zone_cache.index.within(min_x, min_y, max_x, max_y, min_z, max_z, status=status)
+    return {"zones": [zone_cache.get_zone(name) for name in names]}
+
+def zone_envelopes(zone_id: str):
+    """Workspaces of the arms serving a zone; the configured envelope before any arm is set up."""
+    if not fleet.arms:
+        return [default_envelope]
+    return [arm.route_planner.envelope for arm in fleet.arms.values() if arm.serves(zone_id)]
+
+def provision_zones(zones, dry_run: bool):
+    """Validate zones against the arms' workspaces and upsert them all in one transaction."""
+    started = time.perf_counter()
+    zones, errors = layout.validate_zones(zones, zone_envelopes)
+    if errors:
+        raise HTTPException(status_code=400, detail={"message": "No zones were imported.", "errors": errors})
+    if not zones:
+        raise HTTPException(status_code=400, detail="No zones given.")
+    with allocation_lock:
+        try:
+            counts = zone_cache.upsert_positions(zones, dry_run)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "success", "dry_run": dry_run, "zones": len(zones), **counts, "seconds": round(time.perf_counter() - started, 3)}
+
+@app.post("/zones/layout")
+def create_rack_layout(request: RackLayout, dry_run: bool = False):
+    """Generate the zones of a rack from its origin, pitch and size and add (or move) them. ?dry_run=true only checks."""
+    try:
+        zones = layout.generate_rack({"x": request.origin_x, "y": request.origin_y, "z": request.origin_z}, request.rows,
+                                     request.columns, request.row_pitch, request.column_pitch, request.levels,
+                                     request.level_pitch, request.angle, request.rack, request.name_format, request.first_column)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = provision_zones(zones, dry_run)
+    if dry_run:
+        result["layout"] = zones
+    return result
+
+@app.post("/zones/import")
+async def import_zones(request: Request, dry_run: bool = False, format: Optional[str] = None):
+    """Upsert zones from a JSON or CSV body (name, x, y, z) in one transaction; all or nothing.
+
+    The format comes from ?format=csv|json or the Content-Type. New zones start out available;
+    existing zones keep their status and contents and only move if they are available.
+    """
+    text = (await request.body()).decode("utf-8-sig")
+    format = format or ("csv" if "csv" in request.headers.get("content-type", "") else "json")
+    try:
+        if format == "csv":
+            zones = layout.parse_zones_csv(text)
+        elif format == "json":
+            zones = layout.parse_zones_json(text)
+        else:
+            raise ValueError(f"Unknown format '{format}', use csv or json.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await asyncio.to_thread(provision_zones, zones, dry_run)
+
+@app.get("/zones/export")
+def export_zones(format: str = "json"):
+    """Every zone with its position and contents, as JSON or CSV (both accepted by /zones/import)."""
+    zones = sorted(zone_cache.get_zones(), key=lambda zone: zone["name"])
+    if format == "csv":
+        return Response(layout.zones_to_csv(zones), media_type="text/csv",
+                        headers={"Content-Disposition": 'attachment; filename="zones.csv"'})
+    if format != "json":
+        raise HTTPException(status_code=400, detail=f"Unknown format '{format}', use csv or json.")
+    return {"version": zone_cache.version, "zones": zones}
+
+@app.post("/zones/{zone_id}/resolve")
+def resolve_failed_zone(zone_id: str, status: str):
+    """Clear a 'failed' zone after checking it by hand: status=occupied if the package is in it, available if not."""
+    zone = get_zone(zone_id)
+    if status == OCCUPIED:
+        resolved = zone_cache.transition(zone_id, None, FAILED, OCCUPIED)
+    elif status == AVAILABLE:
+        resolved = zone_cache.transition(zone_id, None, FAILED, AVAILABLE, productCode=None, productType=None,
+                                         additionalInfo=None, datetime=None)
+    else:
+        raise HTTPException(status_code=400, detail=f"Resolve a zone as '{OCCUPIED}' or '{AVAILABLE}'.")
+    if not resolved:
+        raise HTTPException(status_code=409, detail=f"Zone {zone_id} is {zone['status']}, not {FAILED}.")
+    return {"status": "success", "message": f"Zone {zone_id} is {status} again.", "zone": get_zone(zone_id)}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Timing histograms in Prometheus text format."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/camera/calibration")
+def get_camera_calibration(arm: Optional[str] = None):
+    """Pixel -> arm homography of an arm and its mean reprojection error in mm."""
+    arm = get_arm(arm, connected=False)
+    calibration = calibrations.get(arm.name)
+    if calibration is None:
+        raise HTTPException(status_code=404, detail=f"Camera is not calibrated for {arm.name}.")
+    return {"arm": arm.name, **calibration.to_dict()}
+
+@app.post("/camera/calibration")
+def set_camera_calibration(points: list[CalibrationPoint], arm: Optional[str] = None):
+    """Fit the pixel -> arm homography from 4+ spots seen by the camera (u, v) and touched by the arm (x, y)."""
+    arm = get_arm(arm, connected=False)
+    try:
+        calibration = CameraCalibration.fit([point.model_dump() for point in points])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    calibrations.set(arm.name, calibration)
+    return {"status": "success", "arm": arm.name, "error_mm": calibration.error_mm}
+
+@app.get("/camera/locate")
+def locate_camera_label(arm: Optional[str] = None):
+    """Barcode region in the newest frame (pixels, bar angle) and, once calibrated, its arm position and the re-orientation."""
+    arm = get_arm(arm, connected=False)
+    latest = camera_service.get_latest_frame()
+    if latest is None:
+        raise HTTPException(status_code=503, detail="No camera frame available.")
+    _, _, frame = latest
+    label = locate_label(frame, decode_pipeline.config.roi)
+    if label is None:
+        return {"status": "error", "message": "No barcode-like region found."}
+    calibration = calibrations.get(arm.name)
+    if calibration:
+        label["arm_position"] = calibration.pixel_to_arm(*label["center"])
+        label["reorientation"] = plan_reorientation(frame, calibration, arm_coordinate(arm, "pickup_zone"),
+                                                    roi=decode_pipeline.config.roi)
+    return {"status": "success", "label": label}
+
+@app.get("/camera/stats")
+def get_camera_stats():
+    """Frame rate and dropped-frame counters of the camera service."""
+    return camera_service.stats()
+
+@app.get("/camera/corpus")
+def get_frame_corpus_stats():
+    """Frames recorded for offline replay (FRAME_CORPUS_DIR), dropped frames and corpus size."""
+    if frame_corpus is None:
+        return {"status": "disabled", "message": "Set FRAME_CORPUS_DIR to record the frames seen while scanning."}
+    return frame_corpus.stats()
+
+@app.get("/barcode/stats")
+def get_barcode_stats():
+    """Per-frame decode latency, settle time and time-to-first-decode of the barcode scan."""
+    stats = decode_pipeline.stats()
+    stats["settle"] = settle_detector.stats()
+    stats["pool"] = decode_engine.stats() if decode_engine else None
+    return stats
+
+@app.get("/motion/cycle-times")
+def get_cycle_times():
+    """Average and last cycle time of recently executed motion plans."""
+    return {"cycle_times": cycle_time_summary()}
+
+@app.get("/journal/")
+def get_journal(kind: Optional[str] = None, zone: Optional[str] = None, job_id: Optional[str] = None,
+                since: Optional[str] = None, until: Optional[str] = None, limit: int = 100, cursor: Optional[int] = None):
+    """Journal events, newest first. Times are Unix seconds or ISO 8601; pass next_cursor to page back."""
+    try:
+        since, until = journal.parse_time(since), journal.parse_time(until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    events, next_cursor = journal.list_events(kind, zone, job_id, since, until, limit, cursor)
+    return {"events": events, "next_cursor": next_cursor, "writer": operation_journal.stats()}
+
+def report_window(since: Optional[str], until: Optional[str]):
+    try:
+        return journal.report_window(since, until)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/reports/throughput")
+def get_throughput_report(since: Optional[str] = None, until: Optional[str] = None, bucket: float = 3600):
+    """Storages and pickups per bucket (seconds) over the window, by default the last 24 hours."""
+    if bucket <= 0:
+        raise HTTPException(status_code=400, detail="'bucket' must be positive.")
+    return journal.throughput_report(*report_window(since, until), bucket)
+
+@app.get("/reports/dwell")
+def get_dwell_report(since: Optional[str] = None, until: Optional[str] = None, zone: Optional[str] = None):
+    """Per-zone time between storage and pickup, plus packages still stored."""
+    return journal.dwell_report(*report_window(since, until), zone)
+
+@app.get("/reports/retries")
+def get_retry_report(since: Optional[str] = None, until: Optional[str] = None, bucket: float = 3600):
+    """Barcode scans per bucket, with the share that needed a re-orientation and the share that read."""
+    if bucket <= 0:
+        raise HTTPException(status_code=400, detail="'bucket' must be positive.")
+    return journal.retry_report(*report_window(since, until), bucket)
+
+@app.post("/motion/route-preview")
+def preview_route(operations: list[RouteOperation], velocity: Optional[float] = None, acceleration: Optional[float] = None, arm: Optional[str] = None):
+    """Plan a batch of operations without moving the arm and report the travel distance and time saved."""
+    arm = get_arm(arm, connected=False)
+    route_planner = arm.route_planner
+    pickup_zone = arm_coordinate(arm, "pickup_zone")
+    drop_zone = arm_coordinate(arm, "drop_zone")
+    safe_zone = arm_coordinate(arm, "safe_zone")
+    plans = []
+    for operation in operations:
+        zone = get_zone(operation.zone_id)
+        if operation.kind == "storage":
+            plans.append(build_storage_plan(pickup_zone, zone, safe_zone))
+        elif operation.kind == "pickup":
+            plans.append(build_pickup_plan(zone, drop_zone, safe_zone))
+        else:
+            raise HTTPException(status_code=400, detail=f"Unknown operation kind '{operation.kind}'.")
+    if not plans:
+        raise HTTPException(status_code=400, detail="No operations given.")
+    fixed = fixed_speed(velocity, acceleration) or PROFILES[FAST_TRANSIT]
+    plan, report = route_planner.optimize(plans, velocity=fixed[0], acceleration=fixed[1])
+    assign_profiles(plan, fixed_speed(velocity, acceleration))
+    return {"status": "success", "report": report, "envelope": route_planner.envelope.to_dict(), "plan": plan.to_dict()}
+
+@app.post("/cache/invalidate")
+def invalidate_cache():
+    """Reload coordinates and zones from the database (e.g. after editing it by hand)."""
+    zone_cache.invalidate()
+    return {"status": "success", "message": "Zone cache reloaded from the database."}
+
+
+@app.get("/events")
+async def stream_events(request: Request, topics: Optional[str] = None):
+    """Server-Sent Events stream of zone, job, step and pose events (?topics=zone,job to filter).
+
+    A reconnecting EventSource sends Last-Event-ID and gets the events it missed replayed.
+    """
+    try:
+        subscription_topics = parse_topics(topics)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    last_event_id = request.headers.get("last-event-id")
+    subscription = event_hub.subscribe(subscription_topics, int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+
+    async def event_stream():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield event.sse
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket, topics: Optional[str] = None, last_seq: Optional[int] = None):
+    """WebSocket stream of the same events as /events, one JSON message per event."""
+    try:
+        subscription_topics = parse_topics(topics)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    await websocket.accept()
+    subscription = event_hub.subscribe(subscription_topics, last_seq)
+
+    async def send_events():
+        while True:
+            event = await subscription.queue.get()
+            await websocket.send_text(event.json)
+
+    async def wait_for_disconnect():
+        # Clients only listen; reading is how a closed connection is noticed while idle
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(send_events()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        event_hub.unsubscribe(subscription)
+
+@app.get("/events/stats")
+def get_event_stats():
+    return event_hub.stats()
+
+@app.get("/jobs/")
+def list_jobs(status: Optional[str] = None):
+    return {"jobs": [job.to_dict() for job in fleet.list_jobs(status)]}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, trace: bool = False):
+    arm, job = fleet.find_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    job_data = job.to_dict(include_trace=trace)
+    job_data["queue_position"] = arm.job_queue.position(job)
+    return job_data
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    arm, job = fleet.find_job(job_id)
+    if job:
+        job = arm.job_queue.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return {"status": "success", "message": f"Cancel requested for job {job_id}.", "job": job.to_dict()}
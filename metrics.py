@@ -0,0 +1,151 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+PREFIX = "smarttec_"
+# Seconds; covers everything from a cached DB read to a full pick-and-place cycle
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, math.inf)
+
+DESCRIPTIONS = {
+    "http_request_seconds": "HTTP request handling time by route.",
+    "db_query_seconds": "SQLite statement execution time.",
+    "serial_command_seconds": "Dobot serial command round-trip time.",
+    "serial_lock_wait_seconds": "Time a caller waited for the Dobot serial link.",
+    "pose_sample_seconds": "Time to read one pose sample from the arm.",
+    "motion_plan_seconds": "Motion plan cycle time.",
+    "frame_grab_seconds": "Time for the camera device to deliver a frame.",
+    "frame_wait_seconds": "Time a consumer waited for a fresh frame.",
+    "barcode_decode_seconds": "Barcode decode time per frame.",
+    "barcode_time_to_decode_seconds": "Time from the start of a scan attempt to its first successful decode.",
+    "settle_wait_seconds": "Time waiting for the pickup area to become still.",
+    "barcode_retry_seconds": "Time spent re-orienting a package after a failed scan.",
+    "job_seconds": "Queued job execution time.",
+    "journal_flush_seconds": "Time to group-commit buffered journal events.",
+}
+
+TRACE_MAX_ENTRIES = int(os.environ.get("TRACE_MAX_ENTRIES", "500"))  # timings kept per request / job trace
+
+# Active per-request / per-job trace: a list of (name, labels, seconds) or None
+_trace = ContextVar("trace", default=None)
+
+
+class Histogram:
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, name: str, seconds: float, labels: dict = None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def render(self):
+        """Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            snapshot = [(name, labels, list(h.bucket_counts), h.count, h.sum) for (name, labels), h in items]
+        lines = []
+        described = set()
+        for name, labels, bucket_counts, count, total in snapshot:
+            metric = PREFIX + name
+            if name not in described:
+                lines.append(f"# HELP {metric} {DESCRIPTIONS.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+                described.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, bucket_counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+registry = Registry()
+
+
+def observe(name: str, seconds: float, **labels):
+    registry.observe(name, seconds, labels)
+    trace = _trace.get()
+    if trace is not None and len(trace) <= TRACE_MAX_ENTRIES:
+        if len(trace) < TRACE_MAX_ENTRIES:
+            trace.append({"step": name, **labels, "ms": round(seconds * 1000, 3)})
+        else:
+            trace.append({"step": "trace_truncated", "max_entries": TRACE_MAX_ENTRIES})
+
+
+@contextmanager
+def timed(name: str, **labels):
+    """Time a block and record it in the histogram (and the active trace, if any)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+@contextmanager
+def trace_context():
+    """Collect every timing recorded inside the block; yields the list of trace entries."""
+    trace = []
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+class InstrumentedDevice:
+    """Wraps a Dobot so every serial command (move_to, suck, speed, get_pose, ...) is timed."""
+
+    def __init__(self, device):
+        self._device = device
+
+    @property
+    def wrapped(self):
+        return self._device
+
+    def __getattr__(self, name):
+        attribute = getattr(self._device, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with timed("serial_command_seconds", command=name.lstrip("_")):
+                return attribute(*args, **kwargs)
+        return call
@@ -0,0 +1,340 @@
+import json
+import os
+import struct
+import time
+from collections import deque
+
+import metrics
+
+
+# Execution modes
+QUEUED = "queued"  # push every command into the controller queue, wait once at the end
+STEP = "step"  # wait for each command to finish before sending the next (debugging)
+
+DEFAULT_MOTION_MODE = os.environ.get("DOBOT_MOTION_MODE", QUEUED)
+
+# Move roles, used by the route planner to tell transit hops from task moves
+TRANSIT = "transit"
+CLEARANCE = "clearance"
+WORK = "work"
+
+# Clearance above a zone when approaching it from above
+STORE_CLEARANCE = 110
+PICKUP_CLEARANCE = 150
+
+# Dobot protocol: queued SetWAITCmd (milliseconds)
+WAIT_CMD_ID = 110
+
+# A plan that takes longer than this on the controller fails the job (a stalled, alarmed or disconnected arm)
+MOTION_TIMEOUT_FACTOR = float(os.environ.get("MOTION_TIMEOUT_FACTOR", "3"))  # times the estimated plan duration
+MOTION_TIMEOUT_SLACK = float(os.environ.get("MOTION_TIMEOUT_SLACK", "10"))  # plus these seconds
+MAX_MOVE_DISTANCE = 600.0  # mm; the first move of a plan starts wherever the arm is, assume across the workspace
+
+# Named speed profiles as (velocity, acceleration), same units as Dobot.speed().
+# Override with MOTION_PROFILES='{"transit": [200, 200], "approach": [40, 40], "carry": [80, 60]}'.
+FAST_TRANSIT = "transit"  # free-space moves with an empty gripper
+APPROACH = "approach"  # the last descent into a point and the lift-off out of it
+CARRY = "carry"  # any other move with the suction cup holding a package
+PROFILES = {
+    FAST_TRANSIT: (200.0, 200.0),
+    APPROACH: (40.0, 40.0),
+    CARRY: (80.0, 60.0),
+}
+PROFILES.update({name: tuple(map(float, speed)) for name, speed in json.loads(os.environ.get("MOTION_PROFILES", "{}")).items()})
+FIXED = "fixed"  # profile name when a request asks for one velocity/acceleration for the whole plan
+
+# Recent plan executions, for /motion/cycle-times
+plan_history = deque(maxlen=200)
+
+
+class Step:
+    def __init__(self, kind: str, x: float = None, y: float = None, z: float = None, r: float = 0,
+                 enable: bool = None, seconds: float = None, label: str = None, role: str = None, base_z: float = None):
+        self.kind = kind  # "move" | "suck" | "wait"
+        self.x = x
+        self.y = y
+        self.z = z
+        self.r = r
+        self.enable = enable
+        self.seconds = seconds
+        self.label = label
+        # For moves: TRANSIT (safe_zone hop), CLEARANCE (above a point, base_z is that point's z) or WORK
+        self.role = role
+        self.base_z = base_z
+        # For moves: speed profile name and its (velocity, acceleration), set by assign_profiles()
+        self.profile = None
+        self.speed = None
+
+    def to_dict(self):
+        if self.kind == "move":
+            return {"kind": "move", "x": self.x, "y": self.y, "z": self.z, "r": self.r, "label": self.label, "role": self.role,
+                    "profile": self.profile}
+        if self.kind == "suck":
+            return {"kind": "suck", "enable": self.enable, "label": self.label}
+        return {"kind": "wait", "seconds": self.seconds, "label": self.label}
+
+
+class MotionPlan:
+    """Ordered list of move/suck/wait steps for one pick-and-place sequence."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.steps = []
+
+    def move(self, x: float, y: float, z: float, r: float = 0, label: str = None, role: str = None, base_z: float = None):
+        self.steps.append(Step("move", x=x, y=y, z=z, r=r, label=label, role=role, base_z=base_z))
+        return self
+
+    def move_to_point(self, point: dict, z: float = None, r: float = 0, label: str = None, role: str = None):
+        if z is None:
+            return self.move(point["x"], point["y"], point["z"], r, label, role or WORK)
+        return self.move(point["x"], point["y"], z, r, label, role or CLEARANCE, base_z=point["z"])
+
+    def transit(self, point: dict, label: str = None):
+        return self.move(point["x"], point["y"], point["z"], 0, label, TRANSIT)
+
+    def suck(self, enable: bool, label: str = None):
+        self.steps.append(Step("suck", enable=enable, label=label))
+        return self
+
+    def wait(self, seconds: float, label: str = None):
+        self.steps.append(Step("wait", seconds=seconds, label=label))
+        return self
+
+    def to_dict(self):
+        return {"name": self.name, "steps": [step.to_dict() for step in self.steps]}
+
+
+# Plan builders, one per pick-and-place sequence used by the API
+
+def build_storage_plan(pickup_zone: dict, zone: dict, safe_zone: dict):
+    z_above_pickup = pickup_zone["z"] + PICKUP_CLEARANCE
+    z_up_store = zone["z"] + STORE_CLEARANCE
+    plan = MotionPlan("storage")
+    plan.transit(safe_zone, label="safe_zone")
+    plan.move_to_point(pickup_zone, z=z_above_pickup, label="above pickup_zone")
+    plan.move_to_point(pickup_zone, label="pickup_zone")
+    plan.suck(True, label="grip package")
+    plan.move_to_point(pickup_zone, z=z_above_pickup, label="above pickup_zone")
+    plan.move_to_point(zone, z=z_up_store, label="above storage zone")
+    plan.move_to_point(zone, label="storage zone")
+    plan.suck(False, label="release package")
+    plan.move_to_point(zone, z=z_up_store, label="above storage zone")
+    plan.transit(safe_zone, label="safe_zone")
+    return plan
+
+
+def build_pickup_plan(zone: dict, drop_zone: dict, safe_zone: dict):
+    z_up_store = zone["z"] + STORE_CLEARANCE
+    z_above_drop = drop_zone["z"] + STORE_CLEARANCE
+    plan = MotionPlan("pickup")
+    plan.transit(safe_zone, label="safe_zone")
+    plan.move_to_point(zone, z=z_up_store, label="above storage zone")
+    plan.move_to_point(zone, label="storage zone")
+    plan.suck(True, label="grip package")
+    plan.move_to_point(zone, z=z_up_store, label="above storage zone")
+    plan.move_to_point(drop_zone, z=z_above_drop, label="above drop_zone")
+    plan.move_to_point(drop_zone, label="drop_zone")
+    plan.suck(False, label="release package")
+    plan.move_to_point(drop_zone, z=z_above_drop, label="above drop_zone")
+    plan.transit(safe_zone, label="safe_zone")
+    return plan
+
+
+def build_reorient_plan(pickup_zone: dict, initial_r: float, rotation: float):
+    """Pick the package up at the pickup zone, rotate it and put it back down."""
+    z_above_pickup = pickup_zone["z"] + PICKUP_CLEARANCE
+    plan = MotionPlan("reorient")
+    plan.move_to_point(pickup_zone, z=z_above_pickup, r=initial_r, label="above pickup_zone")
+    plan.move_to_point(pickup_zone, r=initial_r, label="pickup_zone")
+    plan.suck(True, label="grip package")
+    plan.move_to_point(pickup_zone, z=z_above_pickup, r=initial_r, label="above pickup_zone")
+    plan.move_to_point(pickup_zone, z=z_above_pickup, r=initial_r - rotation, label="rotate package")
+    plan.move_to_point(pickup_zone, r=initial_r - rotation, label="pickup_zone")
+    plan.suck(False, label="release package")
+    return plan
+
+
+def build_recenter_plan(pickup_zone: dict, grab: tuple, initial_r: float, rotation: float):
+    """Pick the package up where its label was seen, turn it by 'rotation' and set it down centered on the pickup zone."""
+    z_above_pickup = pickup_zone["z"] + PICKUP_CLEARANCE
+    grab_point = {"x": grab[0], "y": grab[1], "z": pickup_zone["z"]}
+    plan = MotionPlan("recenter")
+    plan.move_to_point(grab_point, z=z_above_pickup, r=initial_r, label="above label")
+    plan.move_to_point(grab_point, r=initial_r, label="label")
+    plan.suck(True, label="grip package")
+    plan.move_to_point(grab_point, z=z_above_pickup, r=initial_r, label="above label")
+    plan.move_to_point(pickup_zone, z=z_above_pickup, r=initial_r + rotation, label="rotate over pickup_zone")
+    plan.move_to_point(pickup_zone, r=initial_r + rotation, label="pickup_zone")
+    plan.suck(False, label="release package")
+    return plan
+
+
+def assign_profiles(plan: MotionPlan, fixed=None, profiles: dict = None):
+    """Give every move of 'plan' a speed profile, or the (velocity, acceleration) 'fixed' for all of them.
+
+    Moves into a WORK point and out of it are APPROACH, unless the package is being
+    lifted out, which is CARRY like every other move while the suction cup is on.
+    Everything else is FAST_TRANSIT.
+    """
+    profiles = profiles or PROFILES
+    carrying = False
+    previous_role = None
+    for step in plan.steps:
+        if step.kind == "suck":
+            carrying = step.enable
+        if step.kind != "move":
+            continue
+        if fixed:
+            step.profile, step.speed = FIXED, tuple(map(float, fixed))
+        else:
+            if step.role == WORK:
+                step.profile = APPROACH
+            elif carrying:
+                step.profile = CARRY
+            elif previous_role == WORK:
+                step.profile = APPROACH
+            else:
+                step.profile = FAST_TRANSIT
+            step.speed = profiles[step.profile]
+        previous_role = step.role
+    return plan
+
+
+def apply_speed(device, velocity: float, acceleration: float):
+    """Queue a speed change unless the arm already runs at that speed. Returns True if sent.
+
+    Unlike Dobot.speed() this does not wait for the controller queue, so a speed change
+    between two queued moves does not stall the motion. The last speed sent is kept on
+    the device (SerialLink.last_speed) to skip redundant commands.
+    """
+    speed = (float(velocity), float(acceleration))
+    if getattr(device, "last_speed", None) == speed:
+        return False
+    device._set_ptp_common_params(*speed)
+    device._set_ptp_coordinate_params(*speed)
+    device.last_speed = speed
+    return True
+
+
+def _send_step(device, step: Step):
+    """Send one step to the controller queue and return its queued command index."""
+    if step.kind == "move":
+        return device.move_to(step.x, step.y, step.z, step.r)
+    if step.kind == "suck":
+        return device.suck(step.enable)
+    from pydobot.message import Message  # pydobot pulls in pyserial, only needed once an arm runs a plan
+
+    msg = Message()
+    msg.id = WAIT_CMD_ID
+    msg.ctrl = 0x03
+    msg.params = bytearray(struct.pack("I", int(step.seconds * 1000)))
+    return device._extract_cmd_index(device._send_command(msg))
+
+
+def estimate_duration(plan: MotionPlan, speed=None):
+    """Seconds the controller needs for the plan by the simulator's timing model.
+
+    'speed' is the (velocity, acceleration) in effect before the plan; moves without
+    a speed of their own use it, or the slow approach profile when it is unknown.
+    """
+    from simulation import SUCTION_TIME, move_duration
+
+    speed = speed or PROFILES[APPROACH]
+    position = None
+    seconds = 0.0
+    for step in plan.steps:
+        if step.kind == "move":
+            speed = step.speed or speed
+            target = (step.x, step.y, step.z, step.r)
+            start = position or (step.x + MAX_MOVE_DISTANCE, step.y, step.z, step.r)
+            seconds += move_duration(start, target, *speed)
+            position = target
+        elif step.kind == "suck":
+            seconds += SUCTION_TIME
+        else:
+            seconds += step.seconds or 0.0
+    return seconds
+
+
+def execute_plan(device, plan: MotionPlan, mode: str = None, progress=None, check=None):
+    """Run a plan on the arm and return its cycle time.
+
+    In queued mode every command is pushed into the controller's queue back to back
+    and we wait once for the last index. In step mode each command is awaited before
+    the next is sent, which is slower but easier to follow when debugging.
+
+    'progress' is called with (plan, step number, step, seconds since the previous step
+    completed) as each step completes. In queued mode the indexes are then awaited one
+    by one, which polls the same as a single wait and does not hold back the controller queue.
+
+    Moves with a speed (see assign_profiles) are preceded by a queued speed change when
+    it differs from the current one.
+
+    The plan must finish within MOTION_TIMEOUT_FACTOR times its estimated duration plus
+    MOTION_TIMEOUT_SLACK, otherwise serial_link.CommandTimeout is raised. 'check' is called
+    while waiting, e.g. JobQueue.check_cancelled so a cancel interrupts the motion wait.
+    """
+    mode = mode or DEFAULT_MOTION_MODE
+    if mode not in (QUEUED, STEP):
+        raise ValueError(f"Unknown motion mode '{mode}'. Use '{QUEUED}' or '{STEP}'.")
+    if not plan.steps:
+        return {"plan": plan.name, "mode": mode, "steps": 0, "cycle_time": 0.0}
+
+    timeout = estimate_duration(plan, getattr(device, "last_speed", None)) * MOTION_TIMEOUT_FACTOR + MOTION_TIMEOUT_SLACK
+    deadline = time.monotonic() + timeout
+    started = time.perf_counter()
+    last_done = started
+    indexes = []
+    speed_changes = 0
+    for number, step in enumerate(plan.steps):
+        if step.kind == "move" and step.speed and apply_speed(device, *step.speed):
+            speed_changes += 1
+        indexes.append(_send_step(device, step))
+        if mode == STEP:
+            device.wait_for_cmd(indexes[-1], deadline, check)
+            print(f"[{plan.name}] {step.label or step.kind} done")
+            if progress:
+                done = time.perf_counter()
+                progress(plan, number, step, done - last_done)
+                last_done = done
+    queued_at = time.perf_counter()
+    if mode == QUEUED and progress:
+        for number, (step, index) in enumerate(zip(plan.steps, indexes)):
+            device.wait_for_cmd(index, deadline, check)
+            done = time.perf_counter()
+            progress(plan, number, step, done - last_done)
+            last_done = done
+    elif mode == QUEUED:
+        device.wait_for_cmd(indexes[-1], deadline, check)
+    finished = time.perf_counter()
+
+    profiles = {step.profile for step in plan.steps if step.speed}
+    execution = {
+        "plan": plan.name,
+        "mode": mode,
+        "speed": FIXED if FIXED in profiles else "profiles" if profiles else None,
+        "speed_changes": speed_changes,
+        "steps": len(plan.steps),
+        "queue_time": queued_at - started,
+        "cycle_time": finished - started,
+        "finished_at": time.time(),
+    }
+    plan_history.append(execution)
+    metrics.observe("motion_plan_seconds", execution["cycle_time"], plan=plan.name, mode=mode)
+    print(f"Executed plan '{plan.name}' ({len(plan.steps)} steps, {mode}) in {execution['cycle_time']:.2f}s")
+    return execution
+
+
+def cycle_time_summary():
+    """Average and last cycle time per plan name (and fixed speed vs. profiles) over the recent history."""
+    summary = {}
+    for execution in plan_history:
+        name = execution["plan"] if execution.get("speed") != FIXED else f"{execution['plan']} (fixed speed)"
+        entry = summary.setdefault(name, {"count": 0, "total": 0.0, "last": None})
+        entry["count"] += 1
+        entry["total"] += execution["cycle_time"]
+        entry["last"] = execution["cycle_time"]
+    for entry in summary.values():
+        entry["average"] = entry.pop("total") / entry["count"]
+    return summary
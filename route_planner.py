@@ -0,0 +1,177 @@
+import copy
+import math
+import os
+
+from motion import MotionPlan, TRANSIT, CLEARANCE, WORK
+from simulation import move_duration
+
+
+ROUTE_OPTIMIZE = os.environ.get("ROUTE_OPTIMIZE", "1") != "0"
+
+
+class Envelope:
+    """Collision-safe workspace of the arm, in the arm's own coordinates.
+
+    Moves are MOVJ (joint interpolated), so between two points the base angle and the
+    radius change monotonically; a move stays inside the envelope when both of its end
+    points are inside it. Transit segments must also stay at or above min_transit_z.
+    """
+
+    def __init__(self, min_radius: float = 150, max_radius: float = 320, min_angle: float = -135, max_angle: float = 135,
+                 min_z: float = -90, max_z: float = 160, min_transit_z: float = 20):
+        self.min_radius = min_radius
+        self.max_radius = max_radius
+        self.min_angle = min_angle
+        self.max_angle = max_angle
+        self.min_z = min_z
+        self.max_z = max_z
+        self.min_transit_z = min_transit_z
+
+    @classmethod
+    def from_env(cls):
+        defaults = cls()
+        return cls(**{
+            name: float(os.environ.get(f"ENVELOPE_{name.upper()}", getattr(defaults, name)))
+            for name in ("min_radius", "max_radius", "min_angle", "max_angle", "min_z", "max_z", "min_transit_z")
+        })
+
+    def contains(self, x: float, y: float, z: float):
+        radius = math.hypot(x, y)
+        angle = math.degrees(math.atan2(y, x))
+        return (self.min_radius <= radius <= self.max_radius and self.min_angle <= angle <= self.max_angle
+                and self.min_z <= z <= self.max_z)
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def _position(step):
+    return (step.x, step.y, step.z, step.r)
+
+
+def path_cost(positions, velocity: float, acceleration: float):
+    """Total travel distance (mm) and estimated move time (s) through a list of (x, y, z, r)."""
+    distance = 0.0
+    seconds = 0.0
+    for start, end in zip(positions, positions[1:]):
+        distance += math.dist(start[:3], end[:3])
+        seconds += move_duration(start, end, velocity, acceleration)
+    return distance, seconds
+
+
+class RoutePlanner:
+    """Merges consecutive pick-and-place plans into one route.
+
+    Safe-zone hops between operations are skipped when the direct move stays inside the
+    envelope, and the approach/retreat heights are chosen per segment (highest end point
+    plus a clearance, more when carrying a package) instead of fixed offsets.
+    """
+
+    def __init__(self, envelope: Envelope = None, clearance: float = None, carry_clearance: float = None):
+        self.envelope = envelope or Envelope.from_env()
+        self.clearance = clearance if clearance is not None else float(os.environ.get("ROUTE_CLEARANCE", "60"))
+        self.carry_clearance = carry_clearance if carry_clearance is not None else float(os.environ.get("ROUTE_CARRY_CLEARANCE", "40"))
+        self.last_position = None  # where the previous routed plan left the arm, None if unknown
+
+    def optimize(self, plans, start=None, end_at_safe: bool = True, velocity: float = 50, acceleration: float = 50):
+        """Return (optimized MotionPlan, report) for a sequence of plans run back to back.
+
+        'start' is the arm's current (x, y, z, r) if known. With end_at_safe=False the
+        final safe-zone return is dropped too, because another operation follows.
+        """
+        if isinstance(plans, MotionPlan):
+            plans = [plans]
+        steps = [copy.copy(step) for plan in plans for step in plan.steps]
+        moves_before = [step for step in steps if step.kind == "move"]
+
+        kept = self._skip_transits(steps, start, end_at_safe)
+        kept = self._drop_duplicate_moves(kept)
+        self._assign_clearance_heights(kept, start)
+
+        plan = MotionPlan("+".join(plan.name for plan in plans))
+        plan.steps = kept
+        moves_after = [step for step in kept if step.kind == "move"]
+
+        positions_before = ([start] if start else []) + [_position(step) for step in moves_before]
+        positions_after = ([start] if start else []) + [_position(step) for step in moves_after]
+        distance_before, time_before = path_cost(positions_before, velocity, acceleration)
+        distance_after, time_after = path_cost(positions_after, velocity, acceleration)
+        report = {
+            "plans": len(plans),
+            "moves_before": len(moves_before),
+            "moves_after": len(moves_after),
+            "transits_skipped": sum(1 for step in moves_before if step.role == TRANSIT)
+                                - sum(1 for step in moves_after if step.role == TRANSIT),
+            "distance_before_mm": round(distance_before, 1),
+            "distance_after_mm": round(distance_after, 1),
+            "distance_saved_mm": round(distance_before - distance_after, 1),
+            "time_before_s": round(time_before, 3),
+            "time_after_s": round(time_after, 3),
+            "time_saved_s": round(time_before - time_after, 3),
+        }
+        return plan, report
+
+    def _skip_transits(self, steps, start, end_at_safe):
+        move_indexes = [i for i, step in enumerate(steps) if step.kind == "move"]
+        first_move, last_move = (move_indexes[0], move_indexes[-1]) if move_indexes else (None, None)
+        kept = []
+        previous = start
+        for i, step in enumerate(steps):
+            if step.kind == "move" and step.role == TRANSIT:
+                following = next((steps[j] for j in move_indexes if j > i), None)
+                keep = (
+                    (i == first_move and start is None)
+                    or (i == last_move and end_at_safe)
+                    or previous is None
+                    or following is None
+                    or not self.envelope.contains(*previous[:3])
+                    or not self.envelope.contains(following.x, following.y, following.z)
+                )
+                if not keep:
+                    continue
+            kept.append(step)
+            if step.kind == "move":
+                previous = _position(step)
+        return kept
+
+    @staticmethod
+    def _drop_duplicate_moves(steps):
+        kept = []
+        last_move = None
+        for step in steps:
+            if step.kind == "move":
+                if last_move is not None and _position(last_move) == _position(step):
+                    continue
+                last_move = step
+            kept.append(step)
+        return kept
+
+    def _assign_clearance_heights(self, steps, start):
+        """Set every clearance move to the height its transit segment needs."""
+        carrying = False
+        previous = None  # previous move step, None at the start of the route
+        previous_base_z = start[2] if start else None
+        for step in steps:
+            if step.kind == "suck":
+                carrying = step.enable
+                continue
+            if step.kind != "move":
+                continue
+            # Height of the point this move serves; safe-zone hops are already at a safe height
+            if step.role == CLEARANCE:
+                base_z = step.base_z
+            elif step.role == TRANSIT:
+                base_z = None
+            else:
+                base_z = step.z
+            # A transit segment runs between two non-work moves (or from the start point)
+            in_segment = step.role != WORK and (previous is None or previous.role != WORK)
+            bases = [z for z in (previous_base_z, base_z) if z is not None]
+            if in_segment and bases:
+                height = max(bases) + self.clearance + (self.carry_clearance if carrying else 0)
+                height = min(max(height, self.envelope.min_transit_z), self.envelope.max_z)
+                for endpoint in (previous, step):
+                    if endpoint is not None and endpoint.role == CLEARANCE:
+                        endpoint.z = height
+            previous = step
+            previous_base_z = base_z
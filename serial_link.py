@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+
+SERIAL_POLL_INTERVAL = float(os.environ.get("SERIAL_POLL_INTERVAL", "0.005"))  # seconds between queue index polls
+SERIAL_BAD_REPLY_LIMIT = float(os.environ.get("SERIAL_BAD_REPLY_LIMIT", "1.0"))  # seconds of -1 queue indexes before giving up
+
+
+class CommandTimeout(Exception):
+    """The controller did not get through its command queue in time, or stopped answering."""
+
+
+class SerialLink:
+    """Single owner of the Dobot serial link.
+
+    Every device call (move_to, suck, get_pose, ...) goes through here and holds the
+    link lock for exactly one command, so request threads, the job worker and the pose
+    sampler never interleave on the port. wait_for_cmd() is re-implemented as a poll
+    loop that releases the lock between polls; pydobot's version spins on the port
+    and would starve everyone else for the whole motion.
+    """
+
+    def __init__(self, device, poll_interval: float = SERIAL_POLL_INTERVAL):
+        self._device = device
+        self._lock = threading.RLock()
+        self.poll_interval = poll_interval
+        self.last_speed = None  # (velocity, acceleration) last sent, see motion.apply_speed
+
+    @property
+    def wrapped(self):
+        return self._device
+
+    def __getattr__(self, name):
+        attribute = getattr(self._device, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            requested = time.perf_counter()
+            with self._lock:
+                metrics.observe("serial_lock_wait_seconds", time.perf_counter() - requested, command=name.lstrip("_"))
+                return attribute(*args, **kwargs)
+        return call
+
+    def wait_for_cmd(self, cmd_id, deadline: float = None, check=None):
+        """Block until the controller has executed queued command 'cmd_id'.
+
+        Raises CommandTimeout after the time.monotonic() 'deadline' or when the controller
+        keeps answering -1 (pydobot's value for a bad or missing reply). 'check' is called
+        between polls, e.g. JobQueue.check_cancelled to let a cancel interrupt the wait.
+        Polls the bare device: timing every poll would bury the job trace in them, so the
+        whole wait is recorded once instead.
+        """
+        device = getattr(self._device, "wrapped", self._device)
+        bad_since = None
+        with metrics.timed("serial_command_seconds", command="wait_for_cmd"):
+            while True:
+                with self._lock:
+                    index = device._get_queued_cmd_current_index()
+                if index >= cmd_id:
+                    return
+                now = time.monotonic()
+                if index >= 0:
+                    bad_since = None
+                elif bad_since is None:
+                    bad_since = now
+                elif now - bad_since > SERIAL_BAD_REPLY_LIMIT:
+                    raise CommandTimeout(f"The controller stopped reporting its queue index while waiting for command {cmd_id}.")
+                if deadline is not None and now > deadline:
+                    raise CommandTimeout(f"The controller did not reach command {cmd_id} in time (at {index}).")
+                if check:
+                    check()
+                time.sleep(self.poll_interval)
+
+    @contextmanager
+    def exclusive(self):
+        """Hold the link for a multi-command sequence that must not be interleaved."""
+        with self._lock:
+            yield self._device
@@ -0,0 +1,109 @@
+import os
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+import metrics
+
+
+SETTLE_THRESHOLD = float(os.environ.get("SETTLE_THRESHOLD", "2.0"))  # mean abs pixel difference (0-255)
+SETTLE_FRAMES = int(os.environ.get("SETTLE_FRAMES", "3"))  # consecutive still frames required
+SETTLE_SUBSAMPLE = int(os.environ.get("SETTLE_SUBSAMPLE", "4"))  # compare every Nth pixel in each direction
+
+
+class SettleDetector:
+    """Waits until the scene inside the pickup ROI stops moving.
+
+    Consecutive camera frames are compared with a vectorized mean absolute difference
+    on a subsampled grayscale crop; once the difference stays under the threshold for
+    a few frames in a row the package is considered still and decoding can start.
+    """
+
+    def __init__(self, camera, roi=None, threshold: float = SETTLE_THRESHOLD, still_frames: int = SETTLE_FRAMES,
+                 subsample: int = SETTLE_SUBSAMPLE, history: int = 200):
+        self.camera = camera
+        self.roi = roi
+        self.threshold = threshold
+        self.still_frames = still_frames
+        self.subsample = max(subsample, 1)
+        self.settle_times = deque(maxlen=history)
+        self.time_to_first_decode = deque(maxlen=history)
+        self.timeouts = 0
+        self.last_motion_score = None
+
+    def _prepare(self, frame):
+        if self.roi:
+            x, y, w, h = self.roi
+            frame = frame[y:y + h, x:x + w]
+        frame = frame[::self.subsample, ::self.subsample]
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return frame.astype(np.int16)
+
+    def motion_score(self, previous, current):
+        return float(np.abs(current - previous).mean())
+
+    def wait_for_settle(self, timeout: float, checkpoint=None):
+        """Block until the ROI is still or 'timeout' seconds pass.
+
+        'checkpoint' is called on every frame (e.g. to raise on job cancellation).
+        Returns (settled, seconds waited).
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        previous = None
+        sequence = None
+        still = 0
+        while True:
+            if checkpoint:
+                checkpoint()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            latest = self.camera.get_latest_frame(after=sequence, timeout=remaining)
+            if latest is None:
+                break
+            sequence, _, frame = latest
+            current = self._prepare(frame)
+            if previous is not None and previous.shape == current.shape:
+                self.last_motion_score = self.motion_score(previous, current)
+                still = still + 1 if self.last_motion_score < self.threshold else 0
+                if still >= self.still_frames:
+                    waited = time.monotonic() - started
+                    self.settle_times.append(waited)
+                    metrics.observe("settle_wait_seconds", waited, settled=True)
+                    return True, waited
+            previous = current
+
+        self.timeouts += 1
+        waited = time.monotonic() - started
+        metrics.observe("settle_wait_seconds", waited, settled=False)
+        return False, waited
+
+    def record_decode(self, seconds: float):
+        """Record the time from the start of a scan attempt to the first successful decode."""
+        self.time_to_first_decode.append(seconds)
+        metrics.observe("barcode_time_to_decode_seconds", seconds)
+
+    def stats(self):
+        def summary(values):
+            if not values:
+                return None
+            ordered = sorted(values)
+            return {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "max": ordered[-1],
+            }
+
+        return {
+            "threshold": self.threshold,
+            "still_frames": self.still_frames,
+            "last_motion_score": self.last_motion_score,
+            "timeouts": self.timeouts,
+            "settle_seconds": summary(self.settle_times),
+            "time_to_first_decode_seconds": summary(self.time_to_first_decode),
+        }
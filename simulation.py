@@ -0,0 +1,272 @@
+"""Hardware-free backends: a simulated Dobot arm and a camera that replays recorded frames.
+
+Select them with DOBOT_BACKEND=sim and CAMERA_BACKEND=sim.
+"""
+import glob
+import math
+import os
+import struct
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import cv2
+import numpy as np
+
+from camera import CameraService
+from serial_link import CommandTimeout
+
+if TYPE_CHECKING:
+    from pydobot.dobot import Pose
+
+
+# Simulated time runs SIM_TIME_SCALE times real time (e.g. 0.01 runs a 10 s move in 0.1 s)
+SIM_TIME_SCALE = float(os.environ.get("SIM_TIME_SCALE", "1.0"))
+SIM_SERIAL_LATENCY = float(os.environ.get("SIM_SERIAL_LATENCY", "0.004"))  # seconds per command round-trip
+SIM_CONNECT_DELAY = float(os.environ.get("SIM_CONNECT_DELAY", "0"))  # seconds to open the port, a real Dobot takes a few
+SIM_CAMERA_SOURCE = os.environ.get("SIM_CAMERA_SOURCE", "")
+SIM_CAMERA_FPS = float(os.environ.get("SIM_CAMERA_FPS", "30"))
+SIM_BARCODE_TEXT = os.environ.get("SIM_BARCODE_TEXT", "SIM-PACKAGE-0001")
+
+# Dobot Magician figures used for timing
+MAX_LINEAR_SPEED = 320.0  # mm/s at 100 % velocity
+ROTATION_SPEED = 180.0  # deg/s for the end effector
+MOVE_SETTLE_TIME = 0.05  # seconds at the end of every move
+SUCTION_TIME = 0.15  # seconds for the pump to grip or release
+WAIT_CMD_ID = 110
+HOME_POSITION = (200.0, 0.0, 50.0, 0.0)
+
+
+def move_duration(start, end, velocity: float, acceleration: float):
+    """Trapezoidal profile time for a point-to-point move (velocity mm/s, acceleration mm/s^2)."""
+    distance = math.dist(start[:3], end[:3])
+    velocity = max(min(velocity, MAX_LINEAR_SPEED), 1e-3)
+    acceleration = max(acceleration, 1e-3)
+    if distance < velocity * velocity / acceleration:
+        linear = 2 * math.sqrt(distance / acceleration)  # never reaches full speed
+    else:
+        linear = distance / velocity + velocity / acceleration
+    rotation = abs(end[3] - start[3]) / ROTATION_SPEED
+    return max(linear, rotation) + MOVE_SETTLE_TIME
+
+
+class _Command:
+    def __init__(self, index: int, kind: str, start_time: float, duration: float, start=None, target=None):
+        self.index = index
+        self.kind = kind
+        self.start_time = start_time
+        self.end_time = start_time + duration
+        self.start = start
+        self.target = target
+
+
+class SimulatedDobot:
+    """Drop-in replacement for pydobot.Dobot with realistic queued-command timing.
+
+    Commands are queued like on the controller and executed one after another in
+    simulated time, based on move distance and the last speed() values.
+    """
+
+    def __init__(self, port: str = "sim", time_scale: float = SIM_TIME_SCALE, serial_latency: float = SIM_SERIAL_LATENCY,
+                 connect_delay: float = SIM_CONNECT_DELAY):
+        if connect_delay:
+            time.sleep(connect_delay)
+        self.port = port
+        self.time_scale = time_scale
+        self.serial_latency = serial_latency
+        self.velocity = 100.0
+        self.acceleration = 100.0
+        self.suction = False
+        self._lock = threading.RLock()
+        self._index = 0
+        self._commands = []
+        self._position = HOME_POSITION  # pose at the end of the queue
+        self._queue_end = time.monotonic()
+        self.commands_sent = 0
+        self.distance_travelled = 0.0
+
+    def _round_trip(self):
+        self.commands_sent += 1
+        if self.serial_latency:
+            time.sleep(self.serial_latency)
+
+    def _enqueue(self, kind: str, duration: float, target=None):
+        with self._lock:
+            self._round_trip()
+            now = time.monotonic()
+            start_time = max(now, self._queue_end)
+            self._index += 1
+            command = _Command(self._index, kind, start_time, duration * self.time_scale, self._position, target)
+            if target is not None:
+                self.distance_travelled += math.dist(self._position[:3], target[:3])
+                self._position = target
+            self._queue_end = command.end_time
+            self._commands.append(command)
+            # Only the tail of the queue is needed to interpolate the pose
+            if len(self._commands) > 64:
+                self._commands = [c for c in self._commands if c.end_time > now]
+            return command.index
+
+    def move_to(self, x, y, z, r=0., mode=None):
+        target = (float(x), float(y), float(z), float(r))
+        return self._enqueue("move", move_duration(self._position, target, self.velocity, self.acceleration), target)
+
+    def suck(self, enable):
+        self.suction = bool(enable)
+        return self._enqueue("suck", SUCTION_TIME)
+
+    def grip(self, enable):
+        return self._enqueue("grip", SUCTION_TIME)
+
+    def speed(self, velocity=100., acceleration=100.):
+        self.wait_for_cmd(self._set_ptp_common_params(velocity, acceleration))
+        self.wait_for_cmd(self._set_ptp_coordinate_params(velocity, acceleration))
+
+    # Queued speed commands; moves are timed when queued, so the new speed applies to later moves only
+    def _set_ptp_common_params(self, velocity, acceleration):
+        self.velocity = float(velocity)
+        self.acceleration = float(acceleration)
+        return self._enqueue("speed", 0.0)
+
+    def _set_ptp_coordinate_params(self, velocity, acceleration):
+        return self._enqueue("speed", 0.0)
+
+    def _set_home_cmd(self):
+        return self._enqueue("home", 5.0, HOME_POSITION)
+
+    def home(self):
+        return self._set_home_cmd()
+
+    # Minimal protocol surface used by motion.py for queued wait commands
+    def _send_command(self, msg):
+        if msg.id == WAIT_CMD_ID:
+            milliseconds = struct.unpack_from("I", bytes(msg.params), 0)[0]
+            return self._enqueue("wait", milliseconds / 1000)
+        return self._enqueue(f"cmd{msg.id}", 0.0)
+
+    @staticmethod
+    def _extract_cmd_index(response):
+        return response
+
+    def _get_queued_cmd_current_index(self):
+        with self._lock:
+            self._round_trip()
+            now = time.monotonic()
+            finished = [command.index for command in self._commands if command.end_time <= now]
+            if finished:
+                return max(finished)
+            return self._commands[0].index - 1 if self._commands else self._index
+
+    def wait_for_cmd(self, cmd_id, deadline: float = None, check=None):
+        """Sleep until the command is done; 'deadline' and 'check' work like SerialLink.wait_for_cmd."""
+        with self._lock:
+            command = next((c for c in self._commands if c.index == cmd_id), None)
+            end_time = command.end_time if command else time.monotonic()
+        while time.monotonic() < end_time:
+            if deadline is not None and time.monotonic() > deadline:
+                raise CommandTimeout(f"The simulated arm did not reach command {cmd_id} in time.")
+            if check:
+                check()
+            time.sleep(min(end_time - time.monotonic(), 0.05))
+        self._round_trip()
+
+    def get_pose(self) -> "Pose":
+        with self._lock:
+            self._round_trip()
+            now = time.monotonic()
+            position = None
+            for command in self._commands:
+                if command.target is None:
+                    continue
+                if command.end_time <= now:
+                    position = command.target
+                elif command.start_time <= now:
+                    progress = (now - command.start_time) / max(command.end_time - command.start_time, 1e-9)
+                    position = tuple(s + (t - s) * progress for s, t in zip(command.start, command.target))
+                    break
+                else:
+                    position = command.start
+                    break
+            if position is None:
+                position = self._position
+        from pydobot.dobot import Joints, Pose, Position  # like the real arm, pydobot is loaded on first use
+
+        x, y, z, r = position
+        j1 = math.degrees(math.atan2(y, x))
+        return Pose(Position(x, y, z, r), Joints(j1, 0.0, 0.0, r - j1))
+
+    def get_alarms(self):
+        return set()
+
+    def clear_alarms(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def render_barcode_frame(text: str = SIM_BARCODE_TEXT, size=(480, 640)):
+    """Synthetic camera frame with a QR code of 'text' in the middle, for when no recordings are given."""
+    frame = np.full(size + (3,), 200, dtype=np.uint8)
+    code = cv2.QRCodeEncoder.create().encode(text)
+    code = cv2.resize(code, (code.shape[1] * 6, code.shape[0] * 6), interpolation=cv2.INTER_NEAREST)
+    height, width = code.shape[:2]
+    top, left = (size[0] - height) // 2, (size[1] - width) // 2
+    frame[top:top + height, left:left + width] = cv2.cvtColor(code, cv2.COLOR_GRAY2BGR)
+    return frame
+
+
+class ReplayCapture:
+    """cv2.VideoCapture look-alike that replays a video file or a directory of images in a loop."""
+
+    IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png", "*.bmp")
+
+    def __init__(self, source: str = SIM_CAMERA_SOURCE, fps: float = SIM_CAMERA_FPS):
+        self.interval = 1.0 / fps if fps > 0 else 0
+        self._next_frame_at = time.monotonic()
+        self._video = None
+        self._frames = []
+        self._position = 0
+        if source and os.path.isdir(source):
+            paths = sorted(path for pattern in self.IMAGE_PATTERNS for path in glob.glob(os.path.join(source, pattern)))
+            self._frames = [frame for frame in (cv2.imread(path) for path in paths) if frame is not None]
+        elif source:
+            self._video = cv2.VideoCapture(source)
+        else:
+            self._frames = [render_barcode_frame()]
+
+    def isOpened(self):
+        return bool(self._frames) or (self._video is not None and self._video.isOpened())
+
+    def read(self):
+        # Pace frames like a real camera
+        delay = self._next_frame_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame_at = max(self._next_frame_at + self.interval, time.monotonic())
+
+        if self._frames:
+            frame = self._frames[self._position % len(self._frames)]
+            self._position += 1
+            return True, frame.copy()
+        ret, frame = self._video.read()
+        if not ret:
+            self._video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self._video.read()
+        return ret, frame
+
+    def release(self):
+        if self._video is not None:
+            self._video.release()
+
+
+class SimulatedCamera(CameraService):
+    """Camera service fed by ReplayCapture instead of a webcam."""
+
+    def __init__(self, source: str = SIM_CAMERA_SOURCE, fps: float = SIM_CAMERA_FPS, **kwargs):
+        super().__init__(source=source or "synthetic", **kwargs)
+        self.replay_source = source
+        self.replay_fps = fps
+
+    def open_capture(self):
+        return ReplayCapture(self.replay_source, self.replay_fps)
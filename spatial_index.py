@@ -0,0 +1,102 @@
+import threading
+
+import numpy as np
+
+
+class ZoneIndex:
+    """Spatial index over zone coordinates with per-zone status.
+
+    Coordinates live in NumPy arrays (one per axis) and statuses in a parallel array of
+    small integer codes, so nearest, k-nearest and bounding-box queries are a single
+    vectorized pass. That stays well under a millisecond for tens of thousands of
+    zones without the rebuild cost of a tree when racks are added.
+    """
+
+    def __init__(self, zones=()):
+        self._lock = threading.Lock()
+        self.rebuild(zones)
+
+    def rebuild(self, zones):
+        """Replace the index contents with 'zones' (dicts with name, x, y, z and status)."""
+        zones = list(zones)
+        names = [zone["name"] for zone in zones]
+        positions = np.array([[zone["x"], zone["y"], zone["z"]] for zone in zones], dtype=np.float64).reshape(-1, 3)
+        status_codes = {}
+        statuses = np.array([status_codes.setdefault(zone["status"], len(status_codes)) for zone in zones], dtype=np.int16)
+        with self._lock:
+            self._names = names
+            self._rows = {name: row for row, name in enumerate(names)}
+            # One contiguous array per axis, faster to scan than strided column slices
+            self._x, self._y, self._z = (np.ascontiguousarray(positions[:, axis]) for axis in range(3))
+            self._statuses = statuses
+            self._status_codes = status_codes
+
+    def __len__(self):
+        return len(self._names)
+
+    def names(self):
+        with self._lock:
+            return list(self._names)
+
+    def set_status(self, name: str, status: str):
+        with self._lock:
+            row = self._rows.get(name)
+            if row is not None:
+                self._statuses[row] = self._status_code(status)
+
+    def _status_code(self, status: str):
+        return self._status_codes.setdefault(status, len(self._status_codes))
+
+    def _mask(self, status: str = None, exclude=()):
+        # Rows matching 'status' (all rows when None), minus the excluded names
+        if status is None:
+            mask = np.ones(len(self._names), dtype=bool)
+        elif status in self._status_codes:
+            mask = self._statuses == self._status_codes[status]
+        else:
+            return np.zeros(len(self._names), dtype=bool)
+        for name in exclude:
+            row = self._rows.get(name)
+            if row is not None:
+                mask[row] = False
+        return mask
+
+    def nearest(self, x: float, y: float, z: float = None, k: int = 1, status: str = "available", exclude=()):
+        """Return up to k (name, distance) pairs closest to the point, nearest first.
+
+        Distance is measured in the x/y plane unless z is given. 'status' limits the
+        candidates (None for any status) and 'exclude' skips zones by name.
+        """
+        with self._lock:
+            mask = self._mask(status, exclude)
+            candidates = int(np.count_nonzero(mask))
+            k = min(k, candidates)
+            if k <= 0:
+                return []
+            # Squared distances for every row, masked rows pushed to infinity
+            dx = self._x - x
+            dy = self._y - y
+            distances = dx * dx + dy * dy
+            if z is not None:
+                dz = self._z - z
+                distances += dz * dz
+            distances[~mask] = np.inf
+            if k < len(distances):
+                closest = np.argpartition(distances, k - 1)[:k]
+            else:
+                closest = np.arange(len(distances))
+            closest = closest[np.argsort(distances[closest], kind="stable")]
+            return [(self._names[row], float(np.sqrt(distances[row]))) for row in closest]
+
+    def within(self, min_x: float, min_y: float, max_x: float, max_y: float, min_z: float = None, max_z: float = None,
+               status: str = None):
+        """Names of the zones inside the bounding box, optionally limited to one status."""
+        with self._lock:
+            mask = self._mask(status)
+            mask &= (self._x >= min_x) & (self._x <= max_x)
+            mask &= (self._y >= min_y) & (self._y <= max_y)
+            if min_z is not None:
+                mask &= self._z >= min_z
+            if max_z is not None:
+                mask &= self._z <= max_z
+            return [self._names[row] for row in np.flatnonzero(mask)]
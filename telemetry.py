@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+import metrics
+
+
+POSE_SAMPLE_HZ = float(os.environ.get("POSE_SAMPLE_HZ", "10"))
+POSE_HISTORY_SECONDS = float(os.environ.get("POSE_HISTORY_SECONDS", "120"))
+
+# Columns of a pose sample row
+POSE_COLUMNS = ("t", "x", "y", "z", "r", "j1", "j2", "j3", "j4")
+
+
+class PoseSampler:
+    """Background thread that records the arm pose at a fixed rate.
+
+    Samples go into a preallocated (capacity, 9) float64 ring buffer, so the sampler
+    never allocates after start and readers (/dobot-position, the pose event stream)
+    get the latest pose or a trajectory slice without touching the serial port.
+    """
+
+    def __init__(self, get_device, rate: float = POSE_SAMPLE_HZ, history_seconds: float = POSE_HISTORY_SECONDS,
+                 on_sample=None):
+        self.get_device = get_device  # returns the current device (or None while disconnected)
+        self.rate = rate
+        self.on_sample = on_sample  # called with each new sample row
+        self.capacity = max(int(rate * history_seconds), 1)
+        self._buffer = np.zeros((self.capacity, len(POSE_COLUMNS)), dtype=np.float64)
+        self._count = 0  # samples written in total; the newest is at (_count - 1) % capacity
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.errors = 0
+        self.consecutive_errors = 0  # failed reads since the last good one, reset on success
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pose-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        period = 1 / self.rate
+        next_sample = time.monotonic()
+        while not self._stop.is_set():
+            device = self.get_device()
+            if device is not None:
+                self.sample(device)
+            next_sample += period
+            delay = next_sample - time.monotonic()
+            if delay < 0:
+                # Fell behind (slow serial link); skip missed slots instead of bursting
+                next_sample = time.monotonic()
+                delay = 0
+            self._stop.wait(delay)
+
+    def sample(self, device):
+        """Read the pose once and append it to the buffer."""
+        try:
+            with metrics.timed("pose_sample_seconds"):
+                pose = device.get_pose()
+        except Exception as e:
+            self.errors += 1
+            self.consecutive_errors += 1
+            if self.errors == 1 or self.errors % 100 == 0:
+                print(f"Pose sampler failed to read the pose ({self.errors} errors): {e}")
+            return None
+        self.consecutive_errors = 0
+        position, joints = pose.position, pose.joints
+        with self._lock:
+            row = self._buffer[self._count % self.capacity]
+            row[:] = (time.time(), position.x, position.y, position.z, position.r, joints.j1, joints.j2, joints.j3, joints.j4)
+            self._count += 1
+            row = row.copy()
+        if self.on_sample:
+            self.on_sample(row)
+        return row
+
+    def latest(self):
+        """Newest sample as a dict, or None before the first sample."""
+        with self._lock:
+            if not self._count:
+                return None
+            row = self._buffer[(self._count - 1) % self.capacity].copy()
+        return dict(zip(POSE_COLUMNS, row.tolist()))
+
+    def history(self, seconds: float = None, max_points: int = None):
+        """Recent samples, oldest first, as an (n, 9) array; optionally the last 'seconds' and decimated to max_points."""
+        with self._lock:
+            count = min(self._count, self.capacity)
+            end = self._count % self.capacity
+            if self._count <= self.capacity:
+                samples = self._buffer[:count].copy()
+            else:
+                samples = np.concatenate((self._buffer[end:], self._buffer[:end]))
+        if seconds is not None and len(samples):
+            samples = samples[samples[:, 0] >= samples[-1, 0] - seconds]
+        if max_points and len(samples) > max_points:
+            step = -(-len(samples) // max_points)
+            samples = samples[::-1][::step][::-1]  # keep the newest sample
+        return samples
+
+    def stats(self):
+        latest = self.latest()
+        return {
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "samples": self._count,
+            "errors": self.errors,
+            "age": time.time() - latest["t"] if latest else None,
+        }
@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+import pytest
+
+from allocation import assign_zones
+from spatial_index import ZoneIndex
+
+
+def zone(name, x, y, status="available", product_type=None):
+    return {"name": name, "x": x, "y": y, "z": -72, "status": status, "productType": product_type}
+
+
+# Two arms sharing one zone cache: B3, served by the right arm, is nearest to the left arm's pickup zone
+LEFT = [zone("A1", 200, 50), zone("A2", 220, 60), zone("A3", 205, 45, "occupied", "box")]
+RIGHT = [zone("B1", 150, 10), zone("B3", 100, 0), zone("B4", 110, 5, "occupied", "box")]
+PICKUP = {"x": 100, "y": 0}
+
+
+@pytest.mark.parametrize("policy", ["nearest", "product_type"])
+def test_batch_only_gets_zones_of_its_arm(policy):
+    index = ZoneIndex(LEFT + RIGHT)
+    items = [SimpleNamespace(productType="crate", zone_id=None) for _ in range(2)]
+    assert sorted(assign_zones(items, LEFT, PICKUP, index, policy)) == ["A1", "A2"]
+    assert sorted(assign_zones(items, RIGHT, PICKUP, index, policy)) == ["B1", "B3"]
+
+
+def test_batch_larger_than_the_arms_free_zones_is_refused():
+    index = ZoneIndex(LEFT + RIGHT)
+    items = [SimpleNamespace(productType="box", zone_id=None) for _ in range(3)]
+    with pytest.raises(ValueError):
+        assign_zones(items, LEFT, PICKUP, index)
@@ -0,0 +1,43 @@
+import os
+import shutil
+
+import pytest
+
+import database
+from database import _prefix_upper_bound
+
+
+@pytest.mark.parametrize("prefix, upper", [
+    ("AB", "AC"),
+    ("A" + chr(0x10FFFF), "B"),
+    (chr(0xD7FF), chr(0xE000)),
+    (chr(0x10FFFF) * 2, None),
+])
+def test_prefix_upper_bound(prefix, upper):
+    assert _prefix_upper_bound(prefix) == upper
+
+
+@pytest.fixture
+def zones_db(tmp_path, monkeypatch):
+    """A temporary copy of robot_zones.db holding four stored products."""
+    path = os.path.join(tmp_path, "zones.db")
+    shutil.copy(database.DB_PATH, path)
+    database.close_all()
+    monkeypatch.setattr(database, "DB_PATH", path)
+    database.initialize_database()
+    with database.transaction() as conn:
+        conn.execute("DELETE FROM zones")
+        conn.executemany("INSERT INTO zones (name, x, y, z, status, productCode) VALUES (?, 200, 0, -72, 'occupied', ?)",
+                         [("S1", "AB1"), ("S2", "AB" + chr(0x10FFFF)), ("S3", "AC1"), ("S4", chr(0x10FFFF) + "1")])
+    yield path
+    database.close_all()
+
+
+@pytest.mark.parametrize("prefix, names", [
+    ("AB", ["S1", "S2"]),
+    ("A", ["S1", "S2", "S3"]),
+    (chr(0x10FFFF), ["S4"]),
+])
+def test_search_by_code_prefix(zones_db, prefix, names):
+    rows, _ = database.search_zones(code_prefix=prefix)
+    assert [row[1] for row in rows] == names
@@ -0,0 +1,105 @@
+import os
+import shutil
+import time
+
+import pytest
+
+import database
+from cache import ZoneCache, AVAILABLE, RESERVED, PICKUP_RESERVED, IN_TRANSIT, OCCUPIED, FAILED
+
+
+@pytest.fixture
+def zone_cache(tmp_path, monkeypatch):
+    """A ZoneCache over a temporary copy of robot_zones.db."""
+    path = os.path.join(tmp_path, "zones.db")
+    shutil.copy(database.DB_PATH, path)
+    database.close_all()
+    monkeypatch.setattr(database, "DB_PATH", path)
+    database.initialize_database()
+    cache = ZoneCache()
+    cache.load()
+    yield cache
+    cache.stop_sweeper()
+    database.close_all()
+
+
+def free_zone(cache):
+    return cache.get_available_zone_names()[0]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_queued_job_keeps_its_reservation_past_the_ttl(zone_cache):
+    zone_id = free_zone(zone_cache)
+    token = zone_cache.reserve(zone_id, ttl=0.05)
+    queued = {token}
+    zone_cache.start_sweeper(interval=0.01, live_reservations=lambda: set(queued), ttl=0.05)
+
+    # The job waits in the queue for several TTLs and still holds the zone
+    time.sleep(0.3)
+    assert zone_cache.get_zone(zone_id)["status"] == RESERVED
+    assert zone_cache.reserve(zone_id) is None
+    assert zone_cache.renew(zone_id, token, ttl=0.05)
+
+    # Once no job owns the token any more it expires
+    queued.clear()
+    assert wait_for(lambda: zone_cache.get_zone(zone_id)["status"] == AVAILABLE)
+
+
+def test_a_zone_is_reserved_only_once(zone_cache):
+    zone_id = free_zone(zone_cache)
+    assert zone_cache.reserve(zone_id)
+    assert zone_cache.reserve(zone_id) is None
+    # Picking up needs an occupied zone
+    other = free_zone(zone_cache)
+    assert zone_cache.reserve(other, from_status=OCCUPIED, to_status=PICKUP_RESERVED) is None
+    assert zone_cache.get_zone(other)["status"] == AVAILABLE
+
+
+def test_expired_reservation_returns_the_zone(zone_cache):
+    zone_id = free_zone(zone_cache)
+    token = zone_cache.reserve(zone_id, ttl=0.01)
+    time.sleep(0.02)
+    assert zone_cache.expire_reservations() == [zone_id]
+    assert zone_cache.get_zone(zone_id)["status"] == AVAILABLE
+    assert not zone_cache.renew(zone_id, token)
+
+
+def test_release_rolls_back_to_the_previous_status(zone_cache):
+    storage, pickup = zone_cache.get_available_zone_names()[:2]
+    assert zone_cache.transition(pickup, None, AVAILABLE, OCCUPIED, productCode="P1")
+    storage_token = zone_cache.reserve(storage)
+    pickup_token = zone_cache.reserve(pickup, from_status=OCCUPIED, to_status=PICKUP_RESERVED)
+
+    assert zone_cache.release(storage_token) == [storage]
+    assert zone_cache.release(pickup_token, pickup) == [pickup]
+    assert zone_cache.get_zone(storage)["status"] == AVAILABLE
+    assert zone_cache.get_zone(pickup)["status"] == OCCUPIED
+
+
+def test_transition_needs_the_reservation_token(zone_cache):
+    zone_id = free_zone(zone_cache)
+    token = zone_cache.reserve(zone_id)
+    assert not zone_cache.transition(zone_id, "someone else", RESERVED, IN_TRANSIT)
+    assert zone_cache.transition(zone_id, token, RESERVED, IN_TRANSIT)
+    # A zone caught mid-move is not rolled back, it is marked failed
+    assert zone_cache.release(token, zone_id) == []
+    assert zone_cache.transition(zone_id, token, IN_TRANSIT, FAILED, release=True)
+    assert zone_cache.get_zone(zone_id)["status"] == FAILED
+
+
+def test_restart_fails_zones_left_in_transit(zone_cache):
+    reserved, moving = zone_cache.get_available_zone_names()[:2]
+    zone_cache.reserve(reserved)
+    token = zone_cache.reserve(moving)
+    zone_cache.transition(moving, token, RESERVED, IN_TRANSIT)
+
+    assert sorted(map(tuple, database.recover_reservations())) == sorted([(reserved, AVAILABLE), (moving, FAILED)])
+    zone_cache.load()
+    assert zone_cache.get_zone(reserved)["status"] == AVAILABLE
+    assert zone_cache.get_zone(moving)["status"] == FAILED
@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+from jobs import JobCancelled
+from serial_link import CommandTimeout, SerialLink
+
+
+class Controller:
+    """Answers queue index polls with the given values, repeating the last one."""
+
+    def __init__(self, *indexes):
+        self.indexes = list(indexes)
+
+    def _get_queued_cmd_current_index(self):
+        return self.indexes.pop(0) if len(self.indexes) > 1 else self.indexes[0]
+
+
+def test_wait_returns_once_the_command_is_done():
+    SerialLink(Controller(3, 4, 5), poll_interval=0).wait_for_cmd(5, deadline=time.monotonic() + 1)
+
+
+def test_wait_gives_up_at_the_deadline():
+    with pytest.raises(CommandTimeout):
+        SerialLink(Controller(2), poll_interval=0.001).wait_for_cmd(5, deadline=time.monotonic() + 0.05)
+
+
+def test_wait_gives_up_when_the_controller_keeps_answering_minus_one(monkeypatch):
+    monkeypatch.setattr("serial_link.SERIAL_BAD_REPLY_LIMIT", 0.02)
+    with pytest.raises(CommandTimeout):
+        SerialLink(Controller(2, -1), poll_interval=0.001).wait_for_cmd(5)
+
+
+def test_wait_can_be_cancelled():
+    def check():
+        raise JobCancelled("cancelled")
+
+    with pytest.raises(JobCancelled):
+        SerialLink(Controller(2), poll_interval=0.001).wait_for_cmd(5, check=check)
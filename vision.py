@@ -0,0 +1,130 @@
+import json
+import math
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from decoder import locate_barcode
+
+
+# Pixel -> arm calibration per arm, written by POST /camera/calibration
+CAMERA_CALIBRATION_PATH = os.environ.get("CAMERA_CALIBRATION_PATH", "camera_calibration.json")
+VISION_REORIENT = os.environ.get("VISION_REORIENT", "1") != "0"  # computed re-orientation when calibrated
+VISION_MAX_OFFSET = float(os.environ.get("VISION_MAX_OFFSET", "60"))  # mm; farther label positions are not trusted
+# +1 if a positive change of r turns the package counter-clockwise seen from above in arm x/y, -1 otherwise
+VISION_R_DIRECTION = float(os.environ.get("VISION_R_DIRECTION", "1"))
+
+# Bar direction (image degrees) the decoder reads best: upright bars, as find_barcode_candidate expects
+READABLE_BAR_ANGLE = 90.0
+
+
+def wrap_angle(angle: float, period: float = 180.0):
+    """Angle folded into [-period / 2, period / 2); bars look the same after half a turn."""
+    return (angle + period / 2) % period - period / 2
+
+
+class CameraCalibration:
+    """Homography from camera pixels in the pickup area to arm x/y (mm) on the pickup surface."""
+
+    def __init__(self, homography, points=None, error_mm: float = None):
+        self.homography = np.asarray(homography, dtype=np.float64).reshape(3, 3)
+        self.points = points or []  # the {"u", "v", "x", "y"} pairs it was fitted from
+        self.error_mm = error_mm
+
+    @classmethod
+    def fit(cls, points):
+        """Fit from at least 4 {"u", "v", "x", "y"} pairs (pixel and arm position of the same spot)."""
+        if len(points) < 4:
+            raise ValueError("At least 4 calibration points are needed.")
+        pixels = np.array([[point["u"], point["v"]] for point in points], dtype=np.float64)
+        arm = np.array([[point["x"], point["y"]] for point in points], dtype=np.float64)
+        homography, _ = cv2.findHomography(pixels, arm, 0)
+        if homography is None:
+            raise ValueError("Calibration points are degenerate (collinear or repeated).")
+        projected = cv2.perspectiveTransform(pixels.reshape(-1, 1, 2), homography).reshape(-1, 2)
+        error = float(np.linalg.norm(projected - arm, axis=1).mean())
+        return cls(homography, [dict(point) for point in points], error)
+
+    def pixel_to_arm(self, u: float, v: float):
+        x, y = cv2.perspectiveTransform(np.array([[[u, v]]], dtype=np.float64), self.homography)[0, 0]
+        return float(x), float(y)
+
+    def arm_angle(self, u: float, v: float, image_angle: float):
+        """Direction in arm x/y (degrees) of a short line through pixel (u, v) at 'image_angle'."""
+        step = 10.0
+        x0, y0 = self.pixel_to_arm(u, v)
+        x1, y1 = self.pixel_to_arm(u + step * math.cos(math.radians(image_angle)), v + step * math.sin(math.radians(image_angle)))
+        return math.degrees(math.atan2(y1 - y0, x1 - x0))
+
+    def to_dict(self):
+        return {"homography": self.homography.round(9).tolist(), "points": self.points, "error_mm": self.error_mm}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["homography"], data.get("points"), data.get("error_mm"))
+
+
+class CalibrationStore:
+    """Calibrations by arm name, kept in a JSON file so they survive restarts."""
+
+    def __init__(self, path: str = CAMERA_CALIBRATION_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._calibrations = {}
+        if path and os.path.isfile(path):
+            with open(path) as f:
+                self._calibrations = {name: CameraCalibration.from_dict(data) for name, data in json.load(f)["arms"].items()}
+
+    def get(self, arm: str):
+        return self._calibrations.get(arm)
+
+    def set(self, arm: str, calibration: CameraCalibration):
+        with self._lock:
+            self._calibrations[arm] = calibration
+            if not self.path:
+                return
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w") as f:
+                json.dump({"arms": {name: item.to_dict() for name, item in self._calibrations.items()}}, f, indent=2)
+            os.replace(temporary, self.path)
+
+
+def locate_label(frame, roi=None):
+    """locate_barcode on the pickup ROI of a BGR frame, with the center in full-frame pixels."""
+    offset_x = offset_y = 0
+    image = frame
+    if roi:
+        x, y, w, h = roi
+        image = image[y:y + h, x:x + w]
+        offset_x, offset_y = x, y
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    label = locate_barcode(image)
+    if label:
+        cx, cy = label["center"]
+        label["center"] = (cx + offset_x, cy + offset_y)
+    return label
+
+
+def plan_reorientation(frame, calibration: CameraCalibration, pickup_zone: dict, roi=None, max_offset: float = VISION_MAX_OFFSET):
+    """Where to grab an unreadable package and how far to turn it so the label ends up upright and centered.
+
+    Returns {"pixel", "bar_angle", "grab": (x, y), "rotation"} with 'rotation' the change of r
+    in degrees, or None if no label is visible or it lies implausibly far from the pickup zone.
+    """
+    if calibration is None:
+        return None
+    label = locate_label(frame, roi)
+    if label is None:
+        return None
+    u, v = label["center"]
+    grab = calibration.pixel_to_arm(u, v)
+    if math.dist(grab, (pickup_zone["x"], pickup_zone["y"])) > max_offset:
+        return None
+    # Turn the bars from where they point to where the decoder wants them, both measured in arm x/y
+    current = calibration.arm_angle(u, v, label["bar_angle"])
+    wanted = calibration.arm_angle(u, v, READABLE_BAR_ANGLE)
+    rotation = wrap_angle(wanted - current) * VISION_R_DIRECTION
+    return {"pixel": (u, v), "bar_angle": label["bar_angle"], "grab": grab, "rotation": rotation}